@@ -3,11 +3,13 @@
 
 import os
 import streamlit as st
-import tempfile
 import pysrt
 import time
-import requests
-import re
+from http_session import get_shared_session
+from backend_pool import endpoints_from_env
+from translation_daemon import daemon_address_from_env
+from subtitle_pipeline import MergeOptions
+from translation_jobs import JobManager, job_key, job_output_path, run_translation, run_summary, FAILED
 
 # Configuration de la page
 st.set_page_config(
@@ -124,145 +126,124 @@ st.markdown("""
 st.markdown('<h1 class="main-title">🎬 Traducteur de Sous-titres SRT</h1>', unsafe_allow_html=True)
 st.markdown('<p class="subtitle">Traduction rapide et fiable de l\'anglais vers le français</p>', unsafe_allow_html=True)
 
-# Vérifier la disponibilité d'Ollama
+# Vérifier la disponibilité d'Ollama (résultat réutilisé pendant 30 s entre les réexécutions)
+@st.cache_data(ttl=30, show_spinner=False)
 def check_ollama(host="localhost", port=11434):
     try:
-        response = requests.get(f"http://{host}:{port}/api/tags", timeout=10)
+        response = get_shared_session().get(f"http://{host}:{port}/api/tags", timeout=10)
         return response.status_code == 200
     except:
         return False
 
-# Traduire un fichier SRT
-def translate_srt(input_file, output_file, model_name, batch_size=10, merge=False, filter=False):
-    # Importer ici pour éviter le chargement séquentiel
+# Liste des modèles installés (mise en cache comme la vérification de connexion)
+@st.cache_data(ttl=60, show_spinner=False)
+def list_models(host="localhost", port=11434):
+    response = get_shared_session().get(f"http://{host}:{port}/api/tags", timeout=10)
+    response.raise_for_status()
+    return [m["name"] for m in response.json().get("models", [])]
+
+# Traducteurs partagés entre les réexécutions et les sessions : une seule connexion,
+# un seul préchargement du modèle et un cache commun par jeu d'options
+@st.cache_resource(show_spinner="Initialisation du traducteur...")
+def get_translator(model_name, packed=False, throttle=True, stream=False, merge_settings=None):
     from srt_translator import SRTTranslator
-    
-    # Conteneurs pour le suivi de progression
-    progress_container = st.container()
-    with progress_container:
-        progress_bar = st.progress(0)
-        progress_status = st.empty()
-        subtitle_counter = st.empty()
-    
-    start_time = time.time()
-    translator = SRTTranslator(model_name=model_name)
-    
-    # Compteurs de sous-titres
-    total_subtitles = 0
-    translated_subtitles = 0
-    
-    # Fonction pour mettre à jour la progression
-    def update_progress(progress_value, batch_num=None, total_batches=None):
-        progress_bar.progress(progress_value)
-        
-        elapsed = time.time() - start_time
-        remaining = 0
-        
-        if progress_value > 0:
-            remaining = (elapsed / progress_value) * (1 - progress_value)
-        
-        # Utiliser des valeurs sécurisées
-        batch_display = batch_num if batch_num is not None else 0
-        total_display = total_batches if total_batches is not None else 1
+    merge_options = MergeOptions(*merge_settings) if merge_settings else None
+    return SRTTranslator(model_name=model_name, packed=packed, throttle=throttle, stream=stream,
+                         endpoints=endpoints_from_env(), merge_options=merge_options,
+                         daemon=daemon_address_from_env())
+
+# Tâches en arrière-plan et résultats mémorisés, communs à toutes les sessions
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
+
+# Afficher l'avancement ou le résultat d'une tâche de traduction
+def show_translation_job(job, file_name, submitted_at):
+    if job.active:
+        state = job.progress
+        progress = job.fraction
+        elapsed = job.elapsed
+        remaining = (elapsed / progress) * (1 - progress) if progress > 0 else 0
         
-        status_html = f"""
+        st.progress(progress)
+        st.markdown(f"""
         <div class="batch-counter">
-            {batch_display}/{total_display} lots traités
+            {state["batch"]}/{max(1, state["batches"])} lots traités
         </div>
         <div class="progress-stats">
             <span>Temps écoulé: {elapsed:.1f}s</span>
             <span>Temps restant: {remaining:.1f}s</span>
         </div>
-        """
-        progress_status.markdown(status_html, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
         
+        total_subtitles = state["total_subtitles"]
+        translated_subtitles = state["already_done"] + state["translated"]
         if translated_subtitles > 0 and total_subtitles > 0:
-            percentage = min(100, (translated_subtitles/total_subtitles)*100)
-            subtitle_counter.markdown(f"""
+            st.markdown(f"""
             <div style="text-align: center; margin-top: 0.5rem;">
-                {translated_subtitles}/{total_subtitles} sous-titres ({percentage:.0f}%)
+                {translated_subtitles}/{total_subtitles} sous-titres ({progress * 100:.0f}%)
             </div>
             """, unsafe_allow_html=True)
+        return
     
-    # Démarrer à 0
-    update_progress(0)
+    if job.status == FAILED:
+        st.error(f"La traduction a échoué : {job.error}")
+        return
     
-    # Sélectionner les messages importants
-    import builtins
-    original_print = builtins.print
+    if job.finished < submitted_at:
+        st.markdown('<div class="success-box">✅ Fichier déjà traduit avec ces options : résultat immédiat !</div>', unsafe_allow_html=True)
+    else:
+        st.markdown(f'<div class="success-box">✅ Traduction terminée avec succès en {job.elapsed:.2f} secondes !</div>', unsafe_allow_html=True)
     
-    def custom_print(*args, **kwargs):
-        text = ' '.join(map(str, args))
-        nonlocal total_subtitles, translated_subtitles
-        
-        # Capturer le nombre total de sous-titres
-        if "Traduction de " in text and "sous-titres" in text:
-            count_match = re.search(r'Traduction de (\d+) sous-titres', text)
-            if count_match:
-                total_subtitles = int(count_match.group(1))
-        
-        # Chercher les informations de lot
-        batch_match = re.search(r'Traitement du batch (\d+)/(\d+)', text)
-        if batch_match:
-            batch_num = int(batch_match.group(1))
-            total_batches = int(batch_match.group(2))
-            progress = (batch_num - 1) / total_batches
-            update_progress(progress, batch_num, total_batches)
-        
-        # Chercher les informations de complétion
-        if "✅ Batch" in text:
-            batch_match = re.search(r'Batch (\d+)/(\d+)', text)
-            if batch_match:
-                batch_num = int(batch_match.group(1))
-                total_batches = int(batch_match.group(2))
-                progress = batch_num / total_batches
-                trans_match = re.search(r'\((\d+)/(\d+)\)', text)
-                if trans_match:
-                    translated_subtitles = int(trans_match.group(1))
-                    total_subtitles = int(trans_match.group(2))
-                else:
-                    translated_subtitles = int(total_subtitles * progress)
-                update_progress(progress, batch_num, total_batches)
-        
-        # Chercher la fin de la traduction
-        if "Traduction terminée" in text:
-            update_progress(1.0, 1, 1)
-        
-        # Appeler la fonction d'origine
-        original_print(*args, **kwargs)
-    
-    # Remplacer temporairement la fonction print
-    builtins.print = custom_print
+    # Afficher un aperçu du contenu traduit
+    sample_lines = job.result.split('\n')[:20]
+    with st.expander("Aperçu du fichier traduit", expanded=True):
+        st.code('\n'.join(sample_lines) + "\n...", language="plaintext")
     
-    try:
-        # Exécuter la traduction
-        success = translator.translate_srt_file(
-            input_file, 
-            output_file, 
-            batch_size=batch_size, 
-            merge_duplicates=merge, 
-            filter_noise=filter
-        )
-        
-        # Compléter la barre de progression
-        update_progress(1.0, 1, 1)
-        
-        return success
-    except Exception as e:
-        print(f"Erreur de traduction: {str(e)}")
-        return False
-    finally:
-        # Restaurer la fonction print
-        builtins.print = original_print
+    # Bouton de téléchargement
+    st.download_button(
+        "📥 Télécharger le fichier traduit",
+        job.result,
+        file_name=f"fr_{file_name}",
+        mime="text/plain",
+        use_container_width=True
+    )
 
-# Analyser un fichier SRT
-def analyze_srt_file(input_file, model_name):
-    """Analyser et résumer un fichier SRT"""
-    from srt_translator import SRTTranslator
+# Afficher le résumé et l'analyse d'un fichier
+def show_summary(result):
+    # Afficher le résumé et les informations
+    st.markdown(f"""
+    <div class="summary-box">
+        <div class="summary-title">📝 Résumé du contenu</div>
+        <div class="summary-content">{result['summary']}</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Afficher les informations du fichier
+    info_col1, info_col2, info_col3 = st.columns(3)
+    with info_col1:
+        st.markdown(f"""
+        <div class="info-badge">🔤 Langue: {result['language_detected']}</div>
+        """, unsafe_allow_html=True)
+    with info_col2:
+        st.markdown(f"""
+        <div class="info-badge">🔢 {result['subtitle_count']} sous-titres</div>
+        """, unsafe_allow_html=True)
+    with info_col3:
+        st.markdown(f"""
+        <div class="info-badge">⏱️ {result['duration_minutes']} minutes</div>
+        """, unsafe_allow_html=True)
     
-    with st.spinner("Analyse du fichier en cours..."):
-        translator = SRTTranslator(model_name=model_name)
-        return translator.summarize_srt_file(input_file)
+    # Afficher des exemples de sous-titres
+    if result['sample_subtitles']:
+        with st.expander("Exemples de sous-titres", expanded=False):
+            for sample in result['sample_subtitles']:
+                st.markdown(f"""
+                <div class="sample-subtitle">
+                    <strong>{sample['start']} → {sample['end']}</strong><br>
+                    {sample['text']}
+                </div>
+                """, unsafe_allow_html=True)
 
 # Créer une mise en page à deux colonnes
 col1, col2 = st.columns([2, 1])
@@ -279,22 +260,20 @@ if ollama_available:
     
     # Récupérer les modèles disponibles
     try:
-        response = requests.get(f"http://{host}:{port}/api/tags", timeout=10)
-        if response.status_code == 200:
-            models = [m["name"] for m in response.json().get("models", [])]
+        models = list_models(host, port)
+        
+        if models:
+            # Préférer les modèles mistral ou llama
+            preferred = [m for m in models if m.startswith(("mistral", "llama"))]
+            default_model = preferred[0] if preferred else models[0]
             
-            if models:
-                # Préférer les modèles mistral ou llama
-                preferred = [m for m in models if m.startswith(("mistral", "llama"))]
-                default_model = preferred[0] if preferred else models[0]
-                
-                model_name = st.sidebar.selectbox(
-                    "Modèle de Traduction", models, 
-                    index=models.index(default_model) if default_model in models else 0
-                )
-            else:
-                st.sidebar.warning("Aucun modèle trouvé. Veuillez en télécharger un d'abord.")
-                model_name = st.sidebar.text_input("Nom du modèle", "mistral")
+            model_name = st.sidebar.selectbox(
+                "Modèle de Traduction", models, 
+                index=models.index(default_model) if default_model in models else 0
+            )
+        else:
+            st.sidebar.warning("Aucun modèle trouvé. Veuillez en télécharger un d'abord.")
+            model_name = st.sidebar.text_input("Nom du modèle", "mistral")
     except Exception as e:
         st.sidebar.warning(f"Impossible d'obtenir la liste des modèles: {e}")
         model_name = st.sidebar.text_input("Nom du modèle", "mistral")
@@ -312,6 +291,12 @@ else:
 with st.sidebar.expander("⚡ Performances", expanded=True):
     batch_size = st.slider("Taille des lots", 1, 30, 10, 
                       help="Nombre de sous-titres traités à la fois. Des valeurs plus élevées sont plus rapides mais utilisent plus de mémoire.")
+    packed_mode = st.checkbox("Regrouper les sous-titres par requête", False,
+                              help="Envoie chaque lot de sous-titres au modèle dans une seule requête numérotée. Beaucoup plus rapide sur les longs fichiers.")
+    no_throttle = st.checkbox("Aucune limitation (GPU dédié)", False,
+                              help="Envoie les requêtes au maximum de concurrence, sans ralentir sur les signaux de surcharge du serveur.")
+    stream_mode = st.checkbox("Réponses en streaming", False,
+                              help="Lit la traduction au fil de la génération, l'interrompt dès qu'elle est complète et abandonne rapidement les générations bloquées.")
     
     st.markdown("""
     **Réglages recommandés :**
@@ -324,6 +309,14 @@ with st.sidebar.expander("⚡ Performances", expanded=True):
 with st.sidebar.expander("🔍 Options avancées"):
     merge_duplicates = st.checkbox("Fusionner les doublons", True,
                               help="Combine les sous-titres consécutifs similaires ou fragmentés")
+    if merge_duplicates:
+        merge_gap = st.slider("Écart maximal entre sous-titres fusionnés (ms)", 0, 5000, 1000, 100)
+        merge_chars = st.slider("Longueur maximale d'un sous-titre fusionné", 40, 200, 80, 10,
+                                help="Des sous-titres plus longs réduisent le nombre de requêtes au modèle")
+        merge_duration = st.slider("Durée maximale d'un sous-titre fusionné (s)", 2.0, 20.0, 10.0, 0.5)
+        merge_settings = (merge_gap, merge_chars, int(merge_duration * 1000))
+    else:
+        merge_settings = None
     filter_noise = st.checkbox("Filtrer les sous-titres de bruit", True,
                           help="Supprime les sous-titres contenant uniquement [musique], [applaudissements], etc.")
 
@@ -346,6 +339,14 @@ with col1:
             # Créer des onglets pour la traduction et l'analyse
             tab1, tab2 = st.tabs(["🚀 Traduction", "📊 Résumé et Analyse"])
             
+            # Les résultats sont mémorisés par empreinte du fichier et des options
+            file_bytes = uploaded_file.getvalue()
+            jobs = get_job_manager()
+            translation_key = job_key(file_bytes, task="translation", model=model_name, batch_size=batch_size,
+                                      merge=merge_duplicates, merge_settings=merge_settings, filter=filter_noise,
+                                      packed=packed_mode, throttle=not no_throttle, stream=stream_mode)
+            summary_key = job_key(file_bytes, task="summary", model=model_name)
+            
             with tab1:
                 # Bouton pour démarrer la traduction
                 translate_button = st.button("🚀 Traduire en français", type="primary", use_container_width=True)
@@ -354,70 +355,23 @@ with col1:
                     if not ollama_available:
                         st.error("Ollama n'est pas connecté. Vérifiez votre installation.")
                     else:
-                        with st.spinner("Traduction en cours..."):
-                            # Enregistrer le fichier temporaire
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.srt') as temp_file:
-                                temp_file.write(uploaded_file.getvalue())
-                                input_path = temp_file.name
-                            
-                            # Configurer le chemin de sortie
-                            output_dir = "srt-files-traduits"
-                            os.makedirs(output_dir, exist_ok=True)
-                            output_path = os.path.join(output_dir, f"fr_{uploaded_file.name}")
-                            
-                            # Démarrer le minuteur
-                            start_time = time.time()
-                            
-                            # Démarrer la traduction
-                            try:
-                                # Exécuter la traduction
-                                success = translate_srt(
-                                    input_path, 
-                                    output_path, 
-                                    model_name,
-                                    batch_size, 
-                                    merge_duplicates,
-                                    filter_noise
-                                )
-                                
-                                if success and os.path.exists(output_path):
-                                    # Afficher le temps d'exécution
-                                    end_time = time.time()
-                                    st.markdown(f'<div class="success-box">✅ Traduction terminée avec succès en {end_time - start_time:.2f} secondes !</div>', unsafe_allow_html=True)
-                                    
-                                    translation_container = st.container()
-                                    with translation_container:
-                                        try:
-                                            # Lire le contenu du fichier traduit
-                                            with open(output_path, 'r', encoding='utf-8') as f:
-                                                content = f.read()
-                                            
-                                            # Afficher un aperçu du contenu traduit
-                                            sample_lines = content.split('\n')[:20]
-                                            with st.expander("Aperçu du fichier traduit", expanded=True):
-                                                st.code('\n'.join(sample_lines) + "\n...", language="plaintext")
-                                            
-                                            # Bouton de téléchargement
-                                            st.download_button(
-                                                "📥 Télécharger le fichier traduit",
-                                                content,
-                                                file_name=f"fr_{uploaded_file.name}",
-                                                mime="text/plain",
-                                                use_container_width=True
-                                            )
-                                        except Exception as file_error:
-                                            st.error(f"Erreur d'accès au fichier traduit : {str(file_error)}")
-                                else:
-                                    st.error("La traduction a échoué. Vérifiez les journaux.")
-                            
-                            except Exception as e:
-                                st.error(f"Erreur : {str(e)}")
-                            
-                            # Nettoyer le fichier temporaire
-                            try:
-                                os.unlink(input_path)
-                            except:
-                                pass
+                        # Configurer le chemin de sortie (un dossier par tâche, avec son journal)
+                        output_path = job_output_path("srt-files-traduits", translation_key, uploaded_file.name)
+                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                        
+                        # La traduction s'exécute en arrière-plan ; la page suit son avancement.
+                        # Les tâches simultanées partagent le traducteur : son moteur a une seule
+                        # boucle asyncio, commune à tous les lots
+                        translator = get_translator(model_name, packed_mode, not no_throttle, stream_mode, merge_settings)
+                        jobs.submit(translation_key, uploaded_file.name, run_translation, translator, file_bytes,
+                                    output_path, batch_size, merge_duplicates, filter_noise)
+                        st.session_state["translation_job"] = translation_key
+                        st.session_state["translation_submitted_at"] = time.time()
+                
+                if st.session_state.get("translation_job") == translation_key:
+                    job = jobs.get(translation_key)
+                    if job is not None:
+                        show_translation_job(job, uploaded_file.name, st.session_state["translation_submitted_at"])
             
             with tab2:
                 # Bouton pour démarrer l'analyse et le résumé
@@ -427,61 +381,17 @@ with col1:
                     if not ollama_available:
                         st.error("Ollama n'est pas connecté. Vérifiez votre installation.")
                     else:
-                        # Enregistrer le fichier temporaire
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.srt') as temp_file:
-                            temp_file.write(uploaded_file.getvalue())
-                            input_path = temp_file.name
-                        
-                        try:
-                            # Lancer l'analyse
-                            result = analyze_srt_file(input_path, model_name)
-                            
-                            if result:
-                                # Afficher le résumé et les informations
-                                st.markdown(f"""
-                                <div class="summary-box">
-                                    <div class="summary-title">📝 Résumé du contenu</div>
-                                    <div class="summary-content">{result['summary']}</div>
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Afficher les informations du fichier
-                                info_col1, info_col2, info_col3 = st.columns(3)
-                                with info_col1:
-                                    st.markdown(f"""
-                                    <div class="info-badge">🔤 Langue: {result['language_detected']}</div>
-                                    """, unsafe_allow_html=True)
-                                with info_col2:
-                                    st.markdown(f"""
-                                    <div class="info-badge">🔢 {result['subtitle_count']} sous-titres</div>
-                                    """, unsafe_allow_html=True)
-                                with info_col3:
-                                    st.markdown(f"""
-                                    <div class="info-badge">⏱️ {result['duration_minutes']} minutes</div>
-                                    """, unsafe_allow_html=True)
-                                
-                                # Afficher des exemples de sous-titres
-                                if result['sample_subtitles']:
-                                    with st.expander("Exemples de sous-titres", expanded=False):
-                                        for sample in result['sample_subtitles']:
-                                            st.markdown(f"""
-                                            <div class="sample-subtitle">
-                                                <strong>{sample['start']} → {sample['end']}</strong><br>
-                                                {sample['text']}
-                                            </div>
-                                            """, unsafe_allow_html=True)
-                            else:
-                                st.error("Impossible d'analyser le fichier. Veuillez réessayer.")
-                        
-                        except Exception as e:
-                            st.error(f"Erreur lors de l'analyse : {str(e)}")
-                        
-                        finally:
-                            # Nettoyer le fichier temporaire
-                            try:
-                                os.unlink(input_path)
-                            except:
-                                pass
+                        jobs.submit(summary_key, uploaded_file.name, run_summary, get_translator(model_name), file_bytes)
+                        st.session_state["summary_job"] = summary_key
+                
+                job = jobs.get(summary_key) if st.session_state.get("summary_job") == summary_key else None
+                if job is not None:
+                    if job.active:
+                        st.info(f"Analyse du fichier en cours... ({job.elapsed:.0f}s)")
+                    elif job.status == FAILED:
+                        st.error(f"Erreur lors de l'analyse : {job.error}")
+                    else:
+                        show_summary(job.result)
         
         except Exception as e:
             st.error(f"Erreur de lecture du fichier : {str(e)}")
@@ -493,4 +403,13 @@ st.markdown("""
     <p>Le Traducteur SRT utilise Ollama pour traduire des sous-titres de l'anglais vers le français.</p>
     <p>Pour de meilleures performances, utilisez le modèle Mistral.</p>
 </div>
-""", unsafe_allow_html=True) 
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Suivi des tâches en arrière-plan : réexécuter la page tant qu'une tâche de cette session tourne
+running = [
+    get_job_manager().get(st.session_state[name])
+    for name in ("translation_job", "summary_job") if name in st.session_state
+]
+if any(job is not None and job.active for job in running):
+    time.sleep(1)
+    st.rerun()
\ No newline at end of file
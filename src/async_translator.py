@@ -0,0 +1,538 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+import concurrent.futures
+import random
+import threading
+import time
+from typing import List
+from progress_events import (
+    TranslationStarted, CuesCompleted, BatchCompleted, RetryScheduled, TranslationFinished,
+    TqdmProgress, combine
+)
+from profiling import span, async_span
+
+# Résultats possibles d'une requête envoyée à Ollama
+OUTCOME_OK = "ok"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_SERVER_ERROR = "server_error"  # Codes HTTP 5xx
+OUTCOME_OVERLOADED = "overloaded"      # Codes HTTP 429 / 503 : file d'attente du serveur pleine
+OUTCOME_CLIENT_ERROR = "client_error"  # Autres codes HTTP (modèle inconnu, etc.)
+OUTCOME_ERROR = "error"                # Erreur de connexion ou réponse illisible
+OUTCOME_MISALIGNED = "misaligned"      # Réponse groupée mal numérotée
+
+# Signaux de surcharge du serveur qui font reculer la concurrence
+OVERLOAD_OUTCOMES = (OUTCOME_TIMEOUT, OUTCOME_SERVER_ERROR, OUTCOME_OVERLOADED)
+# Échecs pour lesquels une nouvelle tentative a des chances d'aboutir
+RETRYABLE_OUTCOMES = (OUTCOME_TIMEOUT, OUTCOME_SERVER_ERROR, OUTCOME_OVERLOADED)
+# Échecs d'une requête groupée pour lesquels la subdivision du groupe a un sens
+SPLITTABLE_OUTCOMES = (OUTCOME_MISALIGNED, OUTCOME_TIMEOUT, OUTCOME_SERVER_ERROR)
+
+# Ordre d'envoi des requêtes d'un lot
+SCHEDULE_LONGEST_FIRST = "longest_first"  # Les plus coûteuses d'abord, les courtes comblent les trous
+SCHEDULE_FIFO = "fifo"                    # Ordre du fichier
+
+# Coût fixe d'une requête (évaluation du prompt), en caractères équivalents
+REQUEST_OVERHEAD_CHARS = 40
+
+
+def outcome_for_status(status_code: int) -> str:
+    """Classe un code HTTP d'erreur retourné par Ollama"""
+    if status_code in (429, 503):
+        return OUTCOME_OVERLOADED
+    if status_code >= 500:
+        return OUTCOME_SERVER_ERROR
+    return OUTCOME_CLIENT_ERROR
+
+
+def estimate_cost(texts: List[str]) -> int:
+    """Coût estimé d'une requête : la génération est proportionnelle à la longueur du texte"""
+    return REQUEST_OVERHEAD_CHARS + sum(len(text) for text in texts)
+
+
+class AdaptiveConcurrency:
+    """Limite de concurrence adaptative de type AIMD (augmentation additive, diminution multiplicative)
+
+    La limite augmente d'environ 1 par fenêtre de requêtes tant que la latence reste
+    stable par rapport à la référence observée, et est divisée sur un timeout ou une
+    erreur 5xx. Jusqu'à la première surcharge (démarrage lent, comme TCP), elle augmente
+    de 1 par requête réussie : elle double à chaque fenêtre, même quand les premières
+    requêtes sont longues. Une seule diminution est appliquée par fenêtre pour qu'une rafale
+    d'échecs simultanés ne fasse pas tomber la limite au minimum.
+    """
+
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 8,
+                 latency_tolerance: float = 1.5, backoff: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.baseline = None   # Latence normalisée de référence (la meilleure observée)
+        self.smoothed = None   # Latence normalisée récente (moyenne glissante)
+        self.epoch = 0         # Incrémenté à chaque diminution
+        self.slow_start = True  # Croissance exponentielle jusqu'à la première surcharge
+        self._waiters = collections.deque()
+        self.stats = {
+            "increases": 0,
+            "decreases": 0,
+            "peak_limit": int(self.limit)
+        }
+
+    @property
+    def current_limit(self) -> int:
+        """Nombre maximal de requêtes simultanées autorisées actuellement"""
+        return max(self.minimum, int(self.limit))
+
+    async def acquire(self) -> int:
+        """Attend une place libre et retourne la fenêtre (epoch) d'acquisition"""
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            return self.epoch
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Place accordée juste avant l'annulation : elle ne sera jamais utilisée
+                self.release()
+            raise
+        return self.epoch
+
+    def release(self):
+        """Libère une place et réveille les requêtes en attente si la limite le permet"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self, latency: float, cost: int = 0):
+        """Enregistre une requête réussie et augmente la limite si la latence est stable"""
+        # La latence dépend de la longueur du texte : on la ramène à un texte de référence
+        normalized = latency / (1.0 + cost / 100.0)
+        self.smoothed = normalized if self.smoothed is None else 0.8 * self.smoothed + 0.2 * normalized
+        if self.baseline is None or self.smoothed < self.baseline:
+            self.baseline = self.smoothed
+        else:
+            # Dérive lente pour suivre un changement durable de la charge du serveur
+            self.baseline = 0.99 * self.baseline + 0.01 * self.smoothed
+
+        if self.smoothed <= self.baseline * self.latency_tolerance and self.limit < self.maximum:
+            previous = self.current_limit
+            step = 1.0 if self.slow_start else 1.0 / self.limit
+            self.limit = min(float(self.maximum), self.limit + step)
+            if self.current_limit > previous:
+                self.stats["increases"] += 1
+                self.stats["peak_limit"] = max(self.stats["peak_limit"], self.current_limit)
+                self._wake()
+
+    def on_overload(self, epoch: int):
+        """Réduit la limite après un timeout ou une erreur 5xx"""
+        if epoch != self.epoch:
+            # Requête partie avant la dernière diminution : déjà prise en compte
+            return
+        self.epoch += 1
+        self.slow_start = False
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        self.stats["decreases"] += 1
+
+
+class BackpressureScheduler:
+    """Ordonnanceur qui rythme les requêtes à partir des signaux du serveur
+
+    Il remplace les pauses fixes : la concurrence suit la limite AIMD, et le délai avant
+    une nouvelle tentative dépend de la latence observée, du type d'échec (timeout,
+    code HTTP) et de la profondeur de la file locale. Le temps qu'une requête passera
+    de toute façon à attendre dans la file est déduit du délai. En mode sans limitation
+    (`throttle=False`, pour une machine GPU dédiée), la concurrence reste au maximum et
+    les nouvelles tentatives partent immédiatement.
+    """
+
+    def __init__(self, max_concurrency: int = 8, initial_concurrency: int = 2,
+                 throttle: bool = True, max_delay: float = 30.0):
+        self.throttle = throttle
+        self.max_delay = max_delay
+        initial = initial_concurrency if throttle else max_concurrency
+        self.limiter = AdaptiveConcurrency(initial=initial, maximum=max_concurrency)
+        self.latency = None  # Latence moyenne récente (secondes, non normalisée)
+        self.stats = {
+            "timeouts": 0,
+            "server_errors": 0,
+            "overloaded": 0,
+            "retry_wait": 0.0
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        """Nombre de requêtes qui attendent une place"""
+        return len(self.limiter._waiters)
+
+    async def acquire(self) -> int:
+        return await self.limiter.acquire()
+
+    def release(self):
+        self.limiter.release()
+
+    def on_result(self, outcome: str, latency: float, cost: int, epoch: int):
+        """Met à jour l'état de l'ordonnanceur après une requête"""
+        if outcome == OUTCOME_OK:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.throttle:
+                self.limiter.on_success(latency, cost)
+            return
+
+        if outcome == OUTCOME_TIMEOUT:
+            self.stats["timeouts"] += 1
+        elif outcome == OUTCOME_OVERLOADED:
+            self.stats["overloaded"] += 1
+        elif outcome == OUTCOME_SERVER_ERROR:
+            self.stats["server_errors"] += 1
+        if outcome in OVERLOAD_OUTCOMES and self.throttle:
+            self.limiter.on_overload(epoch)
+
+    def retry_delay(self, outcome: str, attempt: int) -> float:
+        """Délai avant une nouvelle tentative, calculé à partir des signaux du serveur"""
+        if not self.throttle:
+            return 0.0
+
+        service_time = self.latency if self.latency is not None else 1.0
+        if outcome == OUTCOME_OVERLOADED:
+            # File du serveur pleine : attendre qu'une génération se termine
+            base = max(1.0, service_time)
+        elif outcome == OUTCOME_TIMEOUT:
+            # Le serveur est lent : laisser passer environ une génération
+            base = service_time
+        else:
+            base = 0.5
+
+        delay = min(self.max_delay, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        # L'attente dans la file locale espace déjà les requêtes
+        expected_queue_wait = self.queue_depth * service_time / self.limiter.current_limit
+        delay = max(0.0, delay - expected_queue_wait)
+        self.stats["retry_wait"] += delay
+        return delay
+
+    def describe(self) -> str:
+        """Résumé lisible de l'état de l'ordonnanceur"""
+        if not self.throttle:
+            return f"Ordonnanceur sans limitation: {self.limiter.current_limit} requêtes simultanées"
+        return (f"Concurrence adaptative: limite finale {self.limiter.current_limit} "
+                f"(pic {self.limiter.stats['peak_limit']}, {self.limiter.stats['decreases']} réductions, "
+                f"{self.stats['retry_wait']:.1f}s d'attente avant nouvelles tentatives)")
+
+
+class AsyncOllamaTranslator:
+    """Moteur de traduction asyncio au-dessus d'un OllamaTranslator
+
+    Les requêtes HTTP bloquantes du traducteur sont exécutées dans un pool de threads,
+    la boucle asyncio décidant combien sont en vol grâce à une limite AIMD. Le moteur a
+    sa propre boucle, dans un thread qui vit aussi longtemps que lui : les lots lancés
+    depuis plusieurs threads (démon, tâches de l'interface) partagent la même file et la
+    même limite au lieu de se disputer l'état du limiteur depuis des boucles différentes.
+    """
+
+    def __init__(self, translator, max_concurrency: int = 8, initial_concurrency: int = 2, throttle: bool = True,
+                 schedule: str = SCHEDULE_LONGEST_FIRST):
+        """Initialise le moteur
+
+        Args:
+            translator (OllamaTranslator): Traducteur qui effectue les requêtes
+            max_concurrency (int): Nombre maximal de requêtes simultanées
+            initial_concurrency (int): Nombre de requêtes simultanées au démarrage
+            throttle (bool): False pour désactiver toute limitation (machine GPU dédiée)
+            schedule (str): Ordre d'envoi des requêtes, "longest_first" ou "fifo"
+        """
+        self.translator = translator
+        self.schedule = schedule
+        self.scheduler = BackpressureScheduler(max_concurrency, initial_concurrency, throttle)
+        self.limiter = self.scheduler.limiter
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ollama"
+        )
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Démarre la boucle du moteur au premier lot"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="ollama-engine",
+                                                     daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coroutine):
+        """Exécute une coroutine dans la boucle du moteur et attend son résultat
+
+        Utilisable depuis n'importe quel thread, y compris un thread où une autre boucle
+        asyncio tourne déjà (Jupyter, etc.), mais pas depuis la boucle du moteur elle-même.
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._loop_thread:
+            coroutine.close()
+            raise RuntimeError("run() appelé depuis la boucle du moteur : utiliser await")
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        try:
+            return future.result()
+        except BaseException:
+            # Interruption de l'appelant (Ctrl+C...) : le lot est abandonné dans la boucle aussi
+            future.cancel()
+            raise
+
+    async def _call(self, cost: int, function, *args):
+        """Exécute une requête bloquante dans le pool en respectant la limite de concurrence
+
+        Returns:
+            tuple: (résultat, outcome) tels que retournés par `function`
+        """
+        with async_span("queue_wait"):
+            epoch = await self.scheduler.acquire()
+        start_time = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, outcome = await loop.run_in_executor(self._executor, function, *args)
+        finally:
+            self.scheduler.release()
+
+        self.scheduler.on_result(outcome, time.time() - start_time, cost, epoch)
+        return result, outcome
+
+    async def translate_text(self, text: str, retries: int = None, emit=None) -> str:
+        """Traduit un texte avec nouvelles tentatives sur timeout ou erreur serveur
+
+        Si le même texte est déjà en cours de traduction (autre lot, autre thread), le
+        résultat de cette requête est attendu au lieu d'en envoyer une seconde.
+        """
+        future, owner = self.translator.flights.begin(text)
+        if not owner:
+            with self.translator._stats_lock:
+                self.translator.stats["coalesced"] += 1
+            self.translator.metrics.observe_cache("coalesced")
+            return await asyncio.wrap_future(future)
+        translation = text
+        try:
+            translation = await self._translate_text(text, retries, emit)
+        finally:
+            self.translator.flights.finish(text, translation)
+        return translation
+
+    async def _translate_text(self, text: str, retries: int = None, emit=None) -> str:
+        if retries is None:
+            # Les textes longs ont droit à une tentative de plus
+            retries = 4 if len(text) >= 200 else 3
+
+        translation = text
+        for attempt in range(retries + 1):
+            # Un autre sous-titre identique a peut-être été traduit entre-temps
+            if text in self.translator.cache:
+                self.translator.metrics.observe_cache("cache")
+                return self.translator.cache[text]
+
+            translation, outcome = await self._call(len(text), self.translator._request_translation_outcome, text)
+            if outcome not in RETRYABLE_OUTCOMES or attempt == retries:
+                return translation
+
+            wait_time = self.scheduler.retry_delay(outcome, attempt)
+            print(f"Nouvelle tentative après {outcome}. Attente de {wait_time:.1f}s... (tentative {attempt+1}/{retries+1})")
+            if emit is not None:
+                emit(RetryScheduled(attempt + 1, retries + 1, outcome, wait_time))
+            if wait_time > 0:
+                with async_span("retry_sleep", outcome=outcome):
+                    await asyncio.sleep(wait_time)
+        return translation
+
+    async def translate_pack(self, texts: List[str], emit=None) -> List[str]:
+        """Traduit un groupe de sous-titres en une requête, en le coupant en deux si la réponse est invalide"""
+        if len(texts) == 1:
+            return [await self._translate_text(texts[0], emit=emit)]
+
+        cost = sum(len(text) for text in texts)
+        for attempt in range(4):
+            translations, outcome = await self._call(cost, self.translator._request_packed, texts)
+            if outcome != OUTCOME_OVERLOADED or attempt == 3:
+                break
+            # Serveur saturé : renvoyer le même groupe plus tard plutôt que le découper
+            wait_time = self.scheduler.retry_delay(outcome, attempt)
+            if emit is not None:
+                emit(RetryScheduled(attempt + 1, 4, outcome, wait_time))
+            if wait_time > 0:
+                with async_span("retry_sleep", outcome=outcome):
+                    await asyncio.sleep(wait_time)
+        if outcome == OUTCOME_OK:
+            return translations
+        if outcome not in SPLITTABLE_OUTCOMES:
+            # Serveur injoignable ou requête refusée : inutile de multiplier les requêtes
+            return list(texts)
+
+        # Lignes déjà récupérées d'une réponse interrompue (streaming) : seules les autres sont renvoyées
+        pending = [text for text in texts if text not in self.translator.cache]
+        if 0 < len(pending) < len(texts):
+            translated = dict(zip(pending, await self.translate_pack(pending, emit)))
+            return [translated[text] if text in translated else self.translator.cache[text] for text in texts]
+        if not pending:
+            return [self.translator.cache[text] for text in texts]
+
+        # Repli par dichotomie : deux demi-groupes ont plus de chances d'être bien alignés
+        with self.translator._stats_lock:
+            self.translator.stats["packed_fallbacks"] += 1
+        middle = len(texts) // 2
+        print(f"Subdivision du groupe de {len(texts)} sous-titres en {middle} + {len(texts) - middle}")
+        left, right = await asyncio.gather(self.translate_pack(texts[:middle], emit), self.translate_pack(texts[middle:], emit))
+        return left + right
+
+    async def translate_batch(self, texts: List[str], batch_size: int = 10, on_result=None, on_event=None) -> List[str]:
+        """Traduit un lot de textes de manière concurrente
+
+        En mode groupé, chaque requête contient `batch_size` sous-titres. Sinon chaque
+        sous-titre est une requête et `batch_size` ne sert qu'au rapport de progression.
+
+        Args:
+            on_result (callable, optional): Appelé avec (indice dans `texts`, traduction)
+                dès qu'un texte est traduit avec succès
+            on_event (callable, optional): Reçoit les événements de progression
+                (voir progress_events). Par défaut, une barre tqdm est affichée.
+        """
+        if not texts:
+            return []
+
+        emit = combine(self.translator._record_event, on_event if on_event is not None else TqdmProgress())
+        start_time = time.time()
+
+        with span("plan", cues=len(texts)):
+            results, to_translate, indices = self.translator._plan_batch(texts, emit)
+        # to_translate ne contient qu'une fois chaque texte, indices[k] liste ses positions
+        pending = sum(len(positions) for positions in indices)
+        total_batches = (len(to_translate) + batch_size - 1) // batch_size
+        cached = sum(1 for text in texts if text and text.strip()) - pending
+        if on_result is not None and cached:
+            # Traductions déjà connues (cache, mémoire, forme normalisée) : des succès aussi
+            waiting = {i for positions in indices for i in positions}
+            for i, text in enumerate(texts):
+                if text and text.strip() and i not in waiting:
+                    on_result(i, results[i])
+        emit(TranslationStarted(pending, cached, total_batches))
+        if not to_translate:
+            emit(TranslationFinished(0, time.time() - start_time))
+            return results
+
+        print(f"Traduction de {pending} sous-titres ({len(to_translate)} textes uniques) en {total_batches} batches...")
+
+        # Les textes qui ne diffèrent que par leur forme (casse, ponctuation, nombres...)
+        # ne sont envoyés qu'une fois : les suivants réutilisent la traduction du premier
+        leaders = []
+        followers = {}
+        first_by_key = {}
+        for k, text in enumerate(to_translate):
+            key = self.translator._cache_key(text)
+            if key is not None and key in first_by_key:
+                followers.setdefault(first_by_key[key], []).append(k)
+            else:
+                if key is not None:
+                    first_by_key[key] = k
+                leaders.append(k)
+
+        # Unités de travail : un groupe par requête en mode groupé, un sous-titre sinon
+        # (les groupes restent des sous-titres consécutifs, pour le contexte)
+        if self.translator.packed:
+            units = [leaders[i:i + batch_size] for i in range(0, len(leaders), batch_size)]
+        else:
+            units = [[k] for k in leaders]
+        if self.schedule == SCHEDULE_LONGEST_FIRST:
+            # Toutes les unités attendent une place dans une file commune, dans l'ordre de
+            # création : les plus longues partent d'abord et les courtes remplissent les places
+            # libérées, aucune requête longue ne reste seule à la fin du lot
+            units.sort(key=lambda unit: estimate_cost([to_translate[k] for k in unit]), reverse=True)
+            limiter = self.limiter
+            if self.scheduler.throttle and limiter.slow_start and len(units) > limiter.maximum:
+                # Limite encore en phase de démarrage : quelques requêtes courtes d'abord, qui
+                # la font monter en quelques dixièmes de seconde avant les plus longues
+                probes = limiter.maximum - limiter.current_limit
+                units = units[len(units) - probes:][::-1] + units[:len(units) - probes]
+
+        remaining_per_batch = [min(batch_size, len(to_translate) - b * batch_size) for b in range(total_batches)]
+        progress = {"processed": 0, "batches_done": 0}
+
+        def finish(units_done, translations):
+            completed_batches = []
+            count = 0
+            for k, translation in zip(units_done, translations):
+                # Une traduction par texte unique, recopiée à toutes ses positions
+                for i in indices[k]:
+                    results[i] = translation
+                    # Seules les traductions réussies sont mises en cache
+                    if on_result is not None and to_translate[k] in self.translator.cache:
+                        on_result(i, translation)
+                count += len(indices[k])
+                remaining_per_batch[k // batch_size] -= 1
+                if remaining_per_batch[k // batch_size] == 0:
+                    progress["batches_done"] += 1
+                    completed_batches.append(progress["batches_done"])
+            progress["processed"] += count
+
+            emit(CuesCompleted(count, progress["processed"], pending))
+            for batch_num in completed_batches:
+                print(f"✓ Batch {batch_num}/{total_batches} terminé ({progress['processed']}/{pending})")
+                emit(BatchCompleted(batch_num, total_batches, progress["processed"], pending,
+                                    time.time() - start_time))
+
+        async def resolve_follower(k):
+            translation, source = self.translator._lookup(to_translate[k])
+            if translation is None:
+                # Traduction non partageable (nombre reformaté, échec du premier) : requête dédiée
+                return await self.translate_text(to_translate[k], emit=emit)
+            self.translator.metrics.observe_cache(source)
+            return translation
+
+        async def run_pack(unit):
+            # Les textes déjà en cours de traduction ailleurs ne sont pas renvoyés dans le groupe
+            owned, shared = [], []
+            for k in unit:
+                future, owner = self.translator.flights.begin(to_translate[k])
+                (owned if owner else shared).append((k, future))
+            if owned:
+                owned_texts = [to_translate[k] for k, _ in owned]
+                translations = owned_texts
+                try:
+                    translations = await self.translate_pack(owned_texts, emit)
+                finally:
+                    for text, translation in zip(owned_texts, translations):
+                        self.translator.flights.finish(text, translation)
+                finish([k for k, _ in owned], translations)
+            if shared:
+                with self.translator._stats_lock:
+                    self.translator.stats["coalesced"] += len(shared)
+                self.translator.metrics.observe_cache("coalesced", len(shared))
+                finish([k for k, _ in shared], await asyncio.gather(*(asyncio.wrap_future(f) for _, f in shared)))
+
+        async def run_unit(unit):
+            if self.translator.packed:
+                await run_pack(unit)
+            else:
+                finish(unit, [await self.translate_text(to_translate[unit[0]], emit=emit)])
+
+            waiting = [f for k in unit for f in followers.get(k, [])]
+            if waiting:
+                finish(waiting, await asyncio.gather(*(resolve_follower(f) for f in waiting)))
+
+        try:
+            await asyncio.gather(*(run_unit(unit) for unit in units))
+        finally:
+            emit(TranslationFinished(pending, time.time() - start_time))
+
+        print(self.scheduler.describe())
+        if self.translator.hedging is not None:
+            print(self.translator.hedging.describe())
+        if len(self.translator.pool) > 1:
+            print(self.translator.pool.describe())
+        return results
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Pool de serveurs Ollama avec répartition de charge et contrôle de santé
+
+Les requêtes sont envoyées au serveur qui a le moins de requêtes en cours, pondéré par
+sa latence observée. Un serveur injoignable est retiré de la rotation jusqu'à ce que le
+contrôle périodique de /api/tags le retrouve en bonne santé.
+"""
+
+import os
+import threading
+from typing import List
+
+# Variable d'environnement listant les serveurs : "hote1:11434,hote2:11434"
+ENDPOINTS_ENV = "OLLAMA_HOSTS"
+DEFAULT_PORT = 11434
+
+# Stratégies de répartition
+STRATEGY_LATENCY = "latency"                # Requêtes en cours x latence moyenne
+STRATEGY_LEAST_OUTSTANDING = "least_outstanding"
+
+
+def parse_endpoints(spec) -> List[tuple]:
+    """Convertit "hote:port,hote2" ou une liste de chaînes/tuples en liste de (hôte, port)"""
+    if not spec:
+        return []
+    if isinstance(spec, str):
+        spec = [part for part in spec.split(",") if part.strip()]
+    endpoints = []
+    for endpoint in spec:
+        if isinstance(endpoint, (tuple, list)):
+            endpoints.append((endpoint[0], int(endpoint[1])))
+            continue
+        endpoint = endpoint.strip()
+        if "://" in endpoint:
+            endpoint = endpoint.split("://", 1)[1]
+        endpoint = endpoint.rstrip("/")
+        host, _, port = endpoint.rpartition(":")
+        if not host or not port.isdigit():
+            host, port = endpoint, DEFAULT_PORT
+        endpoints.append((host, int(port)))
+    return endpoints
+
+
+def endpoints_from_env() -> List[tuple]:
+    """Serveurs déclarés dans la variable d'environnement OLLAMA_HOSTS"""
+    return parse_endpoints(os.environ.get(ENDPOINTS_ENV, ""))
+
+
+class Backend:
+    """Un serveur Ollama du pool et ses statistiques"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self.base_url = f"http://{host}:{port}"
+        self.api_url = f"{self.base_url}/api/generate"
+        self.healthy = True
+        self.last_error = None
+        self.outstanding = 0
+        self.latency = None  # Moyenne mobile exponentielle de la latence (secondes)
+        self.stats = {
+            "requests": 0,
+            "success": 0,
+            "errors": 0,
+            "tokens": 0,
+            "cancelled": 0,
+            "busy_time": 0.0
+        }
+
+    def report(self) -> dict:
+        """Statistiques de débit du serveur"""
+        busy_time = self.stats["busy_time"]
+        return {
+            "backend": self.name,
+            "healthy": self.healthy,
+            "requests": self.stats["requests"],
+            "success": self.stats["success"],
+            "errors": self.stats["errors"],
+            "cancelled": self.stats["cancelled"],
+            "tokens": self.stats["tokens"],
+            "avg_latency": busy_time / self.stats["requests"] if self.stats["requests"] else 0.0,
+            "tokens_per_second": self.stats["tokens"] / busy_time if busy_time > 0 else 0.0
+        }
+
+
+class BackendPool:
+    """Répartit les requêtes entre plusieurs serveurs Ollama"""
+
+    def __init__(self, endpoints, session, strategy: str = STRATEGY_LATENCY,
+                 health_interval: float = 30.0, model_name: str = None):
+        """Crée le pool
+
+        Args:
+            endpoints: Liste de (hôte, port) ou chaînes "hôte:port"
+            session: Session HTTP (PooledSession) utilisée pour les contrôles de santé
+            strategy (str): "latency" ou "least_outstanding"
+            health_interval (float): Intervalle des contrôles de /api/tags (0 pour les désactiver)
+            model_name (str, optional): Un serveur sans ce modèle est considéré hors service
+        """
+        self.backends = [Backend(host, port) for host, port in parse_endpoints(endpoints)]
+        if not self.backends:
+            raise ValueError("Aucun serveur Ollama configuré")
+        self.session = session
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def __len__(self):
+        return len(self.backends)
+
+    @property
+    def primary(self) -> Backend:
+        """Premier serveur en bonne santé (ou le premier configuré)"""
+        for backend in self.backends:
+            if backend.healthy:
+                return backend
+        return self.backends[0]
+
+    def _score(self, backend: Backend, default_latency: float) -> float:
+        if self.strategy == STRATEGY_LEAST_OUTSTANDING:
+            return backend.outstanding
+        # Un serveur jamais mesuré prend la meilleure latence connue pour être essayé
+        latency = backend.latency if backend.latency is not None else default_latency
+        return (backend.outstanding + 1) * latency
+
+    def acquire(self, exclude=()) -> Backend:
+        """Choisit le serveur de la prochaine requête et la compte comme en cours"""
+        with self._lock:
+            candidates = [b for b in self.backends if b.healthy and b not in exclude]
+            if not candidates:
+                # Aucun serveur sain : tenter quand même plutôt que d'échouer sans essayer
+                candidates = [b for b in self.backends if b not in exclude] or self.backends
+            known = [b.latency for b in candidates if b.latency is not None]
+            default_latency = min(known) if known else 1.0
+            backend = min(candidates, key=lambda b: self._score(b, default_latency))
+            backend.outstanding += 1
+            backend.stats["requests"] += 1
+            return backend
+
+    def release(self, backend: Backend, latency: float, success: bool, tokens: int = 0, cancelled: bool = False):
+        """Enregistre la fin d'une requête sur un serveur (`cancelled` : interrompue par le client)"""
+        with self._lock:
+            backend.outstanding -= 1
+            backend.stats["busy_time"] += latency
+            if cancelled:
+                backend.stats["cancelled"] += 1
+            elif success:
+                backend.stats["success"] += 1
+                backend.stats["tokens"] += tokens
+                backend.latency = latency if backend.latency is None else 0.8 * backend.latency + 0.2 * latency
+            else:
+                backend.stats["errors"] += 1
+
+    def mark_unhealthy(self, backend: Backend, reason: str):
+        """Retire un serveur de la rotation jusqu'au prochain contrôle de santé réussi"""
+        with self._lock:
+            was_healthy = backend.healthy
+            backend.healthy = False
+            backend.last_error = reason
+        if was_healthy:
+            print(f"⚠️ Serveur Ollama {backend.name} retiré de la rotation: {reason}")
+        self.start_health_checks()
+
+    def check_health(self) -> int:
+        """Interroge /api/tags sur chaque serveur et met à jour leur état
+
+        Returns:
+            int: Nombre de serveurs en bonne santé
+        """
+        for backend in self.backends:
+            reason = None
+            try:
+                response = self.session.get(f"{backend.base_url}/api/tags", timeout=5)
+                if response.status_code != 200:
+                    reason = f"code {response.status_code}"
+                elif self.model_name:
+                    models = [model.get("name", "") for model in response.json().get("models", [])]
+                    if models and not any(name.split(":")[0] == self.model_name.split(":")[0] for name in models):
+                        reason = f"modèle {self.model_name} absent"
+            except Exception as e:
+                reason = str(e)
+
+            with self._lock:
+                was_healthy = backend.healthy
+                backend.healthy = reason is None
+                backend.last_error = reason
+            if reason is not None and was_healthy:
+                print(f"⚠️ Serveur Ollama {backend.name} retiré de la rotation: {reason}")
+            elif reason is None and not was_healthy:
+                print(f"✓ Serveur Ollama {backend.name} de retour dans la rotation")
+        return sum(1 for backend in self.backends if backend.healthy)
+
+    def start_health_checks(self):
+        """Démarre les contrôles de santé périodiques (une seule fois)"""
+        if self.health_interval <= 0 or len(self.backends) < 2:
+            return
+        with self._lock:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def stop(self):
+        """Arrête les contrôles de santé"""
+        self._stop.set()
+
+    def report(self) -> List[dict]:
+        """Statistiques de débit par serveur"""
+        with self._lock:
+            return [backend.report() for backend in self.backends]
+
+    def describe(self) -> str:
+        """Résumé lisible du débit par serveur"""
+        lines = []
+        for entry in self.report():
+            state = "✓" if entry["healthy"] else "✗"
+            lines.append(f"🖥️ {state} {entry['backend']}: {entry['success']}/{entry['requests']} requêtes, "
+                         f"latence moyenne {entry['avg_latency']:.2f}s, {entry['tokens_per_second']:.1f} tokens/s")
+        return "\n".join(lines)
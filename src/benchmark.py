@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Banc d'essai de bout en bout du débit de traduction
+
+Lance un ou plusieurs serveurs Ollama simulés (ou utilise de vrais serveurs avec --endpoints) puis
+mesure OllamaTranslator.translate_batch et SRTTranslator.translate_srt_file sur les
+fichiers de srt-files/ et sur des corpus synthétiques agrandis, pour plusieurs
+configurations du traducteur. Les résultats (sous-titres/s, latence p50/p95, temps
+total) sont écrits en JSON pour être comparés d'un commit à l'autre.
+
+Usage: python src/benchmark.py [--scale 500 2000] [--output bench.json]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pysrt
+
+from mock_ollama_server import MockOllamaServer, MockConfig
+from backend_pool import parse_endpoints
+from ollama_translator import OllamaTranslator
+from async_translator import SCHEDULE_LONGEST_FIRST
+from srt_translator import SRTTranslator
+import subtitle_pipeline
+from subtitle_pipeline import MergeOptions
+from cue_table import CueTable, read_srt, write_srt
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Configurations du traducteur comparées par défaut
+CONFIGURATIONS = {
+    "sequentiel": {"max_concurrency": 1, "packed": False, "throttle": True, "batch_size": 10},
+    "adaptatif": {"max_concurrency": 8, "packed": False, "throttle": True, "batch_size": 10},
+    # Ordre du fichier au lieu des sous-titres les plus longs d'abord (comparaison de l'ordonnancement)
+    "adaptatif-fifo": {"max_concurrency": 8, "packed": False, "throttle": True, "batch_size": 10,
+                       "schedule": "fifo"},
+    "sans-limitation": {"max_concurrency": 8, "packed": False, "throttle": False, "batch_size": 10},
+    "groupe-10": {"max_concurrency": 4, "packed": True, "throttle": True, "batch_size": 10},
+    "groupe-10-fifo": {"max_concurrency": 4, "packed": True, "throttle": True, "batch_size": 10,
+                       "schedule": "fifo"},
+    "streaming": {"max_concurrency": 8, "packed": False, "throttle": True, "batch_size": 10, "stream": True},
+    # Requêtes plus lentes que le p90 doublées (au plus 10 % de requêtes en plus)
+    "secours-p90": {"max_concurrency": 8, "packed": False, "throttle": True, "batch_size": 10,
+                    "hedge_percentile": 0.9, "hedge_budget": 0.1},
+}
+
+# Seuils de fusion comparés par le banc d'essai de fusion
+MERGE_CONFIGURATIONS = {
+    "defaut": MergeOptions(),
+    "strict": MergeOptions(max_gap_ms=300, max_chars=60, max_duration_ms=7000),
+    "compact": MergeOptions(max_gap_ms=1500, max_chars=120, max_duration_ms=15000),
+}
+
+# Phrases récurrentes mêlées aux corpus synthétiques (génériques, formules toutes faites)
+STOCK_PHRASES = ["Thank you.", "Okay.", "Yeah.", "Welcome back to the show.", "See you next time."]
+# Mots des étiquettes qui rendent uniques les sous-titres synthétiques
+TAG_WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliett",
+             "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango",
+             "uniform", "victor", "whiskey", "xray", "yankee", "zulu"]
+
+
+class TimedTranslator(OllamaTranslator):
+    """OllamaTranslator qui mesure la latence de chaque requête HTTP"""
+
+    def __init__(self, *args, **kwargs):
+        self.latencies = []
+        self._latency_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _timed(self, function, *args):
+        start_time = time.time()
+        try:
+            return function(*args)
+        finally:
+            with self._latency_lock:
+                self.latencies.append(time.time() - start_time)
+
+    def _request_translation_outcome(self, text):
+        return self._timed(super()._request_translation_outcome, text)
+
+    def _request_packed(self, texts):
+        return self._timed(super()._request_packed, texts)
+
+
+def percentile(values, fraction):
+    """Percentile par rang le plus proche (0 si la liste est vide)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def current_commit():
+    """Commit git courant, pour comparer les résultats entre commits"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def word_tag(number: int) -> str:
+    """Écrit un entier en mots ("alpha", "bravo delta"...), que la normalisation n'ignore pas"""
+    words = []
+    while True:
+        words.append(TAG_WORDS[number % len(TAG_WORDS)])
+        number //= len(TAG_WORDS)
+        if number == 0:
+            return " ".join(reversed(words))
+        number -= 1
+
+
+def make_synthetic_srt(path, source_texts, count):
+    """Écrit un fichier SRT de `count` sous-titres construits à partir de textes réels
+
+    Un sous-titre sur dix est une phrase récurrente, les autres sont rendus uniques
+    (étiquette en toutes lettres, un numéro serait fusionné par la normalisation)
+    pour que le cache ne fausse pas la mesure.
+    """
+    cues = []
+    for i in range(count):
+        if i % 10 == 9:
+            text = STOCK_PHRASES[(i // 10) % len(STOCK_PHRASES)]
+        else:
+            text = f"{source_texts[i % len(source_texts)]} ({word_tag(i)})"
+        start = pysrt.SubRipTime.from_ordinal(i * 2000)
+        end = pysrt.SubRipTime.from_ordinal(i * 2000 + 1800)
+        cues.append(pysrt.SubRipItem(i + 1, start, end, text))
+    subtitle_pipeline.serialize_srt(cues, path)
+
+
+def make_caption_srt(path, source_texts, count, seed=0):
+    """Écrit un fichier SRT de `count` fragments façon sous-titres automatiques
+
+    Les phrases sont découpées en fragments de quelques mots, avec des répétitions et
+    des écarts variables (courts dans une phrase, plus longs entre deux phrases).
+    """
+    rng = random.Random(seed)
+    words = " ".join(source_texts).split()
+    table = CueTable()
+    time_ms = 0
+    position = 0
+    while len(table) < count:
+        size = rng.randint(2, 6)
+        text = " ".join(words[position:position + size]) or "Okay."
+        position = (position + size) % max(1, len(words) - 6)
+        duration = rng.randint(800, 3000)
+        table.append(time_ms, time_ms + duration, text)
+        if rng.random() < 0.05 and len(table) < count:
+            # Sous-titre répété (défilement des sous-titres automatiques)
+            table.append(time_ms + duration, time_ms + duration + 500, text)
+            duration += 500
+        draw = rng.random()
+        if draw < 0.6:
+            gap = rng.randint(0, 200)
+        elif draw < 0.9:
+            gap = rng.randint(200, 1500)
+        else:
+            gap = rng.randint(1500, 5000)
+        time_ms += duration + gap
+    write_srt(table, path)
+
+
+def bench_merge(path, options):
+    """Mesure la fusion des sous-titres d'un fichier avec des seuils donnés"""
+    start_time = time.perf_counter()
+    cues = read_srt(path)
+    parsed = time.perf_counter()
+    merged = subtitle_pipeline.merge_cues(cues, options)
+    elapsed = time.perf_counter() - parsed
+    return {
+        "cues": len(cues),
+        "merged_cues": len(merged),
+        "reduction": 1 - len(merged) / len(cues) if len(cues) else 0.0,
+        "avg_chars": sum(len(text) for text in merged.texts) / len(merged) if len(merged) else 0.0,
+        "parse_seconds": round(parsed - start_time, 3),
+        "merge_seconds": round(elapsed, 3),
+        "cues_per_second": len(cues) / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def measure(run, translator, cues):
+    """Exécute `run` et calcule les métriques de la configuration"""
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    wall = time.time() - start_time
+    return {
+        "cues": cues,
+        "wall_seconds": round(wall, 3),
+        "cues_per_second": round(cues / wall, 2) if wall > 0 else 0.0,
+        "requests": translator.stats["requests"],
+        "errors": translator.stats["errors"],
+        "timeouts": translator.stats["timeouts"],
+        "latency_p50": round(percentile(translator.latencies, 0.50), 4),
+        "latency_p95": round(percentile(translator.latencies, 0.95), 4),
+        "ttft_mean": round(translator.stats["first_token_time"] / translator.stats["streamed"], 4)
+        if translator.stats["streamed"] else None,
+        # Chargement du modèle mesuré à part pour ne pas fausser le débit
+        "warm_up_seconds": round(translator.stats["warm_up_time"], 3),
+        "first_request_seconds": round(translator.stats["first_request_time"] or 0, 4),
+        "model_loads": translator.stats["model_loads"],
+        "normalized_hits": translator.stats["normalized_hits"],
+        "backends": translator.pool.report() if len(translator.pool) > 1 else None,
+        "hedging": translator.hedging.report() if translator.hedging is not None else None
+    }
+
+
+def make_translator(endpoints, config):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return TimedTranslator(endpoints=endpoints, use_memory=False, packed=config["packed"],
+                               max_concurrency=config["max_concurrency"], throttle=config["throttle"],
+                               stream=config.get("stream", False),
+                               schedule=config.get("schedule", SCHEDULE_LONGEST_FIRST),
+                               profile_path=None,  # Profil appris en mémoire seulement
+                               hedge_percentile=config.get("hedge_percentile"),
+                               hedge_budget=config.get("hedge_budget", 0.05))
+
+
+def bench_translate_batch(endpoints, config, texts):
+    translator = make_translator(endpoints, config)
+    return measure(lambda: translator.translate_batch(texts, config["batch_size"], on_event=lambda event: None),
+                   translator, len(texts))
+
+
+def bench_translate_srt_files(endpoints, config, files, work_dir):
+    """Traduction de fichiers complets (fusion et filtrage compris)
+
+    Le débit est compté en sous-titres réellement traduits, après fusion et filtrage,
+    pour rester comparable aux lignes translate_batch ; `raw_cues` donne le nombre de
+    sous-titres des fichiers d'origine.
+    """
+    translator = make_translator(endpoints, config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        srt = SRTTranslator(translator=translator, max_concurrency=config["max_concurrency"])
+        cues = sum(len(srt._prepare_subtitles(path, merge_duplicates=True, filter_noise=True)) for path in files)
+    raw_cues = sum(len(pysrt.open(path, encoding="utf-8")) for path in files)
+
+    def run():
+        for path in files:
+            output = os.path.join(work_dir, "fr_" + os.path.basename(path))
+            srt.translate_srt_file(path, output, config["batch_size"], merge_duplicates=True, filter_noise=True,
+                                   resume=False, on_event=lambda event: None)
+    return dict(measure(run, translator, cues), raw_cues=raw_cues)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du débit de traduction")
+    parser.add_argument("--endpoints", help="Serveurs Ollama réels \"hôte:port,hôte2:port\" (par défaut : serveur simulé)")
+    parser.add_argument("--input-dir", default=os.path.join(REPO_ROOT, "srt-files"))
+    parser.add_argument("--scale", type=int, nargs="*", default=[500],
+                        help="Tailles des corpus synthétiques (nombre de sous-titres)")
+    parser.add_argument("--configs", nargs="*", default=list(CONFIGURATIONS), choices=list(CONFIGURATIONS))
+    parser.add_argument("--mock-latency", default="lognormal:0.02,0.5")
+    parser.add_argument("--mock-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--mock-concurrency", type=int, default=4)
+    parser.add_argument("--mock-backends", type=int, default=1, help="Nombre de serveurs simulés")
+    parser.add_argument("--mock-timeout-rate", type=float, default=0.0)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-load-seconds", type=float, default=0.0,
+                        help="Temps de chargement simulé du modèle")
+    parser.add_argument("--mock-chatter-rate", type=float, default=0.0,
+                        help="Proportion de réponses suivies d'un commentaire du modèle")
+    parser.add_argument("--merge-scale", type=int, nargs="*", default=[100000],
+                        help="Tailles des fichiers synthétiques du banc d'essai de fusion")
+    parser.add_argument("--merge-configs", nargs="*", default=list(MERGE_CONFIGURATIONS),
+                        choices=list(MERGE_CONFIGURATIONS))
+    parser.add_argument("--merge-only", action="store_true",
+                        help="Mesurer uniquement la fusion des sous-titres (sans serveur Ollama)")
+    parser.add_argument("--output", help="Fichier JSON de sortie (par défaut : sortie standard)")
+    args = parser.parse_args()
+
+    servers = []
+    if args.merge_only:
+        server_info = None
+        endpoints = []
+        args.configs = []
+    elif args.endpoints:
+        endpoints = parse_endpoints(args.endpoints)
+        server_info = {"endpoints": [f"{host}:{port}" for host, port in endpoints]}
+    else:
+        mock_config = MockConfig(args.mock_latency, args.mock_tokens_per_second, args.mock_concurrency,
+                                 timeout_rate=args.mock_timeout_rate, error_rate=args.mock_error_rate,
+                                 stall_seconds=120.0, seed=0, chatter_rate=args.mock_chatter_rate,
+                                 load_seconds=args.mock_load_seconds)
+        servers = [MockOllamaServer(config=mock_config).start() for _ in range(args.mock_backends)]
+        endpoints = [("127.0.0.1", server.port) for server in servers]
+        server_info = {"mock": True, "backends": args.mock_backends, "latency": args.mock_latency, "tokens_per_second": args.mock_tokens_per_second,
+                       "concurrency": args.mock_concurrency, "timeout_rate": args.mock_timeout_rate,
+                       "error_rate": args.mock_error_rate, "chatter_rate": args.mock_chatter_rate,
+                       "load_seconds": args.mock_load_seconds}
+
+    fixtures = sorted(glob.glob(os.path.join(args.input_dir, "*.srt")))
+    fixture_texts = [sub.text for path in fixtures for sub in pysrt.open(path, encoding="utf-8")]
+    if not fixture_texts:
+        print(f"Aucun fichier SRT trouvé dans {args.input_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for count in args.merge_scale:
+            path = os.path.join(work_dir, f"captions_{count}.srt")
+            make_caption_srt(path, fixture_texts, count)
+            for name in args.merge_configs:
+                options = MERGE_CONFIGURATIONS[name]
+                print(f"captions-{count} / fusion {name}...", file=sys.stderr)
+                record = {"workload": f"captions-{count}", "config": name, "settings": vars(options),
+                          "target": "merge_cues"}
+                record.update(bench_merge(path, options))
+                results.append(record)
+
+        workloads = [("fixtures", fixtures)] if args.configs else []
+        for count in (args.scale if args.configs else []):
+            path = os.path.join(work_dir, f"synthetic_{count}.srt")
+            make_synthetic_srt(path, fixture_texts, count)
+            workloads.append((f"synthetic-{count}", [path]))
+
+        for workload, files in workloads:
+            texts = [sub.text for path in files for sub in pysrt.open(path, encoding="utf-8")]
+            for name in args.configs:
+                config = CONFIGURATIONS[name]
+                print(f"{workload} / {name}...", file=sys.stderr)
+                record = {"workload": workload, "config": name, "settings": config, "target": "translate_batch"}
+                record.update(bench_translate_batch(endpoints, config, texts))
+                results.append(record)
+
+                record = {"workload": workload, "config": name, "settings": config, "target": "translate_srt_file"}
+                record.update(bench_translate_srt_files(endpoints, config, files, os.path.join(work_dir, "out")))
+                results.append(record)
+
+    if servers:
+        server_info["stats"] = [dict(server.stats) for server in servers]
+        for server in servers:
+            server.stop()
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": server_info,
+        "results": results
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
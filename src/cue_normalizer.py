@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Clés de cache normalisées pour les sous-titres
+
+"Thank you.", "thank you" et "- Thank you!" ne diffèrent que par leur forme : ils
+partagent une même clé canonique (espaces, casse, ponctuation finale, tirets de
+dialogue et nombres normalisés) et donc une seule traduction. La forme de surface de
+chaque sous-titre (tirets, casse, ponctuation finale, nombres) est réappliquée à la
+traduction partagée.
+
+Usage: python cue_normalizer.py fichier1.srt [fichier2.srt ...]
+    Affiche le nombre d'appels au modèle économisés sur ces fichiers.
+"""
+
+import re
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+SPACES = re.compile(r'[ \t]+')
+# Tiret de dialogue en début de ligne
+DIALOGUE_DASH = re.compile(r'^[-–—]\s*')
+# Ponctuation finale sans effet sur le sens (le point d'interrogation fait partie de la clé)
+TERMINAL_PUNCTUATION = re.compile(r'\s*([.!…]+)$')
+NUMBER = re.compile(r'\d+(?:[.,:]\d+)*')
+# Emplacement d'un nombre dans une traduction partagée
+PLACEHOLDER = "⟨{}⟩"
+
+
+@dataclass(frozen=True)
+class SurfaceForm:
+    """Forme de surface d'un sous-titre, retirée de la clé et réappliquée à la traduction"""
+    dashes: Tuple[bool, ...]   # Tiret de dialogue sur chaque ligne
+    upper: bool                # Tout en majuscules
+    lower_start: bool          # Commence par une minuscule (fragment de phrase)
+    terminal: str              # Ponctuation finale (".", "!", "...", "")
+    numbers: Tuple[str, ...]   # Nombres, dans l'ordre
+
+
+def normalize(text: str):
+    """Clé canonique et forme de surface d'un sous-titre
+
+    Returns:
+        tuple: (clé ou None si le texte ne contient pas de lettres, SurfaceForm)
+    """
+    lines = [SPACES.sub(" ", line).strip() for line in text.splitlines() if line.strip()]
+    dashes = []
+    body = []
+    for line in lines:
+        match = DIALOGUE_DASH.match(line)
+        dashes.append(match is not None)
+        body.append(line[match.end():] if match else line)
+    joined = "\n".join(body)
+
+    terminal = ""
+    match = TERMINAL_PUNCTUATION.search(joined)
+    if match:
+        terminal = match.group(1)
+        joined = joined[:match.start()]
+
+    letters = [c for c in joined if c.isalpha()]
+    form = SurfaceForm(
+        dashes=tuple(dashes),
+        upper=len(letters) > 1 and all(c.isupper() for c in letters),
+        lower_start=bool(letters) and letters[0].islower(),
+        terminal=terminal,
+        numbers=tuple(NUMBER.findall(joined))
+    )
+    if not letters:
+        return None, form
+    return NUMBER.sub("#", joined).lower(), form
+
+
+def _number_pattern(number: str):
+    return re.compile(r'(?<![\d.,:])' + re.escape(number) + r'(?![\d]|[.,:]\d)')
+
+
+def make_template(translation: str, form: SurfaceForm) -> Optional[str]:
+    """Traduction partagée : la forme de surface du sous-titre d'origine est retirée
+
+    Returns:
+        str: La traduction avec des emplacements pour les nombres, ou None si elle ne
+        peut pas être partagée (nombre absent ou reformaté par le modèle)
+    """
+    lines = [DIALOGUE_DASH.sub("", line.strip()) for line in translation.splitlines() if line.strip()]
+    template = TERMINAL_PUNCTUATION.sub("", "\n".join(lines))
+    if not template:
+        return None
+    for position, number in enumerate(form.numbers):
+        pattern = _number_pattern(number)
+        if len(pattern.findall(template)) != 1:
+            return None
+        template = pattern.sub(PLACEHOLDER.format(position), template)
+    if form.upper:
+        template = template.lower()
+    return template
+
+
+def _set_first_letter(text: str, upper: bool) -> str:
+    for i, c in enumerate(text):
+        if c.isalpha():
+            return text[:i] + (c.upper() if upper else c.lower()) + text[i + 1:]
+    return text
+
+
+def apply_form(template: str, form: SurfaceForm) -> Optional[str]:
+    """Réapplique la forme de surface d'un sous-titre à une traduction partagée"""
+    text = template
+    for position, number in enumerate(form.numbers):
+        placeholder = PLACEHOLDER.format(position)
+        if placeholder not in text:
+            return None
+        text = text.replace(placeholder, number)
+    if "⟨" in text:
+        return None
+
+    if form.upper:
+        text = text.upper()
+    else:
+        text = _set_first_letter(text, not form.lower_start)
+    text += form.terminal
+
+    lines = text.split("\n")
+    if len(lines) == len(form.dashes):
+        lines = ["- " + line if dash else line for line, dash in zip(lines, form.dashes)]
+    elif any(form.dashes):
+        lines[0] = "- " + lines[0]
+    return "\n".join(lines)
+
+
+def corpus_savings(texts) -> dict:
+    """Appels au modèle économisés par la normalisation sur un ensemble de sous-titres"""
+    texts = [text for text in texts if text and text.strip()]
+    raw = set(texts)
+    keys = set()
+    for text in raw:
+        key, _ = normalize(text)
+        keys.add(key if key is not None else ("raw", text))
+    return {
+        "cues": len(texts),
+        "unique_texts": len(raw),
+        "unique_keys": len(keys),
+        "saved_calls": len(raw) - len(keys),
+        "saved_ratio": (len(raw) - len(keys)) / len(raw) if raw else 0.0
+    }
+
+
+def main():
+    import pysrt
+
+    if len(sys.argv) < 2:
+        print("Usage: python cue_normalizer.py fichier1.srt [fichier2.srt ...]")
+        sys.exit(1)
+    texts = [sub.text for path in sys.argv[1:] for sub in pysrt.open(path, encoding="utf-8")]
+    report = corpus_savings(texts)
+    print(f"{report['cues']} sous-titres, {report['unique_texts']} textes distincts, "
+          f"{report['unique_keys']} clés normalisées")
+    print(f"Appels au modèle économisés: {report['saved_calls']} ({report['saved_ratio'] * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
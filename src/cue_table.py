@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Représentation compacte des sous-titres en tableaux parallèles
+
+Une CueTable stocke les débuts et fins en millisecondes dans deux tableaux d'entiers
+(array) et les textes dans une liste, au lieu d'un objet pysrt.SubRipItem (et de deux
+SubRipTime) par sous-titre. Les étapes de filtrage, fusion et traduction travaillent
+sur ces tableaux ; pysrt n'est utilisé qu'en bordure (conversion from_subrip/to_subrip).
+
+Le lecteur reproduit le comportement de pysrt : blocs séparés par des lignes vides,
+numéro facultatif, champs de temps séparés par ":", "." ou "," et millisecondes lues
+telles quelles ("00:00:04,79" donne 79 ms, comme pysrt).
+"""
+
+import os
+import re
+from array import array
+
+TIMESTAMP_SEPARATOR = "-->"
+TIME_SEPARATOR = re.compile(r'[:.,]')
+LEADING_DIGITS = re.compile(r'^(\d+)')
+
+
+class InvalidCue(ValueError):
+    """Bloc SRT illisible (ignoré par le lecteur, comme avec pysrt)"""
+
+
+class Cue:
+    """Vue sur un sous-titre d'une CueTable (aucune copie des données)"""
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table, position):
+        self._table = table
+        self._position = position
+
+    @property
+    def index(self) -> int:
+        return self._position + 1
+
+    @property
+    def start_ms(self) -> int:
+        return self._table.start_ms[self._position]
+
+    @property
+    def end_ms(self) -> int:
+        return self._table.end_ms[self._position]
+
+    @property
+    def text(self) -> str:
+        return self._table.texts[self._position]
+
+    def __repr__(self):
+        return f"Cue({self.index}, {self.start_ms}, {self.end_ms}, {self.text!r})"
+
+
+class CueTable:
+    """Sous-titres stockés en tableaux parallèles start_ms / end_ms / texts"""
+
+    __slots__ = ("start_ms", "end_ms", "texts")
+
+    def __init__(self, start_ms=None, end_ms=None, texts=None):
+        self.start_ms = start_ms if start_ms is not None else array("q")
+        self.end_ms = end_ms if end_ms is not None else array("q")
+        self.texts = texts if texts is not None else []
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        for position in range(len(self.texts)):
+            yield Cue(self, position)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            # Copie de la plage : une vue memoryview bloquerait append() sur la table d'origine
+            return CueTable(self.start_ms[key], self.end_ms[key], self.texts[key])
+        if key < 0:
+            key += len(self.texts)
+        if not 0 <= key < len(self.texts):
+            raise IndexError("indice de sous-titre hors limites")
+        return Cue(self, key)
+
+    def append(self, start_ms: int, end_ms: int, text: str):
+        self.start_ms.append(start_ms)
+        self.end_ms.append(end_ms)
+        self.texts.append(text)
+
+    def with_texts(self, texts) -> "CueTable":
+        """Mêmes horaires (tableaux partagés, sans copie) avec de nouveaux textes"""
+        texts = list(texts)
+        if len(texts) != len(self.texts):
+            raise ValueError(f"{len(texts)} textes pour {len(self.texts)} sous-titres")
+        return CueTable(self.start_ms, self.end_ms, texts)
+
+    @classmethod
+    def from_subrip(cls, items) -> "CueTable":
+        """Conversion depuis des pysrt.SubRipItem (ou toute séquence de sous-titres)"""
+        if isinstance(items, CueTable):
+            return items
+        table = cls()
+        for item in items:
+            if hasattr(item, "start_ms"):
+                table.append(item.start_ms, item.end_ms, item.text)
+            else:
+                table.append(item.start.ordinal, item.end.ordinal, item.text)
+        return table
+
+    def to_subrip(self):
+        """Conversion vers un pysrt.SubRipFile (numérotation 1..n)"""
+        import pysrt
+        return pysrt.SubRipFile(items=[
+            pysrt.SubRipItem(position + 1, pysrt.SubRipTime.from_ordinal(self.start_ms[position]),
+                             pysrt.SubRipTime.from_ordinal(self.end_ms[position]), self.texts[position])
+            for position in range(len(self.texts))
+        ])
+
+
+def _parse_int(digits: str) -> int:
+    try:
+        return int(digits)
+    except ValueError:
+        match = LEADING_DIGITS.match(digits)
+        return int(match.group()) if match else 0
+
+
+def parse_time(source: str) -> int:
+    """Horodatage SRT "HH:MM:SS,mmm" -> millisecondes"""
+    items = TIME_SEPARATOR.split(source)
+    if len(items) != 4:
+        raise InvalidCue(f"Horodatage invalide: {source}")
+    hours, minutes, seconds, milliseconds = (_parse_int(item) for item in items)
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + milliseconds
+
+
+def format_time(ms: int) -> str:
+    """Millisecondes -> horodatage SRT "HH:MM:SS,mmm" (les temps négatifs valent zéro)"""
+    if ms < 0:
+        ms = 0
+    seconds, milliseconds = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%02d:%02d:%02d,%03d" % (hours, minutes, seconds, milliseconds)
+
+
+def _add_block(table: CueTable, lines):
+    if len(lines) < 2:
+        return
+    lines = [line.rstrip() for line in lines]
+    if TIMESTAMP_SEPARATOR not in lines[0]:
+        lines = lines[1:]  # Numéro du sous-titre
+    timestamps = lines[0].split(TIMESTAMP_SEPARATOR)
+    if len(timestamps) != 2:
+        return
+    try:
+        start = parse_time(timestamps[0].strip())
+        end = parse_time(timestamps[1].lstrip().split(" ", 1)[0].strip())
+    except InvalidCue:
+        return
+    table.append(start, end, "\n".join(lines[1:]))
+
+
+def parse_srt(source: str) -> CueTable:
+    """Lit le contenu d'un fichier SRT"""
+    table = CueTable()
+    block = []
+    # splitlines comme pysrt (qui lit le fichier via codecs) : mêmes coupures de lignes
+    for line in source.splitlines():
+        if line.strip():
+            block.append(line)
+        elif block:
+            _add_block(table, block)
+            block = []
+    if block:
+        _add_block(table, block)
+    return table
+
+
+def read_srt(path: str, encoding: str = "utf-8") -> CueTable:
+    """Charge un fichier SRT (le BOM éventuel est ignoré)"""
+    if encoding.lower().replace("_", "-") == "utf-8":
+        encoding = "utf-8-sig"
+    with open(path, "r", encoding=encoding) as f:
+        return parse_srt(f.read())
+
+
+def dumps(table: CueTable, eol: str = os.linesep) -> str:
+    """Sérialise les sous-titres au format SRT, numérotés 1..n (même sortie que pysrt)"""
+    parts = []
+    start_ms, end_ms, texts = table.start_ms, table.end_ms, table.texts
+    for position in range(len(texts)):
+        item = f"{position + 1}\n{format_time(start_ms[position])} --> {format_time(end_ms[position])}\n{texts[position]}\n"
+        if not item.endswith("\n\n"):
+            item += "\n"
+        parts.append(item)
+    output = "".join(parts)
+    return output.replace("\n", eol) if eol != "\n" else output
+
+
+def _create_temp(directory: str):
+    """Crée un fichier temporaire à côté de la destination
+
+    Contrairement à mkstemp (0600), le fichier est créé en 0666 et le noyau applique
+    l'umask : mêmes droits qu'un fichier ouvert normalement, sans modifier l'umask du
+    processus (partagé par tous les threads).
+    """
+    while True:
+        temp_path = os.path.join(directory or ".", f".tmp_{os.urandom(6).hex()}.srt")
+        try:
+            return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+
+def write_srt(table: CueTable, output_file: str, encoding: str = "utf-8"):
+    """Écrit un fichier SRT de manière atomique (fichier temporaire puis renommage)
+
+    Le fichier garde les droits du fichier remplacé (ceux d'un fichier créé normalement
+    sinon) et est synchronisé sur disque avant le renommage.
+    """
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, temp_path = _create_temp(directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(dumps(table))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(output_file):
+            os.chmod(temp_path, os.stat(output_file).st_mode & 0o7777)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
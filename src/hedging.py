@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Requêtes de secours ("hedged requests") contre les générations anormalement lentes
+
+Quand une requête dure plus longtemps qu'un percentile de la latence récente (p95 par
+défaut), une copie est envoyée à un autre serveur, ou à une autre place du même serveur.
+La première réponse est gardée et l'autre requête est interrompue (fermeture de la
+connexion, ce qui arrête la génération côté Ollama). Un budget limite la charge
+supplémentaire : au plus `budget` copies par requête envoyée (5 % par défaut).
+
+La latence dépend de la longueur du texte : elle est ramenée à un texte de référence
+avant d'être comparée, comme pour la limite de concurrence adaptative.
+"""
+
+import collections
+import threading
+
+# Nombre de latences récentes conservées
+WINDOW = 200
+# Latences observées avant d'envoyer des copies
+MIN_SAMPLES = 20
+
+
+def _cost_factor(cost: int) -> float:
+    return 1.0 + cost / 100.0
+
+
+class HedgePolicy:
+    """Décide quand envoyer une copie d'une requête lente et comptabilise les résultats"""
+
+    def __init__(self, percentile: float = 0.95, budget: float = 0.05):
+        """Prépare la politique
+
+        Args:
+            percentile (float): Percentile de la latence récente au-delà duquel une copie part
+            budget (float): Nombre maximal de copies par requête envoyée (charge supplémentaire)
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self._latencies = collections.deque(maxlen=WINDOW)  # Latences normalisées
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "hedges": 0,          # Copies envoyées
+            "hedge_wins": 0,      # Copie arrivée la première
+            "primary_wins": 0,    # Requête d'origine arrivée la première malgré la copie
+            "cancelled": 0,       # Requêtes perdantes interrompues
+            "over_budget": 0      # Copies non envoyées faute de budget
+        }
+
+    def observe(self, latency: float, cost: int):
+        """Enregistre la latence d'une requête réussie"""
+        with self._lock:
+            self._latencies.append(latency / _cost_factor(cost))
+
+    def delay(self, cost: int):
+        """Délai avant l'envoi d'une copie pour une requête de ce coût (None : pas de copie)"""
+        with self._lock:
+            self.stats["requests"] += 1
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        threshold = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+        return threshold * _cost_factor(cost)
+
+    def try_spend(self) -> bool:
+        """Réserve une copie si le budget le permet"""
+        with self._lock:
+            if self.stats["hedges"] + 1 > self.budget * self.stats["requests"] + 1:
+                self.stats["over_budget"] += 1
+                return False
+            self.stats["hedges"] += 1
+            return True
+
+    def record(self, hedge_won: bool, cancelled: int):
+        """Enregistre l'issue d'une requête doublée"""
+        with self._lock:
+            self.stats["hedge_wins" if hedge_won else "primary_wins"] += 1
+            self.stats["cancelled"] += cancelled
+
+    def report(self) -> dict:
+        with self._lock:
+            report = dict(self.stats)
+        decided = report["hedge_wins"] + report["primary_wins"]
+        report["hedge_ratio"] = round(report["hedges"] / report["requests"], 4) if report["requests"] else 0.0
+        report["hedge_win_ratio"] = round(report["hedge_wins"] / decided, 4) if decided else 0.0
+        return report
+
+    def describe(self) -> str:
+        """Résumé lisible des copies envoyées"""
+        report = self.report()
+        return (f"🐇 Requêtes de secours (au-delà du p{self.percentile * 100:.0f}): {report['hedges']} copies "
+                f"pour {report['requests']} requêtes ({report['hedge_ratio'] * 100:.1f}%), "
+                f"{report['hedge_wins']} gagnées par la copie, {report['primary_wins']} par l'original, "
+                f"{report['over_budget']} refusées par le budget")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Délai maximal d'établissement d'une connexion TCP (le délai de lecture est fixé par requête)
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Nombre de serveurs dont les connexions sont conservées simultanément
+MAX_HOSTS = 16
+
+
+class PooledSession:
+    """Session HTTP keep-alive avec pool de connexions pour tout le trafic Ollama
+
+    Les connexions TCP sont réutilisées d'une requête à l'autre au lieu d'être ouvertes
+    à chaque appel. La taille du pool doit correspondre au nombre de requêtes simultanées
+    du traducteur, sinon les connexions excédentaires sont fermées après usage.
+    """
+
+    def __init__(self, pool_size: int = 8, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        """Crée la session et son pool de connexions"""
+        self.connect_timeout = connect_timeout
+        self.pool_size = 0
+        self.session = requests.Session()
+        self._adapter = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retired_connections = 0  # Connexions ouvertes par des pools remplacés
+        self.resize(pool_size)
+
+    def resize(self, pool_size: int):
+        """Change la taille du pool de connexions (les connexions existantes sont fermées)"""
+        with self._lock:
+            if pool_size == self.pool_size:
+                return
+            if self._adapter is not None:
+                self._retired_connections += self._opened_connections()
+                self._adapter.close()
+            # Un pool de connexions par serveur Ollama (plusieurs serveurs possibles)
+            self._adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=pool_size)
+            self.session.mount("http://", self._adapter)
+            self.session.mount("https://", self._adapter)
+            self.pool_size = pool_size
+
+    def _timeout(self, timeout):
+        """Délais (connexion, lecture) à transmettre à requests"""
+        if timeout is None or isinstance(timeout, tuple):
+            return timeout
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def get(self, url: str, timeout: float = None, **kwargs) -> requests.Response:
+        """Requête GET sur une connexion du pool"""
+        with self._lock:
+            self._requests += 1
+        return self.session.get(url, timeout=self._timeout(timeout), **kwargs)
+
+    def post(self, url: str, timeout: float = None, **kwargs) -> requests.Response:
+        """Requête POST sur une connexion du pool"""
+        with self._lock:
+            self._requests += 1
+        return self.session.post(url, timeout=self._timeout(timeout), **kwargs)
+
+    def _opened_connections(self) -> int:
+        """Nombre de connexions TCP ouvertes par le pool actuel"""
+        pools = self._adapter.poolmanager.pools
+        return sum(getattr(pools[key], "num_connections", 0) for key in list(pools.keys()))
+
+    def connection_stats(self) -> dict:
+        """Métriques de réutilisation des connexions"""
+        with self._lock:
+            opened = self._retired_connections + self._opened_connections()
+            requests_sent = self._requests
+        reused = max(0, requests_sent - opened)
+        return {
+            "pool_size": self.pool_size,
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": reused,
+            "reuse_ratio": reused / requests_sent if requests_sent > 0 else 0.0
+        }
+
+    def close(self):
+        """Ferme toutes les connexions du pool"""
+        self.session.close()
+
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_session(pool_size: int = None) -> PooledSession:
+    """Retourne la session partagée par tout le processus
+
+    Args:
+        pool_size (int, optional): Taille minimale du pool. Le pool est agrandi si
+            un traducteur plus concurrent que les précédents en a besoin.
+    """
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = PooledSession(pool_size or 8)
+        elif pool_size and pool_size > _shared_session.pool_size:
+            _shared_session.resize(pool_size)
+        return _shared_session
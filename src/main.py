@@ -4,6 +4,9 @@
 import os
 import sys
 from srt_translator import SRTTranslator
+from backend_pool import endpoints_from_env
+from translation_daemon import daemon_address_from_env
+from profiling import enable_tracing, finish_tracing, trace_path_from_env
 
 def main():
     # Dossiers source et cible
@@ -19,10 +22,13 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     
     # Initialise le traducteur avec llama3.2
-    translator = SRTTranslator(model_name="llama3.2")
+    # (plusieurs serveurs Ollama : OLLAMA_HOSTS="hote1:11434,hote2:11434" ;
+    # démon de traduction partagé : SRT_TRANSLATOR_DAEMON=1, voir translation_daemon.py)
+    translator = SRTTranslator(model_name="llama3.2", endpoints=endpoints_from_env(),
+                               daemon=daemon_address_from_env())
     
     # Liste tous les fichiers SRT dans le dossier source
-    srt_files = [f for f in os.listdir(input_dir) if f.endswith('.srt')]
+    srt_files = sorted(f for f in os.listdir(input_dir) if f.endswith('.srt'))
     
     if not srt_files:
         print(f"Aucun fichier SRT trouvé dans {input_dir}")
@@ -30,40 +36,54 @@ def main():
     
     print(f"Trouvé {len(srt_files)} fichiers SRT à traduire.")
     
-    # Pour simplifier les tests, ne traiter que le premier fichier
-    srt_file = srt_files[0]
-    print(f"\nTraitement du fichier: {srt_file}")
-    
-    input_path = os.path.join(input_dir, srt_file)
-    output_path = os.path.join(output_dir, f"fr_{srt_file}")
+    file_pairs = [
+        (os.path.join(input_dir, srt_file), os.path.join(output_dir, f"fr_{srt_file}"))
+        for srt_file in srt_files
+    ]
     
     # Options de traitement
     merge_duplicates = True  # Fusionner les sous-titres identiques
     filter_noise = True      # Filtrer les indications comme [music], [applause], etc.
     
-    # Prétraitement du fichier SRT
-    if filter_noise:
-        print("Filtrage des sous-titres inutiles...")
-        temp_file = os.path.join(output_dir, f"temp_{srt_file}")
-        translator.filter_noise_subtitles(input_path, temp_file)
-        input_path = temp_file
-    
-    if merge_duplicates:
-        print("Fusion des sous-titres en doublon...")
-        temp_file = os.path.join(output_dir, f"temp_{srt_file}")
-        translator.merge_duplicate_subtitles(input_path, temp_file)
-        input_path = temp_file
-    
-    # Pour un test rapide, limiter à 10 sous-titres maximum
-    translator.translate_srt_file(input_path, output_path, batch_size=50, use_parallel=True)
+    # Temps par étape et trace Chrome : SRT_TRACE=trace.json
+    trace_path = trace_path_from_env()
+    if trace_path:
+        enable_tracing()
     
-    # Nettoyer les fichiers temporaires
-    temp_file = os.path.join(output_dir, f"temp_{srt_file}")
-    if os.path.exists(temp_file):
-        os.remove(temp_file)
+    # Tous les fichiers passent par une seule file de travail : les sous-titres
+    # identiques d'un fichier à l'autre ne sont traduits qu'une fois
+    report = translator.translate_srt_files(
+        file_pairs,
+        batch_size=50,
+        merge_duplicates=merge_duplicates,
+        filter_noise=filter_noise
+    )
     
     print("\nTraduction terminée!")
-    print(f"Le fichier traduit est disponible dans le dossier: {output_dir}")
+    print(f"{report['files']}/{len(srt_files)} fichiers traduits, {report['cues']} sous-titres "
+          f"({report['unique_cues']} textes uniques) en {report['seconds']:.1f}s")
+    print(f"Débit: {report['cues_per_second']:.2f} sous-titres/s, {report['tokens_per_second']:.1f} tokens/s")
+    if report["normalized_hits"]:
+        print(f"Clés normalisées: {report['normalized_hits']} appels au modèle économisés")
+    if report["deduplicated"] or report["coalesced"]:
+        print(f"Doublons: {report['deduplicated'] + report['coalesced']} appels au modèle économisés "
+              f"({report['deduplicated']} sous-titres identiques, {report['coalesced']} requêtes en cours partagées)")
+    if report["hedging"]:
+        print(f"Requêtes de secours: {report['hedging']['hedges']} copies, "
+              f"{report['hedging']['hedge_wins']} arrivées avant l'original")
+    if len(report["backends"]) > 1:
+        for backend in report["backends"]:
+            print(f"  {backend['backend']}: {backend['success']} requêtes réussies, "
+                  f"{backend['tokens_per_second']:.1f} tokens/s")
+    print(translator.translator.metrics.describe())
+    if trace_path:
+        finish_tracing(trace_path)
+    if report["failed_files"]:
+        print(f"Fichiers en échec: {', '.join(report['failed_files'])}")
+    print(f"Les fichiers traduits sont disponibles dans le dossier: {output_dir}")
+    
+    if report["failed_files"]:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
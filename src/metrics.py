@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Métriques de traduction : histogrammes de latence, débit en tokens, taux de cache
+
+Chaque requête à Ollama est enregistrée par modèle et par serveur : latence (histogramme
+à seaux, percentiles p50/p95/p99), tokens générés et temps d'évaluation du prompt et de
+génération rapportés par Ollama (prompt_eval_duration, eval_count, eval_duration). Les
+sous-titres servis sans appel au modèle (cache, mémoire, clé normalisée, doublons)
+donnent le taux de succès du cache.
+
+Les métriques sont exportables au format texte Prometheus ou en JSON, dans un fichier
+réécrit périodiquement (SRT_METRICS_FILE) ou via un point d'accès HTTP (SRT_METRICS_PORT,
+chemins /metrics et /metrics.json) à interroger pendant les longs traitements.
+"""
+
+import atexit
+import http.server
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+# Variables d'environnement de l'export
+METRICS_FILE_ENV = "SRT_METRICS_FILE"
+METRICS_PORT_ENV = "SRT_METRICS_PORT"
+EXPORT_INTERVAL = 10.0
+
+# Limites supérieures des seaux de l'histogramme de latence (secondes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class LatencyHistogram:
+    """Histogramme de latence à seaux fixes (compatible avec les histogrammes Prometheus)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Le dernier seau est +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimation d'un percentile par interpolation linéaire dans son seau"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - cumulative) / count)
+            cumulative += count
+        return self.max
+
+
+class RequestSeries:
+    """Métriques des requêtes d'un modèle sur un serveur"""
+
+    def __init__(self, model: str, backend: str):
+        self.model = model
+        self.backend = backend
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.eval_tokens = 0
+        self.eval_seconds = 0.0
+        self.prompt_tokens = 0
+        self.prompt_eval_seconds = 0.0
+        self.load_seconds = 0.0
+
+    def report(self) -> dict:
+        return {
+            "model": self.model,
+            "backend": self.backend,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_p50": round(self.latency.quantile(0.50), 4),
+            "latency_p95": round(self.latency.quantile(0.95), 4),
+            "latency_p99": round(self.latency.quantile(0.99), 4),
+            "latency_mean": round(self.latency.sum / self.latency.count, 4) if self.latency.count else 0.0,
+            "latency_max": round(self.latency.max, 4),
+            "eval_tokens": self.eval_tokens,
+            "eval_seconds": round(self.eval_seconds, 3),
+            "tokens_per_second": round(self.eval_tokens / self.eval_seconds, 2) if self.eval_seconds > 0 else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_eval_seconds": round(self.prompt_eval_seconds, 3),
+            "prompt_tokens_per_second": (round(self.prompt_tokens / self.prompt_eval_seconds, 2)
+                                         if self.prompt_eval_seconds > 0 else 0.0),
+            "load_seconds": round(self.load_seconds, 3)
+        }
+
+
+class MetricsRegistry:
+    """Métriques d'un processus, partagées par tous les traducteurs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {}       # (modèle, serveur) -> RequestSeries
+        self.cache_hits = {}   # Source (cache, memory, normalized, duplicate, coalesced) -> sous-titres
+        self.cues = 0          # Sous-titres demandés
+        self.started = time.time()
+
+    def observe_request(self, model: str, backend: str, latency: float, success: bool, result: dict = None):
+        """Enregistre une requête /api/generate et les durées rapportées par Ollama (nanosecondes)"""
+        result = result or {}
+        with self._lock:
+            series = self.series.get((model, backend))
+            if series is None:
+                series = self.series[(model, backend)] = RequestSeries(model, backend)
+            series.requests += 1
+            series.latency.observe(latency)
+            if not success:
+                series.errors += 1
+                return
+            series.eval_tokens += result.get("eval_count", 0)
+            series.eval_seconds += result.get("eval_duration", 0) / 1e9
+            series.prompt_tokens += result.get("prompt_eval_count", 0)
+            series.prompt_eval_seconds += result.get("prompt_eval_duration", 0) / 1e9
+            series.load_seconds += result.get("load_duration", 0) / 1e9
+
+    def observe_cues(self, count: int):
+        """Sous-titres demandés (dénominateur du taux de succès du cache)"""
+        with self._lock:
+            self.cues += count
+
+    def observe_cache(self, source: str, count: int = 1):
+        """Sous-titres servis sans appel au modèle"""
+        with self._lock:
+            self.cache_hits[source] = self.cache_hits.get(source, 0) + count
+
+    def hit_ratio(self) -> float:
+        with self._lock:
+            return min(1.0, sum(self.cache_hits.values()) / self.cues) if self.cues else 0.0
+
+    def to_dict(self) -> dict:
+        """Instantané des métriques (export JSON)"""
+        with self._lock:
+            series = [s.report() for s in self.series.values()]
+            cache_hits = dict(self.cache_hits)
+            cues = self.cues
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": series,
+            "cache": {
+                "cues": cues,
+                "hits": cache_hits,
+                "hit_ratio": round(min(1.0, sum(cache_hits.values()) / cues), 4) if cues else 0.0
+            }
+        }
+
+    def to_prometheus(self) -> str:
+        """Instantané des métriques au format texte de Prometheus"""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            series = list(self.series.values())
+            histograms = [(s, list(s.latency.counts), s.latency.count, s.latency.sum) for s in series]
+
+            metric("srt_translator_request_duration_seconds", "histogram", "Latence des requêtes /api/generate")
+            for s, counts, count, total in histograms:
+                labels = f'model="{s.model}",backend="{s.backend}"'
+                cumulative = 0
+                for bound, bucket_count in zip(s.latency.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'srt_translator_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'srt_translator_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"srt_translator_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+                lines.append(f"srt_translator_request_duration_seconds_count{{{labels}}} {count}")
+
+            counters = [
+                ("srt_translator_request_errors_total", "Requêtes en échec", lambda s: s.errors),
+                ("srt_translator_eval_tokens_total", "Tokens générés (eval_count)", lambda s: s.eval_tokens),
+                ("srt_translator_eval_seconds_total", "Temps de génération (eval_duration)", lambda s: s.eval_seconds),
+                ("srt_translator_prompt_tokens_total", "Tokens du prompt (prompt_eval_count)", lambda s: s.prompt_tokens),
+                ("srt_translator_prompt_eval_seconds_total", "Temps d'évaluation du prompt (prompt_eval_duration)",
+                 lambda s: s.prompt_eval_seconds),
+                ("srt_translator_load_seconds_total", "Temps de chargement du modèle (load_duration)",
+                 lambda s: s.load_seconds),
+            ]
+            for name, help_text, value in counters:
+                metric(name, "counter", help_text)
+                for s in series:
+                    lines.append(f'{name}{{model="{s.model}",backend="{s.backend}"}} {value(s)}')
+
+            metric("srt_translator_cues_total", "counter", "Sous-titres demandés")
+            lines.append(f"srt_translator_cues_total {self.cues}")
+            metric("srt_translator_cache_hits_total", "counter", "Sous-titres servis sans appel au modèle")
+            for source, count in sorted(self.cache_hits.items()):
+                lines.append(f'srt_translator_cache_hits_total{{source="{source}"}} {count}')
+        metric("srt_translator_cache_hit_ratio", "gauge", "Part des sous-titres servis sans appel au modèle")
+        lines.append(f"srt_translator_cache_hit_ratio {self.hit_ratio():.4f}")
+        return "\n".join(lines) + "\n"
+
+    def describe(self) -> str:
+        """Résumé lisible : percentiles de latence et débit par modèle et serveur"""
+        lines = []
+        for entry in self.to_dict()["requests"]:
+            lines.append(f"⏱️ {entry['model']} @ {entry['backend']}: {entry['requests']} requêtes, "
+                         f"latence p50 {entry['latency_p50']:.2f}s / p95 {entry['latency_p95']:.2f}s / "
+                         f"p99 {entry['latency_p99']:.2f}s, {entry['tokens_per_second']:.1f} tokens/s "
+                         f"(prompt {entry['prompt_eval_seconds']:.1f}s, génération {entry['eval_seconds']:.1f}s)")
+        if self.cues:
+            lines.append(f"🎯 Cache: {self.hit_ratio() * 100:.1f}% des sous-titres servis sans appel au modèle")
+        return "\n".join(lines)
+
+    def write(self, path: str):
+        """Écrit les métriques dans un fichier (JSON si l'extension est .json, Prometheus sinon)"""
+        content = (json.dumps(self.to_dict(), indent=2, ensure_ascii=False) + "\n"
+                   if path.endswith(".json") else self.to_prometheus())
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory or None)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+
+_registry = MetricsRegistry()
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+
+def get_registry() -> MetricsRegistry:
+    """Registre de métriques du processus"""
+    return _registry
+
+
+def _write_quietly(registry: MetricsRegistry, path: str):
+    try:
+        registry.write(path)
+    except OSError as e:
+        print(f"Écriture des métriques impossible dans {path}: {str(e)}")
+
+
+def _file_exporter(registry: MetricsRegistry, path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        _write_quietly(registry, path)
+
+
+def serve_metrics(registry: MetricsRegistry, port: int, host: str = "127.0.0.1"):
+    """Point d'accès HTTP : /metrics (Prometheus) et /metrics.json"""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, content_type = json.dumps(registry.to_dict(), ensure_ascii=False).encode("utf-8"), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, content_type = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_exporters_from_env(registry: MetricsRegistry = None):
+    """Démarre les exports demandés par SRT_METRICS_FILE / SRT_METRICS_PORT (une seule fois par processus)"""
+    global _exporters_started
+    registry = registry or _registry
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path:
+        threading.Thread(target=_file_exporter, args=(registry, path, EXPORT_INTERVAL), daemon=True).start()
+        atexit.register(_write_quietly, registry, path)  # Dernier état à la fin du processus
+        print(f"📈 Métriques écrites toutes les {EXPORT_INTERVAL:.0f}s dans {path}")
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        try:
+            serve_metrics(registry, int(port))
+            print(f"📈 Métriques disponibles sur http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"Point d'accès des métriques indisponible sur le port {port}: {str(e)}")
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Serveur local imitant l'API d'Ollama (/api/generate et /api/tags)
+
+Il sert aux benchmarks et aux essais sans GPU : la latence, le débit en tokens/s,
+le nombre de générations simultanées et les pannes (timeouts, erreurs 5xx) sont
+configurables. Les « traductions » retournées sont le texte source préfixé de [FR].
+
+Usage: python mock_ollama_server.py [--port 11435] [--latency lognormal:0.3,0.5] ...
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import select
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Lignes numérotées du mode groupé ([1] texte)
+NUMBERED_LINE = re.compile(r'^\[(\d+)\]\s?(.*)$', re.MULTILINE)
+# Commentaire que les modèles ajoutent volontiers après la traduction
+CHATTER = ("\n\nNote : cette traduction reste fidèle au texte original tout en adaptant "
+           "les expressions idiomatiques au français courant.")
+
+
+class LatencyDistribution:
+    """Distribution de la latence fixe d'une requête (hors génération des tokens)
+
+    Formats acceptés : "fixed:0.2", "uniform:0.1,0.5", "exponential:0.3" (moyenne),
+    "lognormal:0.3,0.5" (médiane, sigma).
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Distribution de latence inconnue: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "exponential":
+            return rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class MockConfig:
+    """Paramètres du serveur simulé"""
+
+    def __init__(self, latency: str = "fixed:0.05", tokens_per_second: float = 200.0,
+                 concurrency: int = 1, max_queue: int = 512, timeout_rate: float = 0.0,
+                 error_rate: float = 0.0, stall_seconds: float = 600.0,
+                 models=("mistral", "llama3.2"), seed: int = None, chatter_rate: float = 0.0,
+                 load_seconds: float = 0.0, default_keep_alive: float = 300.0):
+        self.latency = LatencyDistribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.concurrency = concurrency        # Générations simultanées (OLLAMA_NUM_PARALLEL)
+        self.max_queue = max_queue            # Requêtes en attente avant de répondre 503
+        self.timeout_rate = timeout_rate      # Proportion de requêtes qui restent bloquées
+        self.error_rate = error_rate          # Proportion de requêtes qui échouent en 500
+        self.stall_seconds = stall_seconds    # Durée de blocage d'une requête « timeout »
+        self.chatter_rate = chatter_rate      # Proportion de réponses suivies d'un commentaire
+        self.load_seconds = load_seconds      # Temps de chargement d'un modèle déchargé
+        self.default_keep_alive = default_keep_alive  # Maintien en mémoire sans keep_alive (5 min)
+        self.models = list(models)
+        self.rng = random.Random(seed)
+
+
+def fake_translation(prompt: str) -> str:
+    """Produit une réponse plausible pour un prompt de traduction"""
+    numbered = NUMBERED_LINE.findall(prompt)
+    if numbered:
+        return "\n".join(f"[{number}] [FR] {text}" for number, text in numbered)
+    _, _, text = prompt.partition(":")
+    return "[FR] " + (text.strip() or prompt.strip())
+
+
+def parse_keep_alive(value, default: float) -> float:
+    """Convertit un keep_alive Ollama ("5m", "1h", "30s", secondes, -1) en secondes"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return math.inf if value < 0 else float(value)
+    match = re.match(r'^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$', str(value).strip())
+    if not match:
+        return default
+    number = float(match.group(1))
+    if number < 0:
+        return math.inf
+    return number * {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}[match.group(2)]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximation du nombre de tokens (environ 4 caractères par token)"""
+    return max(1, len(text) // 4)
+
+
+class MockOllamaServer:
+    """Serveur HTTP simulé, exécuté dans un thread en arrière-plan"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: MockConfig = None):
+        """Crée le serveur (port 0 : un port libre est choisi)"""
+        self.config = config or MockConfig()
+        self._slots = threading.Semaphore(self.config.concurrency)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loaded_until = {}  # Modèle -> instant de déchargement
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "rejected": 0,
+            "errors": 0,
+            "stalled": 0,
+            "cancelled": 0,
+            "loads": 0,
+            "queued": 0,
+            "active": 0,
+            "max_active": 0
+        }
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.httpd.server_address[0]}:{self.port}"
+
+    def start(self) -> "MockOllamaServer":
+        """Démarre le serveur dans un thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le serveur"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == "active":
+                self.stats["max_active"] = max(self.stats["max_active"], self.stats["active"])
+
+    def _load_model(self, payload: dict) -> float:
+        """Charge le modèle s'il n'est plus en mémoire et prolonge son maintien (keep_alive)
+
+        Returns:
+            float: Temps de chargement simulé (0 si le modèle était déjà chargé)
+        """
+        config = self.config
+        model = payload.get("model", "")
+        keep_alive = parse_keep_alive(payload.get("keep_alive"), config.default_keep_alive)
+        now = time.time()
+        with self._lock:
+            loaded = self._loaded_until.get(model, 0) > now
+            if not loaded:
+                self.stats["loads"] += 1
+            self._loaded_until[model] = now + keep_alive
+        if loaded:
+            return 0.0
+        time.sleep(config.load_seconds)
+        return config.load_seconds
+
+    def generate(self, payload: dict, on_chunk=None, disconnected=None):
+        """Simule une génération et retourne (code HTTP, corps de la réponse)
+
+        Avec `on_chunk` (mode streaming), chaque morceau de la réponse est transmis au fil
+        de la génération et le corps retourné est le dernier message ("done": true). Si
+        `on_chunk` lève une exception (client déconnecté), la génération est abandonnée.
+        `disconnected()` indique si le client a fermé la connexion : une génération bloquée
+        est alors abandonnée sans attendre la fin du blocage, comme dans Ollama.
+        """
+        config = self.config
+        self._count("requests")
+
+        with self._lock:
+            if self.stats["queued"] >= config.max_queue:
+                self.stats["rejected"] += 1
+                return 503, {"error": "server busy, please try again"}
+            self.stats["queued"] += 1
+
+        # Attendre une place de génération (file d'attente comme Ollama)
+        self._slots.acquire()
+        self._count("queued", -1)
+        self._count("active")
+        try:
+            with self._lock:
+                roll = config.rng.random()
+                chatter = config.rng.random() < config.chatter_rate
+                base_latency = config.latency.sample(config.rng)
+
+            load_duration = self._load_model(payload)
+            if not payload.get("prompt"):
+                # Prompt vide : Ollama charge seulement le modèle
+                self._count("completed")
+                return 200, {"model": payload.get("model", ""), "response": "", "done": True,
+                             "load_duration": int(load_duration * 1e9)}
+
+            if roll < config.error_rate:
+                self._count("errors")
+                time.sleep(base_latency)
+                return 500, {"error": "simulated failure"}
+
+            prompt = payload.get("prompt", "")
+            response = fake_translation(prompt)
+            if chatter:
+                response += CHATTER
+            eval_count = estimate_tokens(response)
+            limit = payload.get("num_predict") or payload.get("options", {}).get("num_predict")
+            done_reason = "stop"
+            if limit and eval_count > int(limit):
+                eval_count, done_reason = int(limit), "length"
+                response = response[:eval_count * 4]  # Génération coupée par num_predict
+            eval_duration = eval_count / config.tokens_per_second
+            prompt_eval_duration = base_latency
+            stalled = roll < config.error_rate + config.timeout_rate
+
+            if on_chunk is None:
+                if stalled:
+                    self._count("stalled")
+                    time.sleep(config.stall_seconds)
+                    return 500, {"error": "stalled generation"}
+                time.sleep(prompt_eval_duration + eval_duration)
+            else:
+                # Découpage en tokens d'environ 4 caractères, envoyés au rythme de tokens_per_second
+                time.sleep(prompt_eval_duration)
+                pieces = [response[i:i + 4] for i in range(0, len(response), 4)]
+                if done_reason == "length":
+                    pieces = pieces[:eval_count]
+                for number, piece in enumerate(pieces):
+                    if stalled and number == len(pieces) // 2:
+                        # Blocage au milieu de la génération, après une sortie partielle
+                        self._count("stalled")
+                        self._stall(config.stall_seconds, disconnected)
+                        return 500, {"error": "stalled generation"}
+                    on_chunk({"model": payload.get("model", ""), "response": piece, "done": False})
+                    time.sleep(1.0 / config.tokens_per_second)
+                response = "".join(pieces)
+
+            self._count("completed")
+            return 200, {
+                "model": payload.get("model", ""),
+                "response": "" if on_chunk is not None else response,
+                "done": True,
+                "prompt_eval_count": estimate_tokens(prompt),
+                "prompt_eval_duration": int(prompt_eval_duration * 1e9),
+                "done_reason": done_reason,
+                "eval_count": eval_count,
+                "eval_duration": int(eval_duration * 1e9),
+                "load_duration": int(load_duration * 1e9),
+                "total_duration": int((load_duration + prompt_eval_duration + eval_duration) * 1e9)
+            }
+        except (BrokenPipeError, ConnectionResetError):
+            # Le client a fermé la connexion : la génération s'arrête comme dans Ollama
+            self._count("cancelled")
+            raise
+        finally:
+            self._count("active", -1)
+            self._slots.release()
+
+    def _stall(self, seconds: float, disconnected=None):
+        """Blocage d'une génération, interrompu si le client se déconnecte"""
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            if disconnected is not None and disconnected():
+                raise ConnectionResetError("client déconnecté")
+            time.sleep(min(0.02, max(0.0, deadline - time.time())))
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": name} for name in server.config.models]})
+                elif self.path == "/mock/stats":
+                    with server._lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid json"})
+                    return
+                if self.path != "/api/generate":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                try:
+                    if payload.get("stream", True):
+                        self._stream(payload)
+                    else:
+                        status, body = server.generate(payload)
+                        self._send_json(status, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Le client a abandonné la requête (timeout ou arrêt anticipé)
+                    self.close_connection = True
+
+            def _disconnected(self) -> bool:
+                """Le client a fermé la connexion (fin de flux lisible sur le socket)"""
+                try:
+                    readable, _, _ = select.select([self.connection], [], [], 0)
+                    return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b""
+                except OSError:
+                    return True
+
+            def _write_chunk(self, body: dict):
+                data = (json.dumps(body) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, payload: dict):
+                """Réponse NDJSON en transfert par morceaux, en-têtes envoyés avec le premier token"""
+                started = []
+
+                def on_chunk(body):
+                    if not started:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        started.append(True)
+                    self._write_chunk(body)
+
+                status, body = server.generate(payload, on_chunk, self._disconnected)
+                if status != 200 and not started:
+                    self._send_json(status, body)
+                    return
+                if status != 200:
+                    self.close_connection = True
+                    return
+                on_chunk(body)
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur simulé compatible avec l'API Ollama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="fixed:S | uniform:A,B | exponential:MOYENNE | lognormal:MEDIANE,SIGMA")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=int, default=1, help="Générations simultanées")
+    parser.add_argument("--max-queue", type=int, default=512, help="Requêtes en attente avant 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Proportion de requêtes bloquées")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion d'erreurs 500")
+    parser.add_argument("--chatter-rate", type=float, default=0.0,
+                        help="Proportion de réponses suivies d'un commentaire du modèle")
+    parser.add_argument("--load-seconds", type=float, default=0.0,
+                        help="Temps de chargement d'un modèle qui n'est pas en mémoire")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.tokens_per_second, args.concurrency, args.max_queue,
+                        args.timeout_rate, args.error_rate, seed=args.seed, chatter_rate=args.chatter_rate,
+                        load_seconds=args.load_seconds)
+    server = MockOllamaServer(args.host, args.port, config)
+    print(f"Serveur Ollama simulé sur {server.url} (Ctrl+C pour arrêter)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
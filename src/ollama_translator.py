@@ -2,48 +2,313 @@
 # -*- coding: utf-8 -*-
 
 import requests
+import json
 import time
+import threading
 from typing import List
-import concurrent.futures
-from tqdm import tqdm
 import os
+import re
+import socket
+import concurrent.futures
+from urllib3.exceptions import ReadTimeoutError
+from translation_memory import TranslationMemory, DEFAULT_MEMORY_PATH
+from http_session import get_shared_session
+from backend_pool import BackendPool, STRATEGY_LATENCY
+from cue_normalizer import normalize, make_template, apply_form
+from single_flight import SingleFlight
+from progress_events import CacheHit, RetryScheduled, BatchCompleted, TranslationStarted
+from metrics import get_registry, start_exporters_from_env
+from profiling import span
+from throughput_profile import ThroughputProfile, DEFAULT_PROFILE_PATH
+from hedging import HedgePolicy
+from async_translator import (
+    AsyncOllamaTranslator, outcome_for_status, SCHEDULE_LONGEST_FIRST,
+    OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_ERROR, OUTCOME_MISALIGNED
+)
+
+
+class HedgeCancelled(Exception):
+    """Requête interrompue parce que sa copie a répondu la première"""
+
+
+class StreamStalled(requests.exceptions.Timeout):
+    """Génération en streaming interrompue (délai du premier token ou entre deux tokens dépassé)"""
+
+    def __init__(self, message: str, partial: str = ""):
+        super().__init__(message)
+        self.partial = partial  # Texte reçu avant l'interruption
+
+
+def _response_socket(response):
+    """Socket d'une réponse en cours de streaming (None si déjà rendu au pool de connexions)"""
+    connection = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+    return getattr(connection, "sock", None)
+
+
+def _set_read_timeout(response, seconds: float):
+    """Change le délai de lecture du socket d'une réponse en cours de streaming"""
+    sock = _response_socket(response)
+    if sock is not None:
+        sock.settimeout(seconds)
+
+
+class AttemptCancel:
+    """Interruption d'une tentative d'une requête doublée
+
+    La tentative enregistre sa réponse HTTP en cours ; `set()` ferme la connexion
+    immédiatement, sans attendre le prochain morceau de la réponse : une tentative
+    bloquée côté serveur libère aussitôt sa place (Ollama arrête la génération quand le
+    client se déconnecte) et le compte des requêtes en cours du pool.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, response):
+        """Enregistre la réponse de la tentative ; retourne False si elle est déjà interrompue"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._response = response
+            return True
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            response, self._response = self._response, None
+        if response is None:
+            return
+        # close() seul ne débloque pas une lecture en cours dans un autre thread
+        sock = _response_socket(response)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        response.close()
+
 
 class OllamaTranslator:
     """Traducteur optimisé utilisant Ollama pour traduire de l'anglais vers le français"""
     
-    def __init__(self, model_name: str = "mistral", host: str = "localhost", port: int = 11434):
-        """Initialise le traducteur avec un modèle spécifique"""
+    # Version du prompt de traduction : à incrémenter à chaque modification de PROMPT_TEMPLATE
+    # pour ne pas réutiliser les traductions mémorisées avec l'ancien prompt
+    PROMPT_VERSION = "1"
+    PROMPT_TEMPLATE = "Traduis en français: {text}"
+    
+    # Prompt du mode groupé : plusieurs sous-titres numérotés dans une seule requête
+    PACKED_PROMPT_VERSION = "packed-1"
+    PACKED_PROMPT_TEMPLATE = (
+        "Traduis en français chacune des lignes numérotées ci-dessous.\n"
+        "Réponds uniquement avec les lignes traduites, une par ligne, en commençant chaque ligne "
+        "par le même numéro entre crochets. Conserve les balises <br>. N'ajoute aucun commentaire.\n\n"
+        "{lines}"
+    )
+    # Marqueur des sauts de ligne à l'intérieur d'un sous-titre en mode groupé
+    PACKED_LINE_BREAK = "<br>"
+    
+    # Durée pendant laquelle Ollama garde le modèle en mémoire après chaque requête
+    # (format Ollama : "30m", "1h", secondes, -1 pour ne jamais le décharger)
+    DEFAULT_KEEP_ALIVE = "30m"
+    
+    def __init__(self, model_name: str = "mistral", host: str = "localhost", port: int = 11434,
+                 use_memory: bool = True, memory_path: str = DEFAULT_MEMORY_PATH, packed: bool = False,
+                 max_concurrency: int = 8, throttle: bool = True, stream: bool = False,
+                 first_token_timeout: float = 30.0, inter_token_timeout: float = 10.0,
+                 keep_alive=DEFAULT_KEEP_ALIVE, warm_up: bool = True, endpoints=None,
+                 balance: str = STRATEGY_LATENCY, health_interval: float = 30.0, normalize: bool = True,
+                 schedule: str = SCHEDULE_LONGEST_FIRST, learn_budgets: bool = True,
+                 profile_path: str = DEFAULT_PROFILE_PATH, hedge_percentile: float = None,
+                 hedge_budget: float = 0.05):
+        """Initialise le traducteur avec un modèle spécifique
+        
+        Args:
+            use_memory (bool): Active la mémoire de traduction persistante sur disque
+            memory_path (str): Chemin du fichier SQLite de la mémoire de traduction
+            packed (bool): Mode groupé, plusieurs sous-titres sont envoyés dans chaque requête
+            max_concurrency (int): Nombre maximal de requêtes simultanées vers Ollama
+            throttle (bool): False pour envoyer sans limitation (machine GPU dédiée)
+            stream (bool): Lit la réponse d'Ollama au fil de la génération (NDJSON) et
+                l'interrompt dès que la traduction est complète
+            first_token_timeout (float): Délai maximal avant le premier token en streaming
+            inter_token_timeout (float): Délai maximal entre deux tokens en streaming
+            keep_alive (str|int): Durée de maintien du modèle en mémoire, envoyée avec chaque requête
+            warm_up (bool): Précharge le modèle dès l'initialisation
+            endpoints (list, optional): Plusieurs serveurs Ollama ("hôte:port" ou (hôte, port))
+                entre lesquels les requêtes sont réparties. Par défaut : host/port.
+            balance (str): Répartition entre serveurs, "latency" ou "least_outstanding"
+            health_interval (float): Intervalle des contrôles de santé des serveurs (secondes)
+            normalize (bool): Partage une traduction entre sous-titres qui ne diffèrent que par
+                la casse, les espaces, la ponctuation finale, les tirets de dialogue ou les nombres
+            schedule (str): Ordre d'envoi des requêtes d'un lot : "longest_first" (les sous-titres
+                les plus longs d'abord, pour ne pas finir le lot sur une longue requête isolée) ou "fifo"
+            learn_budgets (bool): Calcule le délai et la limite de génération de chaque requête à
+                partir du débit observé du modèle (voir throughput_profile) au lieu de formules fixes
+            profile_path (str): Fichier JSON des profils de débit, conservés entre les exécutions
+            hedge_percentile (float, optional): Active les requêtes de secours : une requête qui dure
+                plus que ce percentile de la latence récente (0.95 pour p95) est doublée sur un autre
+                serveur ou une autre place, la première réponse est gardée (voir hedging)
+            hedge_budget (float): Nombre maximal de copies par requête (charge supplémentaire)
+        """
         self.model_name = model_name
-        self.api_url = f"http://{host}:{port}/api/generate"
-        self.host = host
-        self.port = port
+        self.packed = packed
+        self.stream = stream
+        self.first_token_timeout = first_token_timeout
+        self.inter_token_timeout = inter_token_timeout
+        self.keep_alive = keep_alive
         self.cache = {}  # Cache pour éviter de traduire plusieurs fois le même texte
+        self.normalize = normalize
+        self.templates = {}  # Clé normalisée -> traduction partagée (voir cue_normalizer)
+        self.flights = SingleFlight()  # Traductions en cours, partagées entre appelants simultanés
+        # Débit appris du modèle (tokens par caractère, tokens/s), d'où délais et num_predict
+        self.profile = ThroughputProfile(model_name, profile_path) if learn_budgets else None
+        # Requêtes de secours : les deux tentatives tournent dans un pool dédié, l'appelant attend
+        self.hedging = None
+        if hedge_percentile:
+            self.hedging = HedgePolicy(hedge_percentile, hedge_budget)
+            self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=4 * max_concurrency, thread_name_prefix="ollama-hedge")
+            if not stream:
+                print("⚠️ Requêtes de secours : les réponses sont lues en streaming pour pouvoir interrompre "
+                      "la perdante (sans arrêt anticipé ni délais par token, stream=False étant demandé)")
+        
+        # Mémoire persistante derrière le cache en mémoire (partagée entre exécutions)
+        self.memory = None
+        if use_memory:
+            try:
+                self.memory = TranslationMemory(memory_path)
+            except Exception as e:
+                print(f"Mémoire de traduction indisponible ({str(e)}), utilisation du cache en mémoire uniquement")
         self.stats = {
+            "packed_requests": 0,
+            "packed_fallbacks": 0,
             "requests": 0,
             "timeouts": 0,
             "errors": 0,
             "success": 0,
             "total_chars": 0,
-            "total_time": 0
+            "total_tokens": 0,
+            "total_time": 0,
+            "cache_hits": 0,
+            "memory_hits": 0,
+            "normalized_hits": 0,
+            "deduplicated": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "batches": 0,
+            "streamed": 0,
+            "first_token_time": 0,
+            "early_stops": 0,
+            "stalls": 0,
+            "salvaged": 0,
+            "warm_up_time": 0,
+            "first_request_time": None,
+            "model_loads": 0,
+            "load_time": 0
         }
+        self._stats_lock = threading.Lock()
         
-        # Test de connexion
-        self._test_connection()
+        # Latences, débit en tokens et taux de cache, partagés par les traducteurs du processus
+        # (exportés si SRT_METRICS_FILE ou SRT_METRICS_PORT est défini, voir metrics)
+        self.metrics = get_registry()
+        start_exporters_from_env(self.metrics)
+        
+        # Session HTTP keep-alive partagée, avec un pool à la taille de la concurrence maximale
+        self.http = get_shared_session(max_concurrency)
+        
+        # Serveurs Ollama entre lesquels les requêtes sont réparties
+        self.pool = BackendPool(endpoints or [(host, port)], self.http, strategy=balance,
+                                health_interval=health_interval, model_name=model_name)
+        self.host = self.pool.backends[0].host
+        self.port = self.pool.backends[0].port
+        self.api_url = self.pool.backends[0].api_url
+        
+        # Moteur asyncio à concurrence adaptative utilisé par translate_batch
+        self.engine = AsyncOllamaTranslator(self, max_concurrency=max_concurrency, throttle=throttle,
+                                            schedule=schedule)
+        
+        # Test de connexion puis préchargement du modèle
+        if self._test_connection() and warm_up:
+            self.warm_up()
     
-    def _test_connection(self):
-        """Teste la connexion au serveur Ollama"""
+    def _test_connection(self) -> bool:
+        """Teste la connexion au serveur Ollama (à tous les serveurs du pool s'il y en a plusieurs)"""
+        if len(self.pool) > 1:
+            healthy = self.pool.check_health()
+            print(f"Connecté à {healthy}/{len(self.pool)} serveurs Ollama. Modèle: {self.model_name}")
+            self.pool.start_health_checks()
+            return healthy > 0
         try:
-            response = requests.get(f"http://{self.host}:{self.port}/api/tags", timeout=10)
+            response = self.http.get(f"http://{self.host}:{self.port}/api/tags", timeout=10)
             if response.status_code != 200:
                 print(f"Attention: Le serveur Ollama a retourné le code {response.status_code}")
-            else:
-                print(f"Connecté au serveur Ollama. Modèle: {self.model_name}")
+                return False
+            print(f"Connecté au serveur Ollama. Modèle: {self.model_name}")
+            return True
         except Exception as e:
             print(f"Erreur de connexion à Ollama: {str(e)}")
             print("Assurez-vous qu'Ollama est en cours d'exécution et accessible.")
+            return False
     
-    def _log_stats(self, success=True, is_timeout=False, chars=0, time_taken=0):
+    def warm_up(self, timeout: float = 300) -> bool:
+        """Précharge le modèle en mémoire avant la première traduction
+        
+        Une requête sans prompt demande à Ollama de charger le modèle sans rien générer.
+        Le temps de chargement n'est ainsi pas compté dans la latence des traductions.
+        """
+        payload = {"model": self.model_name, "prompt": "", "stream": False, "keep_alive": self.keep_alive}
+        
+        def load(backend):
+            try:
+                response = self.http.post(backend.api_url, json=payload, timeout=timeout)
+                if response.status_code != 200:
+                    print(f"Préchargement du modèle impossible sur {backend.name} (code {response.status_code})")
+                    return None
+                return response.json().get("load_duration", 0) / 1e9
+            except Exception as e:
+                print(f"Préchargement du modèle impossible sur {backend.name}: {str(e)}")
+                return None
+        
+        # Tous les serveurs du pool chargent le modèle en parallèle
+        start_time = time.time()
+        backends = [backend for backend in self.pool.backends if backend.healthy]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(backends))) as executor:
+            load_times = [t for t in executor.map(load, backends) if t is not None]
+        if not load_times:
+            return False
+        
+        elapsed = time.time() - start_time
+        with self._stats_lock:
+            self.stats["warm_up_time"] = elapsed
+        print(f"🔥 Modèle {self.model_name} prêt en {elapsed:.2f}s (chargement: {max(load_times):.2f}s, keep_alive={self.keep_alive})")
+        return True
+    
+    def _log_stats(self, success=True, is_timeout=False, chars=0, time_taken=0, tokens=0, result=None):
         """Enregistre les statistiques de traduction pour diagnostiquer les problèmes"""
+        with self._stats_lock:
+            self._update_stats(success, is_timeout, chars, time_taken, tokens)
+            if result:
+                self._record_load(result.get("load_duration", 0) / 1e9)
+    
+    # Au-delà de ce temps de chargement, le modèle a été (re)chargé par Ollama pour la requête
+    RELOAD_THRESHOLD = 1.0
+    
+    def _record_load(self, load_time: float):
+        """Comptabilise le temps de chargement du modèle rapporté par Ollama"""
+        self.stats["load_time"] += load_time
+        if load_time >= self.RELOAD_THRESHOLD:
+            self.stats["model_loads"] += 1
+            print(f"⚠️ Le modèle a été rechargé ({load_time:.1f}s) : augmentez keep_alive pour l'éviter")
+    
+    def _update_stats(self, success, is_timeout, chars, time_taken, tokens):
+        # La première requête est comptée à part (chargement du modèle, connexion)
+        if self.stats["first_request_time"] is None:
+            self.stats["first_request_time"] = time_taken
         self.stats["requests"] += 1
         if is_timeout:
             self.stats["timeouts"] += 1
@@ -53,15 +318,55 @@ class OllamaTranslator:
             self.stats["success"] += 1
             
         self.stats["total_chars"] += chars
+        self.stats["total_tokens"] += tokens
         self.stats["total_time"] += time_taken
         
         # Afficher un résumé périodique
         if self.stats["requests"] % 10 == 0:
             success_rate = (self.stats["success"] / self.stats["requests"]) * 100 if self.stats["requests"] > 0 else 0
-            avg_time = self.stats["total_time"] / self.stats["success"] if self.stats["success"] > 0 else 0
+            avg_time = ((self.stats["total_time"] - self.stats["load_time"]) / self.stats["success"]
+                    if self.stats["success"] > 0 else 0)
             print(f"📊 Statistiques: {self.stats['success']}/{self.stats['requests']} requêtes réussies ({success_rate:.1f}%), "
                   f"{self.stats['timeouts']} timeouts, {self.stats['errors']} erreurs. "
-                  f"Temps moyen: {avg_time:.2f}s")
+                  f"Temps moyen: {avg_time:.2f}s (première requête: {self.stats['first_request_time']:.2f}s, "
+                  f"{self.stats['model_loads']} rechargements du modèle)")
+            connections = self.http.connection_stats()
+            print(f"🔌 Connexions: {connections['connections_opened']} ouvertes pour {connections['requests']} requêtes "
+                  f"({connections['reuse_ratio'] * 100:.1f}% réutilisées)")
+            if self.stats["streamed"] > 0:
+                print(f"⏱️ Streaming: premier token en {self.stats['first_token_time'] / self.stats['streamed']:.2f}s en moyenne, "
+                      f"{self.stats['early_stops']} générations interrompues une fois la traduction complète, "
+                      f"{self.stats['stalls']} blocages")
+            if self.stats["normalized_hits"] > 0:
+                print(f"🔤 Clés normalisées: {self.stats['normalized_hits']} appels au modèle économisés")
+            if self.stats["deduplicated"] + self.stats["coalesced"] > 0:
+                print(f"🔁 Doublons: {self.stats['deduplicated']} sous-titres identiques regroupés, "
+                      f"{self.stats['coalesced']} requêtes déjà en cours partagées")
+            if self.memory is not None:
+                print(f"📚 Mémoire de traduction: {self.memory.stats['hits']} trouvées, "
+                      f"{self.memory.stats['misses']} absentes ({self.memory.hit_ratio() * 100:.1f}%)")
+            print(self.metrics.describe())
+            if self.hedging is not None:
+                print(self.hedging.describe())
+            if self.profile is not None and self.profile.ready:
+                profile = self.profile.report()
+                print(f"📐 Profil appris: {profile['tokens_per_char']:.2f} tokens/caractère, "
+                      f"{profile['tokens_per_second']:.0f} tokens/s, {profile['overhead_seconds']:.2f}s par requête "
+                      f"hors génération ({profile['truncated']} réponses coupées par num_predict)")
+    
+    def _record_event(self, event):
+        """Consommateur d'événements qui alimente les statistiques du traducteur"""
+        with self._stats_lock:
+            if isinstance(event, CacheHit):
+                self.stats[{"memory": "memory_hits", "normalized": "normalized_hits",
+                            "duplicate": "deduplicated"}.get(event.source, "cache_hits")] += event.count
+                self.metrics.observe_cache(event.source, event.count)
+            elif isinstance(event, TranslationStarted):
+                self.metrics.observe_cues(event.total + event.cached)
+            elif isinstance(event, RetryScheduled):
+                self.stats["retries"] += 1
+            elif isinstance(event, BatchCompleted):
+                self.stats["batches"] += 1
     
     def translate(self, text: str) -> str:
         """Traduit un texte anglais en français avec gestion de cache"""
@@ -69,57 +374,516 @@ class OllamaTranslator:
         if not text or text.strip() == "":
             return ""
         
-        # Vérifier le cache
-        if text in self.cache:
-            return self.cache[text]
+        # Vérifier le cache puis la mémoire persistante
+        self.metrics.observe_cues(1)
+        with span("cache_lookup"):
+            cached, source = self._lookup(text)
+        if cached is not None:
+            self.metrics.observe_cache(source)
+            return cached
+        
+        # Le même texte est déjà en cours de traduction (autre thread) : attendre son résultat
+        future, owner = self.flights.begin(text)
+        if not owner:
+            with self._stats_lock:
+                self.stats["coalesced"] += 1
+            self.metrics.observe_cache("coalesced")
+            with span("flight_wait"):
+                return future.result()
+        translation = text
+        try:
+            translation = self._request_translation(text)
+        finally:
+            self.flights.finish(text, translation)
+        return translation
+    
+    def _request_translation(self, text: str) -> str:
+        """Envoie la requête de traduction à Ollama (sans consulter le cache)"""
+        translation, _ = self._request_translation_outcome(text)
+        return translation
+    
+    def _request_translation_outcome(self, text: str):
+        """Envoie la requête de traduction à Ollama
         
+        Returns:
+            tuple: (traduction, outcome). En cas d'échec la traduction est le texte d'origine
+            (ou un marqueur de timeout) et outcome indique la nature de l'échec.
+        """
         # Prompt ultra-optimisé pour la traduction rapide
-        prompt = f"""Traduis en français: {text}"""
+        prompt = self.PROMPT_TEMPLATE.format(text=text)
         
-        # Timeout beaucoup plus long pour éviter les erreurs de read timeout
-        timeout = min(120, 30 + len(text) // 20)  # Timeout très généreux
+        # Délai et limite de génération appris du modèle (formules fixes tant que le profil est vide)
+        timeout, num_predict = self._budget(len(text), 0, min(120, 30 + len(text) // 20), min(200, len(text) * 2))
         
         start_time = time.time()
         try:
             payload = {
                 "model": self.model_name,
                 "prompt": prompt,
-                "stream": False,
-                "temperature": 0.1,  # Température basse pour des résultats plus déterministes
-                "num_predict": min(200, len(text) * 2)  # Limite de prédiction pour accélérer
+                "options": {
+                    "temperature": 0.1,  # Température basse pour des résultats plus déterministes
+                    "num_predict": num_predict  # Limite de prédiction pour accélérer
+                }
             }
             
             # Ajouter des logs pour diagnostiquer les problèmes de timeout
             print(f"Envoi de la requête avec timeout={timeout}s pour {len(text)} caractères")
             
-            response = requests.post(self.api_url, json=payload, timeout=timeout)
+            # En streaming, la génération s'arrête dès que toutes les lignes du sous-titre sont traduites
+            expected_lines = max(1, sum(1 for line in text.splitlines() if line.strip()))
+            with span("request", chars=len(text)):
+                status_code, response_text, result = self._generate(
+                    payload, timeout, lambda partial: self._single_complete(partial, expected_lines), cost=len(text))
             
-            if response.status_code != 200:
-                print(f"Erreur: L'API Ollama a retourné le code {response.status_code}")
+            if status_code != 200:
+                print(f"Erreur: L'API Ollama a retourné le code {status_code}")
                 self._log_stats(success=False, chars=len(text), time_taken=time.time() - start_time)
-                return text
+                return text, outcome_for_status(status_code)
             
-            result = response.json()
-            translation = result.get("response", "").strip()
+            translation = response_text.strip()
             
             # Nettoyage basique et stockage en cache
-            translation = self._clean_translation(translation)
-            self.cache[text] = translation
+            with span("clean"):
+                translation = self._clean_translation(translation)
+            with span("remember"):
+                self._remember(text, translation)
             
             # Enregistrer les statistiques
-            self._log_stats(success=True, chars=len(text), time_taken=time.time() - start_time)
+            time_taken = time.time() - start_time
+            self._log_stats(success=True, chars=len(text), time_taken=time_taken,
+                            tokens=result.get("eval_count", 0), result=result)
+            if self.profile is not None:
+                self.profile.observe(len(text), time_taken, result, num_predict)
             
-            return translation
+            return translation, OUTCOME_OK
         except requests.exceptions.Timeout:
+            # Une traduction partielle d'un sous-titre n'est pas utilisable : elle est abandonnée
             time_taken = time.time() - start_time
             print(f"⚠️ Timeout lors de la traduction ({timeout}s) pour {len(text)} caractères. Temps écoulé: {time_taken:.1f}s.")
             self._log_stats(success=False, is_timeout=True, chars=len(text), time_taken=time_taken)
-            return f"[Timeout après {timeout}s] {text[:50]}..." if len(text) > 50 else text
+            marker = f"[Timeout après {timeout}s] {text[:50]}..." if len(text) > 50 else text
+            return marker, OUTCOME_TIMEOUT
         except Exception as e:
             print(f"Erreur pendant la traduction: {str(e)}")
             self._log_stats(success=False, chars=len(text), time_taken=time.time() - start_time)
             # Retourner le texte d'origine en cas d'erreur
-            return text
+            return text, OUTCOME_ERROR
+    
+    def _generate(self, payload: dict, timeout: float, complete=None, cost: int = None):
+        """Envoie une requête /api/generate, en streaming si le mode est activé
+        
+        Args:
+            complete (callable, optional): Reçoit le texte déjà généré et retourne True
+                quand la traduction est complète (streaming uniquement)
+            cost (int, optional): Longueur du texte à traduire ; les requêtes de secours ne
+                concernent que les requêtes dont le coût est connu
+        
+        Returns:
+            tuple: (code HTTP, texte généré, métadonnées de la réponse finale)
+        """
+        payload = dict(payload, keep_alive=self.keep_alive)
+        if self.hedging is not None and cost is not None:
+            return self._generate_hedged(payload, timeout, complete, cost)
+        return self._generate_attempt(payload, timeout, complete)
+    
+    def _generate_attempt(self, payload: dict, timeout: float, complete=None, cancel=None, tried=None):
+        """Une tentative de requête, renvoyée à un autre serveur si le premier est injoignable
+        
+        Args:
+            cancel (AttemptCancel, optional): Interrompt la requête quand il est levé
+            tried (list, optional): Serveurs à éviter ; reçoit les serveurs utilisés
+        """
+        tried = [] if tried is None else tried
+        while True:
+            backend = self.pool.acquire(exclude=tried)
+            tried.append(backend)
+            start_time = time.time()
+            status_code, result = 0, {}
+            try:
+                with span("http", backend=backend.name, stream=self.stream):
+                    status_code, response_text, result = self._send(backend, payload, timeout, complete, cancel)
+                return status_code, response_text, result
+            except requests.exceptions.ConnectionError as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    raise
+                # Serveur injoignable : le retirer et renvoyer la requête à un autre serveur
+                self.pool.mark_unhealthy(backend, str(e))
+                if len(tried) >= len(self.pool):
+                    raise
+            finally:
+                latency = time.time() - start_time
+                if cancel is not None and cancel.is_set() and status_code != 200:
+                    # Perdante d'une requête doublée : ni un échec du serveur ni une latence représentative
+                    self.pool.release(backend, latency, False, cancelled=True)
+                else:
+                    self.pool.release(backend, latency, status_code == 200, result.get("eval_count", 0))
+                    self.metrics.observe_request(self.model_name, backend.name, latency, status_code == 200, result)
+    
+    def _generate_hedged(self, payload: dict, timeout: float, complete, cost: int):
+        """Envoie la requête et la double si elle dépasse le percentile de latence récente
+        
+        La première réponse réussie est gardée ; la connexion de l'autre tentative est
+        fermée aussitôt (voir AttemptCancel).
+        """
+        policy = self.hedging
+        delay = policy.delay(cost)
+        start_time = time.time()
+        primary_cancel, primary_tried = AttemptCancel(), []
+        primary = self._hedge_executor.submit(self._generate_attempt, payload, timeout, complete,
+                                              primary_cancel, primary_tried)
+        attempts = {primary: primary_cancel}
+        if delay is not None and delay < timeout:
+            concurrent.futures.wait([primary], timeout=delay)
+            if not primary.done() and policy.try_spend():
+                print(f"🐇 Requête plus lente que {delay:.1f}s : copie envoyée")
+                hedge_cancel = AttemptCancel()
+                hedge = self._hedge_executor.submit(self._generate_attempt, payload, timeout - delay, complete,
+                                                    hedge_cancel, list(primary_tried))
+                attempts[hedge] = hedge_cancel
+        
+        # Première réponse réussie ; à défaut, l'issue de la requête d'origine
+        pending = set(attempts)
+        winner = None
+        while pending and winner is None:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result()[0] == 200:
+                    winner = future
+                    break
+        if winner is None:
+            return primary.result()
+        for future in pending:
+            attempts[future].set()
+        if len(attempts) > 1:
+            policy.record(hedge_won=winner is not primary, cancelled=len(pending))
+        policy.observe(time.time() - start_time, cost)
+        return winner.result()
+    
+    def _send(self, backend, payload: dict, timeout: float, complete=None, cancel=None):
+        """Envoie une requête à un serveur et retourne (code HTTP, texte généré, métadonnées)
+        
+        Une requête interruptible (`cancel`) est lue en streaming : la connexion peut être
+        fermée entre deux morceaux de la réponse. Si le streaming n'est pas demandé
+        (`stream=False`), seul le délai global s'applique, comme pour une requête classique.
+        """
+        if self.stream or cancel is not None:
+            return self._generate_stream(backend.api_url, payload, timeout, complete if self.stream else None, cancel)
+        response = self.http.post(backend.api_url, json=dict(payload, stream=False), timeout=timeout)
+        if response.status_code != 200:
+            return response.status_code, "", {}
+        result = response.json()
+        return response.status_code, result.get("response", ""), result
+    
+    def _generate_stream(self, url: str, payload: dict, timeout: float, complete=None, cancel=None):
+        """Lit la réponse NDJSON d'Ollama au fil de la génération
+        
+        Le premier token doit arriver avant `first_token_timeout`, les suivants à moins de
+        `inter_token_timeout` d'intervalle, et la génération complète avant `timeout`.
+        Dès que `complete` signale une traduction terminée, la connexion est fermée, ce qui
+        arrête la génération côté Ollama (commentaires ajoutés par le modèle). De même quand
+        `cancel` est levé (copie d'une requête doublée arrivée la première). Sans le mode
+        streaming (requête de secours avec `stream=False`), les délais par token valent le
+        délai global.
+        """
+        start_time = time.time()
+        if self.stream:
+            first_token_timeout, inter_token_timeout = self.first_token_timeout, self.inter_token_timeout
+        else:
+            first_token_timeout = inter_token_timeout = timeout
+        response = self.http.post(url, json=dict(payload, stream=True),
+                                  timeout=min(timeout, first_token_timeout), stream=True)
+        if response.status_code != 200:
+            response.close()
+            return response.status_code, "", {}
+        if cancel is not None and not cancel.attach(response):
+            response.close()
+            raise HedgeCancelled("Copie de la requête arrivée la première")
+        
+        parts = []
+        result = {}
+        first_token = None
+        stopped = False
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if first_token is None:
+                    first_token = time.time() - start_time
+                    _set_read_timeout(response, inter_token_timeout)
+                    if self.stream:
+                        print(f"Premier token après {first_token:.2f}s")
+                if cancel is not None and cancel.is_set():
+                    raise HedgeCancelled("Copie de la requête arrivée la première")
+                piece = chunk.get("response", "")
+                parts.append(piece)
+                if chunk.get("done"):
+                    result = chunk
+                    continue
+                if time.time() - start_time > timeout:
+                    with self._stats_lock:
+                        self.stats["stalls"] += 1
+                    raise StreamStalled(f"Génération plus longue que {timeout}s", "".join(parts))
+                if complete is not None and "\n" in piece:
+                    text = "".join(parts)
+                    if complete(text):
+                        # Chaque morceau reçu est un token généré, même ceux qui seront écartés
+                        generated = len(parts)
+                        # Ne garder que les lignes terminées, le reste est du commentaire
+                        parts = [text[:text.rindex("\n")]]
+                        stopped = True
+                        break
+        except Exception as e:
+            if cancel is not None and cancel.is_set() and not isinstance(e, HedgeCancelled):
+                # Connexion fermée par la tentative gagnante pendant la lecture
+                raise HedgeCancelled("Copie de la requête arrivée la première") from e
+            if not isinstance(e, requests.exceptions.ConnectionError):
+                raise
+            if e.args and isinstance(e.args[0], ReadTimeoutError):
+                deadline = "premier token" if first_token is None else "token suivant"
+                with self._stats_lock:
+                    self.stats["stalls"] += 1
+                raise StreamStalled(f"Délai dépassé en attendant le {deadline}", "".join(parts))
+            raise
+        finally:
+            response.close()
+        if cancel is not None and cancel.is_set() and not result and not stopped:
+            # Fin de réponse provoquée par la fermeture de la connexion
+            raise HedgeCancelled("Copie de la requête arrivée la première")
+        
+        with self._stats_lock:
+            self.stats["streamed"] += 1
+            self.stats["first_token_time"] += first_token or 0
+            if stopped:
+                self.stats["early_stops"] += 1
+        if stopped:
+            # Pas de réponse finale : estimer les tokens générés à partir des morceaux reçus
+            result = {"eval_count": generated}
+        return 200, "".join(parts), result
+    
+    def _single_complete(self, partial: str, expected_lines: int) -> bool:
+        """Indique si la réponse contient les `expected_lines` lignes traduites d'un sous-titre
+        
+        Les lignes d'introduction (« Voici la traduction : ») ne sont pas comptées.
+        """
+        lines = partial.split("\n")[:-1]
+        translated = [line for line in lines if line.strip() and not line.strip().endswith(":")]
+        return len(translated) >= expected_lines
+    
+    def _salvage_packed(self, partial: str, texts: List[str]):
+        """Conserve les lignes complètes d'une réponse groupée interrompue
+        
+        Les sous-titres récupérés sont mis en cache et ne seront pas renvoyés au modèle.
+        """
+        if not partial:
+            return
+        numbered_line = re.compile(r'^\s*\[(\d+)\]\s*(.*)$')
+        salvaged = {}
+        for line in partial.split("\n")[:-1]:
+            match = numbered_line.match(line)
+            if match and 1 <= int(match.group(1)) <= len(texts):
+                text = re.sub(r'\s*<br\s*/?>\s*', '\n', match.group(2).strip(), flags=re.IGNORECASE)
+                text = self._clean_translation(text)
+                if text:
+                    salvaged[int(match.group(1))] = text
+        for number, translation in salvaged.items():
+            self._remember(texts[number - 1], translation)
+        if salvaged:
+            with self._stats_lock:
+                self.stats["salvaged"] += len(salvaged)
+            print(f"{len(salvaged)}/{len(texts)} sous-titres récupérés de la réponse interrompue")
+    
+    @property
+    def prompt_version(self) -> str:
+        """Version du prompt actif, utilisée comme clé de la mémoire de traduction"""
+        return self.PACKED_PROMPT_VERSION if self.packed else self.PROMPT_VERSION
+    
+    def _pack_prompt(self, texts: List[str]) -> str:
+        """Construit le prompt du mode groupé avec des lignes numérotées [1], [2], ..."""
+        lines = []
+        for number, text in enumerate(texts, 1):
+            flat = self.PACKED_LINE_BREAK.join(part.strip() for part in text.strip().splitlines())
+            lines.append(f"[{number}] {flat}")
+        return self.PACKED_PROMPT_TEMPLATE.format(lines="\n".join(lines))
+    
+    def _parse_packed_response(self, response: str, count: int):
+        """Découpe la réponse du mode groupé en traductions individuelles
+        
+        Returns:
+            list: Les `count` traductions dans l'ordre, ou None si la réponse est désalignée
+            (numéro manquant, lignes fusionnées, numéro en double ou en trop). Le texte non
+            numéroté qui suit une ligne vide ou le dernier numéro n'est rattaché à aucune
+            traduction.
+        """
+        numbered_line = re.compile(r'^\s*\[(\d+)\]\s*(.*)$')
+        translations = {}
+        current = None
+        
+        for line in response.splitlines():
+            match = numbered_line.match(line)
+            if match:
+                number = int(match.group(1))
+                if number in translations or not 1 <= number <= count:
+                    return None
+                translations[number] = match.group(2).strip()
+                # Après le dernier numéro attendu, le texte non numéroté est du commentaire
+                current = number if number < count else None
+            elif not line.strip():
+                # Le texte qui suit une ligne vide n'appartient plus à la traduction précédente
+                current = None
+            elif current is not None:
+                # Ligne de continuation : le modèle a coupé une traduction en deux
+                translations[current] = f"{translations[current]} {line.strip()}"
+            # Sinon : texte ajouté par le modèle (« Note : ... »), ignoré
+        
+        if len(translations) != count:
+            return None
+        
+        results = []
+        for number in range(1, count + 1):
+            text = translations[number]
+            text = re.sub(r'\s*<br\s*/?>\s*', '\n', text, flags=re.IGNORECASE)
+            text = self._clean_translation(text)
+            if not text:
+                return None
+            results.append(text)
+        return results
+    
+    def _request_packed(self, texts: List[str]):
+        """Envoie un groupe de sous-titres dans une seule requête
+        
+        Returns:
+            tuple: (traductions ou None, outcome). Une réponse désalignée donne OUTCOME_MISALIGNED.
+        """
+        prompt = self._pack_prompt(texts)
+        total_chars = sum(len(text) for text in texts)
+        # Chaque ligne a besoin de quelques tokens en plus pour son numéro
+        timeout, num_predict = self._budget(total_chars, len(texts), min(300, 30 + total_chars // 20),
+                                            min(4096, sum(min(200, len(text) * 2) + 8 for text in texts)))
+        
+        start_time = time.time()
+        with self._stats_lock:
+            self.stats["packed_requests"] += 1
+        try:
+            payload = {
+                "model": self.model_name,
+                "prompt": prompt,
+                "options": {"temperature": 0.1, "num_predict": num_predict}
+            }
+            
+            print(f"Envoi d'une requête groupée de {len(texts)} sous-titres avec timeout={timeout}s ({total_chars} caractères)")
+            # En streaming, la génération s'arrête dès que la ligne du dernier numéro est terminée
+            last_line = re.compile(rf'^\s*\[{len(texts)}\].*\n', re.MULTILINE)
+            with span("request_packed", cues=len(texts), chars=total_chars):
+                status_code, response_text, result = self._generate(
+                    payload, timeout, lambda partial: last_line.search(partial) is not None, cost=total_chars)
+            
+            if status_code != 200:
+                print(f"Erreur: L'API Ollama a retourné le code {status_code}")
+                self._log_stats(success=False, chars=total_chars, time_taken=time.time() - start_time)
+                return None, outcome_for_status(status_code)
+            
+            translations = self._parse_packed_response(response_text, len(texts))
+            if translations is None:
+                print(f"⚠️ Réponse groupée désalignée pour {len(texts)} sous-titres")
+                self._log_stats(success=False, chars=total_chars, time_taken=time.time() - start_time)
+                return None, OUTCOME_MISALIGNED
+            
+            for text, translation in zip(texts, translations):
+                self._remember(text, translation)
+            time_taken = time.time() - start_time
+            self._log_stats(success=True, chars=total_chars, time_taken=time_taken,
+                            tokens=result.get("eval_count", 0), result=result)
+            if self.profile is not None:
+                self.profile.observe(total_chars, time_taken, result, num_predict)
+            return translations, OUTCOME_OK
+        except requests.exceptions.Timeout as e:
+            time_taken = time.time() - start_time
+            print(f"⚠️ Timeout de la requête groupée ({timeout}s) pour {len(texts)} sous-titres.")
+            self._log_stats(success=False, is_timeout=True, chars=total_chars, time_taken=time_taken)
+            self._salvage_packed(getattr(e, "partial", ""), texts)
+            return None, OUTCOME_TIMEOUT
+        except Exception as e:
+            print(f"Erreur pendant la traduction groupée: {str(e)}")
+            self._log_stats(success=False, chars=total_chars, time_taken=time.time() - start_time)
+            return None, OUTCOME_ERROR
+    
+    def _budget(self, chars: int, lines: int, default_timeout: float, default_predict: int):
+        """Délai et limite de génération d'une requête (appris, ou valeurs par défaut)"""
+        if self.profile is not None:
+            timeout, num_predict = self.profile.budget(chars, lines)
+            if timeout is not None:
+                return timeout, num_predict
+        return default_timeout, default_predict
+    
+    def _lookup(self, text: str):
+        """Cherche une traduction dans le cache, la mémoire persistante puis par clé normalisée
+        
+        Returns:
+            tuple: (traduction ou None, source : "cache", "memory" ou "normalized")
+        """
+        if text in self.cache:
+            return self.cache[text], "cache"
+        if self.memory is not None:
+            translation = self.memory.get(self.model_name, self.prompt_version, text)
+            if translation is not None:
+                self.cache[text] = translation
+                return translation, "memory"
+        translation = self._apply_template(text, load=True)
+        if translation is not None:
+            with self._stats_lock:
+                self.stats["normalized_hits"] += 1
+        return translation, "normalized"
+    
+    @property
+    def template_version(self) -> str:
+        """Espace des traductions partagées dans la mémoire de traduction"""
+        return self.prompt_version + "+norm-1"
+    
+    def _cache_key(self, text: str):
+        """Clé normalisée d'un texte (None si la normalisation est désactivée ou impossible)"""
+        if not self.normalize:
+            return None
+        return normalize(text)[0]
+    
+    def _apply_template(self, text: str, load: bool = False):
+        """Traduction d'un texte obtenue à partir de la traduction partagée de sa clé normalisée
+        
+        Args:
+            load (bool): Chercher aussi la traduction partagée dans la mémoire persistante
+        """
+        if not self.normalize:
+            return None
+        key, form = normalize(text)
+        if key is None:
+            return None
+        template = self.templates.get(key)
+        if template is None and load and self.memory is not None:
+            template = self.memory.get(self.model_name, self.template_version, key, count=False)
+            if template is not None:
+                self.templates[key] = template
+        if template is None:
+            return None
+        translation = apply_form(template, form)
+        if translation is not None:
+            self.cache[text] = translation
+        return translation
+    
+    def _remember(self, text: str, translation: str):
+        """Enregistre une traduction réussie dans le cache et la mémoire persistante"""
+        self.cache[text] = translation
+        if self.memory is not None and translation:
+            self.memory.put(self.model_name, self.prompt_version, text, translation)
+        
+        # Traduction partagée avec les textes de même clé normalisée
+        if self.normalize and translation:
+            key, form = normalize(text)
+            if key is not None and key not in self.templates:
+                template = make_template(translation, form)
+                if template is not None:
+                    self.templates[key] = template
+                    if self.memory is not None:
+                        self.memory.put(self.model_name, self.template_version, key, template)
     
     def _clean_translation(self, translation: str) -> str:
         """Nettoie la traduction"""
@@ -148,130 +912,93 @@ class OllamaTranslator:
         
         return translation
     
-    def translate_batch(self, texts: List[str], batch_size: int = 10) -> List[str]:
-        """Traduit un lot de textes avec rapport de progression détaillé"""
-        # Si la liste est vide, retourner une liste vide
-        if not texts:
-            return []
-            
-        # Vérifier le cache d'abord
+    def translate_batch(self, texts: List[str], batch_size: int = 10, on_result=None, on_event=None) -> List[str]:
+        """Traduit un lot de textes avec rapport de progression détaillé
+        
+        Les requêtes sont pilotées par le moteur asyncio (`self.engine`) dont la concurrence
+        s'adapte à la latence du serveur. En mode groupé (`packed`), `batch_size` est le
+        nombre de sous-titres envoyés dans chaque requête. `on_result(indice, traduction)`
+        est appelé pour chaque texte traduit avec succès (y compris depuis le cache), dès qu'il est terminé.
+        `on_event(événement)` reçoit les événements de progression (voir progress_events),
+        une barre tqdm est affichée s'il n'est pas fourni.
+        """
+        try:
+            return self.engine.run(self.engine.translate_batch(texts, batch_size, on_result, on_event))
+        finally:
+            if self.profile is not None:
+                self.profile.save()
+    
+    def _plan_batch(self, texts: List[str], emit=None):
+        """Sépare les textes déjà connus (cache, mémoire, clé normalisée) de ceux à envoyer au modèle
+        
+        Les textes identiques sont regroupés en une seule unité de travail : chaque texte à
+        traduire n'apparaît qu'une fois, avec la liste de ses positions dans `texts`.
+        
+        Returns:
+            tuple: (résultats pré-remplis, textes uniques à traduire, positions de chacun dans `texts`)
+        """
         results = [""] * len(texts)
-        to_translate = []
-        indices = []
+        positions = {}
+        cached = 0
         
         # Identifier les textes qui ne sont pas dans le cache
         for i, text in enumerate(texts):
+            if not text or text.strip() == "":
+                continue
             if text in self.cache:
                 results[i] = self.cache[text]
+                cached += 1
             else:
-                to_translate.append(text)
-                indices.append(i)
-        
-        # Si tout est déjà dans le cache, retourner les résultats
-        if not to_translate:
-            return results
-        
-        # Calculer le nombre de batches
-        total_batches = (len(to_translate) + batch_size - 1) // batch_size
-        
-        print(f"Traduction de {len(to_translate)} sous-titres en {total_batches} batches...")
-        
-        # Fonction pour traduire un texte avec retries
-        def translate_with_retry(text, retries=3, index=None):
-            for attempt in range(retries + 1):
-                try:
-                    result = self.translate(text)
-                    # Si le résultat commence par [Timeout après
-                    if result.startswith("[Timeout après"):
-                        if attempt < retries:
-                            wait_time = 3 + attempt * 3
-                            print(f"Nouvelle tentative après timeout. Attente de {wait_time}s... (tentative {attempt+1}/{retries+1})")
-                            time.sleep(wait_time)
-                            continue
-                    return result
-                except Exception as e:
-                    if attempt < retries:
-                        # Attente exponentielle entre les tentatives
-                        wait_time = 2 + attempt * 3
-                        print(f"Nouvelle tentative après erreur: {str(e)}. Attente de {wait_time}s... (tentative {attempt+1}/{retries+1})")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"Échec après {retries+1} tentatives: {str(e)}")
-                        return f"[Erreur de traduction: {str(e)}]"
-        
-        # Traiter par petits groupes pour éviter les surcharges
-        processed = 0
-        with tqdm(total=len(to_translate), desc="Traduction", unit="sous-titre") as pbar:
-            for i in range(0, len(to_translate), batch_size):
-                current_batch = to_translate[i:i+batch_size]
-                batch_indices = indices[i:i+batch_size]
-                batch_num = i // batch_size + 1
-                
-                print(f"Traitement du batch {batch_num}/{total_batches} ({len(current_batch)} sous-titres)")
-                
-                # Mode ultra rapide pour les petits textes
-                if all(len(text) < 100 for text in current_batch):
-                    # Traitement séquentiel pour éviter la surcharge du serveur
-                    for idx, text in enumerate(current_batch):
-                        batch_idx = batch_indices[idx]
-                        results[batch_idx] = translate_with_retry(text)
-                        self.cache[text] = results[batch_idx]  # Mise à jour du cache
-                        pbar.update(1)
-                        processed += 1
-                        # Petite pause entre chaque traduction pour donner du répit au serveur
-                        if idx < len(current_batch) - 1:
-                            time.sleep(0.2)
+                positions.setdefault(text, []).append(i)
+        
+        if emit is not None and cached:
+            emit(CacheHit(cached, "cache"))
+        
+        # Les doublons ne sont traduits qu'une fois, la traduction est recopiée à chaque position
+        to_translate = list(positions)
+        indices = list(positions.values())
+        
+        def resolve(found, source):
+            # Retire les textes résolus de la liste à traduire
+            nonlocal to_translate, indices
+            remaining_texts, remaining_indices = [], []
+            resolved = 0
+            for text, text_positions in zip(to_translate, indices):
+                translation = found(text)
+                if translation is not None:
+                    for i in text_positions:
+                        results[i] = translation
+                    resolved += len(text_positions)
                 else:
-                    # Traitement spécial pour les textes longs (plus de 100 caractères)
-                    long_texts = [idx for idx, text in enumerate(current_batch) if len(text) >= 200]
-                    if long_texts:
-                        print(f"Attention: {len(long_texts)} textes longs détectés dans ce lot. Traitement séquentiel pour éviter les timeouts.")
-                        
-                        # Traiter d'abord les textes longs séquentiellement avec plus de patience
-                        for text_idx in long_texts:
-                            text = current_batch[text_idx]
-                            batch_idx = batch_indices[text_idx]
-                            print(f"Traitement d'un texte long ({len(text)} caractères)...")
-                            results[batch_idx] = translate_with_retry(text, retries=4)
-                            self.cache[text] = results[batch_idx]
-                            pbar.update(1)
-                            processed += 1
-                            # Pause plus longue après un texte long
-                            time.sleep(0.5)
-                    
-                    # Traiter le reste des textes (moins longs) en parallèle
-                    remaining_indices = [idx for idx in range(len(current_batch)) if idx not in long_texts]
-                    if remaining_indices:
-                        # Limiter encore plus le nombre de workers pour les textes restants
-                        max_workers = min(2, len(remaining_indices))
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                            future_to_idx = {}
-                            for idx in remaining_indices:
-                                text = current_batch[idx]
-                                batch_idx = batch_indices[idx]
-                                future = executor.submit(translate_with_retry, text)
-                                future_to_idx[future] = batch_idx
-                            
-                            for future in concurrent.futures.as_completed(future_to_idx):
-                                batch_idx = future_to_idx[future]
-                                text_idx = batch_indices.index(batch_idx)
-                                orig_text = current_batch[remaining_indices[text_idx % len(remaining_indices)]]
-                                try:
-                                    results[batch_idx] = future.result()
-                                    self.cache[orig_text] = results[batch_idx]
-                                except Exception as e:
-                                    results[batch_idx] = f"[Erreur: {str(e)}]"
-                                pbar.update(1)
-                                processed += 1
-                
-                # Sauvegarder les résultats intermédiaires
-                print(f"✓ Batch {batch_num}/{total_batches} terminé ({processed}/{len(to_translate)})")
-                
-                # Pause entre les batches pour donner du répit au serveur
-                if i + batch_size < len(to_translate):
-                    time.sleep(0.2)
+                    remaining_texts.append(text)
+                    remaining_indices.append(text_positions)
+            if emit is not None and resolved:
+                emit(CacheHit(resolved, source))
+            to_translate, indices = remaining_texts, remaining_indices
+            return resolved
         
-        return results
+        # Puis interroger la mémoire persistante en une seule requête
+        if to_translate and self.memory is not None:
+            remembered = self.memory.get_many(self.model_name, self.prompt_version, to_translate)
+            if remembered:
+                self.cache.update(remembered)
+                print(f"Mémoire de traduction: {resolve(remembered.get, 'memory')} sous-titres déjà traduits")
+        
+        # Enfin, les textes dont la clé normalisée a déjà une traduction partagée
+        if to_translate and self.normalize:
+            if self.memory is not None:
+                keys = {self._cache_key(text) for text in to_translate} - {None} - set(self.templates)
+                if keys:
+                    self.templates.update(self.memory.get_many(self.model_name, self.template_version, list(keys),
+                                                              count=False))
+            resolve(self._apply_template, "normalized")
+        
+        # Appels au modèle économisés par le regroupement des doublons restant à traduire
+        duplicates = sum(len(text_positions) - 1 for text_positions in indices)
+        if emit is not None and duplicates:
+            emit(CacheHit(duplicates, "duplicate"))
+        
+        return results, to_translate, indices
 
 # Test simple si exécuté directement
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Mesure du temps passé dans chaque étape d'une traduction
+
+Les étapes (lecture, filtrage, fusion, recherche dans le cache, attente d'une place,
+requêtes HTTP, pauses avant nouvelle tentative, écriture...) sont entourées de
+`span("nom")`. Le profilage est désactivé par défaut : `span` retourne alors un objet
+vide et ne mesure rien. Une fois activé (`enable_tracing()`, `--trace` ou SRT_TRACE),
+chaque étape est enregistrée ; le résumé par étape s'affiche avec `format_summary()` et
+la trace complète s'exporte au format Chrome trace-event (chrome://tracing, Perfetto).
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+
+# Variable d'environnement : chemin du fichier de trace à écrire (active le profilage)
+TRACE_ENV = "SRT_TRACE"
+
+
+class _NullSpan:
+    """Étape non mesurée (profilage désactivé)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Étape synchrone : commence et finit dans le même thread"""
+
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._complete(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class _AsyncSpan(_Span):
+    """Étape d'une coroutine : plusieurs se chevauchent dans le thread de la boucle asyncio"""
+
+    __slots__ = ()
+
+    def __exit__(self, *exc):
+        self.tracer._complete(self.name, self.start, time.perf_counter(), self.args, asynchronous=True)
+        return False
+
+
+class Tracer:
+    """Enregistre les étapes mesurées et leurs durées cumulées"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self.events = []
+        self.totals = {}  # Étape -> [appels, durée cumulée, durée maximale]
+        self.threads = {}  # Identifiant de thread -> nom
+
+    def _complete(self, name, start, end, args, asynchronous=False):
+        duration = end - start
+        thread = threading.current_thread()
+        timestamp = (start - self._origin) * 1e6
+        if asynchronous:
+            # Événements asynchrones "b"/"e" : affichés sur une piste à part, sans imbrication
+            span_id = next(self._ids)
+            events = [
+                {"name": name, "cat": "async", "ph": "b", "id": span_id, "ts": timestamp,
+                 "pid": os.getpid(), "tid": thread.ident, "args": args},
+                {"name": name, "cat": "async", "ph": "e", "id": span_id, "ts": timestamp + duration * 1e6,
+                 "pid": os.getpid(), "tid": thread.ident}
+            ]
+        else:
+            events = [{"name": name, "cat": "stage", "ph": "X", "ts": timestamp, "dur": duration * 1e6,
+                       "pid": os.getpid(), "tid": thread.ident, "args": args}]
+        with self._lock:
+            self.events.extend(events)
+            self.threads.setdefault(thread.ident, thread.name)
+            total = self.totals.get(name)
+            if total is None:
+                self.totals[name] = [1, duration, duration]
+            else:
+                total[0] += 1
+                total[1] += duration
+                total[2] = max(total[2], duration)
+
+    def summary(self) -> list:
+        """Durées par étape, de la plus coûteuse à la moins coûteuse"""
+        with self._lock:
+            totals = {name: list(values) for name, values in self.totals.items()}
+        wall = time.perf_counter() - self._origin
+        rows = []
+        for name, (calls, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            rows.append({
+                "stage": name,
+                "calls": calls,
+                "total_seconds": round(total, 4),
+                "mean_ms": round(total / calls * 1000, 3),
+                "max_ms": round(longest * 1000, 3),
+                "share": round(total / wall, 4) if wall > 0 else 0.0
+            })
+        return rows
+
+    def format_summary(self) -> str:
+        """Tableau des étapes pour la ligne de commande"""
+        rows = self.summary()
+        if not rows:
+            return "Aucune étape mesurée"
+        width = max(len("Étape"), max(len(row["stage"]) for row in rows))
+        lines = [f"{'Étape':<{width}}  {'Appels':>7}  {'Total (s)':>10}  {'Moyenne (ms)':>12}  {'Max (ms)':>10}  {'% durée':>8}",
+                 "-" * (width + 59)]
+        for row in rows:
+            lines.append(f"{row['stage']:<{width}}  {row['calls']:>7}  {row['total_seconds']:>10.3f}  "
+                         f"{row['mean_ms']:>12.2f}  {row['max_ms']:>10.2f}  {row['share'] * 100:>7.1f}%")
+        lines.append("(durées cumulées : les étapes parallèles ou imbriquées se recouvrent)")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path: str):
+        """Écrit la trace au format Chrome trace-event (chrome://tracing, ui.perfetto.dev)"""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}}
+                    for ident, name in threads.items()]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+_tracer = None  # Tracer actif, None quand le profilage est désactivé
+
+
+def span(name: str, **args):
+    """Mesure une étape synchrone : `with span("lecture"): ...`"""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, args)
+
+
+def async_span(name: str, **args):
+    """Mesure une étape d'une coroutine (attente, pause) qui peut en chevaucher d'autres"""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _AsyncSpan(tracer, name, args)
+
+
+def enable_tracing() -> Tracer:
+    """Active le profilage (un nouveau Tracer remplace le précédent)"""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing():
+    """Désactive le profilage et retourne le Tracer qui était actif"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def trace_path_from_env():
+    """Fichier de trace demandé par SRT_TRACE (None si le profilage n'est pas demandé)"""
+    return os.environ.get(TRACE_ENV) or None
+
+
+def finish_tracing(path: str = None):
+    """Désactive le profilage, affiche le tableau des étapes et écrit la trace si `path` est fourni"""
+    tracer = disable_tracing()
+    if tracer is None:
+        return None
+    print("\n⏲️ Temps par étape:")
+    print(tracer.format_summary())
+    if path:
+        tracer.write_chrome_trace(path)
+        print(f"Trace écrite dans {path} (à ouvrir dans chrome://tracing ou ui.perfetto.dev)")
+    return tracer
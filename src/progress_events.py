@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Événements de progression émis par OllamaTranslator et SRTTranslator
+
+Les consommateurs (interface Streamlit, barre tqdm de la ligne de commande, métriques)
+reçoivent des objets typés via une fonction de rappel `on_event(event)` au lieu
+d'analyser les messages affichés dans la console.
+"""
+
+from dataclasses import dataclass, asdict
+from tqdm import tqdm
+
+
+@dataclass
+class FileStarted:
+    """Un fichier SRT a été chargé et prétraité"""
+    path: str
+    cues: int
+
+
+@dataclass
+class TranslationStarted:
+    """Début d'un lot : `total` textes à envoyer au modèle, `cached` déjà connus"""
+    total: int
+    cached: int
+    batches: int
+
+
+@dataclass
+class CacheHit:
+    """Textes trouvés sans appel au modèle (`source` : "cache" ou "memory")"""
+    count: int
+    source: str
+
+
+@dataclass
+class CuesCompleted:
+    """Des sous-titres viennent d'être traduits"""
+    count: int
+    done: int
+    total: int
+
+
+@dataclass
+class BatchCompleted:
+    """Tous les sous-titres d'un batch sont traduits"""
+    batch: int
+    batches: int
+    done: int
+    total: int
+    seconds: float
+
+
+@dataclass
+class RetryScheduled:
+    """Une requête échouée va être renvoyée après `delay` secondes"""
+    attempt: int
+    retries: int
+    reason: str
+    delay: float
+
+
+@dataclass
+class TranslationFinished:
+    """Fin d'un lot de traduction"""
+    total: int
+    seconds: float
+
+
+@dataclass
+class FileSaved:
+    """Le fichier traduit a été écrit"""
+    path: str
+    cues: int
+
+
+EVENT_TYPES = {
+    event_class.__name__: event_class
+    for event_class in (FileStarted, TranslationStarted, CacheHit, CuesCompleted, BatchCompleted,
+                        RetryScheduled, TranslationFinished, FileSaved)
+}
+
+
+def to_dict(event) -> dict:
+    """Événement -> dictionnaire sérialisable en JSON (transport vers un autre processus)"""
+    return dict(asdict(event), event=type(event).__name__)
+
+
+def from_dict(data: dict):
+    """Dictionnaire produit par to_dict -> événement (None si le type est inconnu)"""
+    data = dict(data)
+    event_class = EVENT_TYPES.get(data.pop("event", None))
+    return event_class(**data) if event_class is not None else None
+
+
+def combine(*listeners):
+    """Fonction de rappel qui transmet chaque événement à plusieurs consommateurs"""
+    active = [listener for listener in listeners if listener is not None]
+
+    def on_event(event):
+        for listener in active:
+            listener(event)
+    return on_event
+
+
+class TqdmProgress:
+    """Consommateur d'événements qui affiche une barre tqdm (ligne de commande)"""
+
+    def __init__(self, desc: str = "Traduction"):
+        self.desc = desc
+        self._bar = None
+
+    def __call__(self, event):
+        if isinstance(event, TranslationStarted):
+            self.close()
+            self._bar = tqdm(total=event.total, desc=self.desc, unit="sous-titre")
+        elif isinstance(event, CuesCompleted) and self._bar is not None:
+            self._bar.update(event.count)
+        elif isinstance(event, TranslationFinished):
+            self.close()
+
+    def close(self):
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
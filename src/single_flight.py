@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Regroupement des requêtes identiques en cours ("single flight")
+
+Quand plusieurs appelants (threads, coroutines, clients du démon) demandent en même
+temps la traduction d'un même texte, un seul envoie la requête au modèle ; les autres
+attendent son résultat au lieu d'envoyer une copie de la requête.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Registre des traductions en cours, indexé par clé"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # Clé -> Future du résultat
+        self.coalesced = 0  # Appels servis par une requête déjà en cours
+
+    def begin(self, key):
+        """Réserve une clé
+
+        Returns:
+            tuple: (Future du résultat, True si l'appelant doit effectuer la requête lui-même,
+            False s'il doit attendre la requête déjà en cours)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def publish(self, key, result):
+        """Transmet le résultat aux appelants en attente sans libérer la clé"""
+        future = self._calls.get(key)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def finish(self, key, result=None, error: BaseException = None):
+        """Libère la clé et transmet le résultat (ou l'erreur) aux appelants en attente"""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
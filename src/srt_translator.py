@@ -4,17 +4,63 @@
 import os
 import sys
 import pysrt
-import re
+import time
 from tqdm import tqdm
 from ollama_translator import OllamaTranslator
+from backend_pool import endpoints_from_env
+from translation_journal import TranslationJournal, job_id_for
+from progress_events import FileStarted, FileSaved
+import subtitle_pipeline
+from cue_table import read_srt, format_time
+from transcript_summarizer import TranscriptSummarizer
+from translation_daemon import DaemonClient, daemon_address_from_env
+from profiling import span, enable_tracing, finish_tracing, trace_path_from_env
 
 class SRTTranslator:
     """Traducteur de fichiers SRT de l'anglais vers le français utilisant Ollama"""
     
-    def __init__(self, model_name="mistral"):
-        """Initialisation avec le modèle spécifique"""
-        print(f"Initialisation du traducteur avec le modèle {model_name}...")
-        self.translator = OllamaTranslator(model_name=model_name)
+    def __init__(self, model_name="mistral", packed=False, max_concurrency=8, throttle=True,
+                 host="localhost", port=11434, use_memory=True, stream=False,
+                 keep_alive=OllamaTranslator.DEFAULT_KEEP_ALIVE, endpoints=None, merge_options=None,
+                 daemon=None, hedge_percentile=None, translator=None):
+        """Initialisation avec le modèle spécifique
+        
+        Args:
+            packed (bool): Envoyer plusieurs sous-titres par requête (batch_size sous-titres par requête)
+            max_concurrency (int): Nombre maximal de requêtes simultanées vers Ollama
+            throttle (bool): False pour désactiver toute limitation (machine GPU dédiée)
+            host (str), port (int): Adresse du serveur Ollama
+            use_memory (bool): Utiliser la mémoire de traduction persistante
+            stream (bool): Lire les réponses en streaming et couper la génération dès que la traduction est complète
+            keep_alive (str|int): Durée de maintien du modèle en mémoire entre deux requêtes
+            endpoints (list, optional): Serveurs Ollama entre lesquels répartir les requêtes
+            merge_options (MergeOptions, optional): Seuils d'écart, de longueur et de durée pour la fusion
+            daemon (str, optional): Adresse du démon de traduction partagé (voir translation_daemon) ;
+                les lots de sous-titres lui sont confiés s'il répond
+            hedge_percentile (float, optional): Double les requêtes plus lentes que ce percentile de
+                la latence récente (0.95 pour p95) ; la première réponse est gardée
+            translator (OllamaTranslator, optional): Traducteur déjà configuré, utilisé tel quel
+                (les paramètres de connexion et de traduction ci-dessus sont alors ignorés)
+        """
+        print(f"Initialisation du traducteur avec le modèle {translator.model_name if translator else model_name}...")
+        self.daemon = None
+        if daemon:
+            client = DaemonClient(daemon)
+            if client.ping() is not None:
+                print(f"Traduction confiée au démon {daemon}")
+                self.daemon = client
+            else:
+                print(f"Démon de traduction {daemon} injoignable, traduction locale")
+        if translator is None:
+            # Avec le démon, le modèle est déjà chargé de son côté : pas de préchargement local
+            translator = OllamaTranslator(model_name=model_name, host=host, port=port, use_memory=use_memory,
+                                          packed=packed, max_concurrency=max_concurrency, throttle=throttle,
+                                          stream=stream, keep_alive=keep_alive,
+                                          endpoints=endpoints, warm_up=self.daemon is None,
+                                          hedge_percentile=hedge_percentile)
+        self.translator = translator
+        self.merge_options = merge_options or subtitle_pipeline.MergeOptions()
+        self.summarizer = TranscriptSummarizer(self.translator, max_concurrency=max_concurrency)
     
     def translate_text(self, text):
         """Traduire un texte de l'anglais vers le français"""
@@ -22,45 +68,42 @@ class SRTTranslator:
             return ""
         return self.translator.translate(text)
     
-    def translate_batch(self, texts, batch_size=10):
-        """Traduire une liste de textes par lots"""
+    def translate_batch(self, texts, batch_size=10, on_result=None, on_event=None):
+        """Traduire une liste de textes par lots (enveloppe du moteur asyncio d'OllamaTranslator)"""
         print(f"Traduction de {len(texts)} sous-titres...")
-        return self.translator.translate_batch(texts, batch_size)
+        if self.daemon is not None:
+            # Le démon n'envoie un résultat que pour les traductions réussies
+            translated = {}
+            
+            def record(i, translation):
+                translated[i] = translation
+                if on_result is not None:
+                    on_result(i, translation)
+            
+            try:
+                with span("daemon", cues=len(texts)):
+                    translations = self.daemon.translate_batch(self.translator.model_name, texts, batch_size,
+                                                               record, on_event)
+                # Alimenter le cache local (résumés, traductions unitaires), sans les échecs
+                self.translator.cache.update((texts[i], translation) for i, translation in translated.items())
+                return translations
+            except (OSError, RuntimeError) as e:
+                print(f"Démon de traduction indisponible ({str(e)}), traduction locale")
+                self.daemon = None
+        return self.translator.translate_batch(texts, batch_size, on_result, on_event)
     
     def filter_noise_subtitles(self, input_file, output_file=None):
         """Filtrer les sous-titres de bruit comme [musique], [applaudissements], etc."""
         print(f"Chargement du fichier {input_file}...")
         try:
-            subs = pysrt.open(input_file, encoding='utf-8')
-            
-            filtered_subs = pysrt.SubRipFile()
-            
-            # Modèle pour détecter les sous-titres de bruit
-            noise_pattern = re.compile(r'^\s*\[(music|applause|silence|sound|musique|bruit|applaudissements|silence)\]\s*$', re.IGNORECASE)
-            
-            for sub in subs:
-                text = sub.text.strip()
-                
-                # Ignorer les sous-titres de bruit
-                if noise_pattern.match(text) or not text:
-                    continue
-                
-                # Nettoyer les crochets dans les sous-titres normaux
-                cleaned_text = re.sub(r'\s*\[[^\]]+\]\s*', ' ', text).strip()
-                if cleaned_text:
-                    new_sub = pysrt.SubRipItem()
-                    new_sub.index = len(filtered_subs) + 1
-                    new_sub.start = sub.start
-                    new_sub.end = sub.end
-                    new_sub.text = cleaned_text
-                    filtered_subs.append(new_sub)
+            filtered = subtitle_pipeline.filter_noise(subtitle_pipeline.parse_srt(input_file))
             
             if output_file:
-                os.makedirs(os.path.dirname(output_file), exist_ok=True)
-                filtered_subs.save(output_file, encoding='utf-8')
+                subtitle_pipeline.serialize_srt(filtered, output_file)
                 print(f"Sous-titres filtrés sauvegardés dans: {output_file}")
             
-            return filtered_subs
+            # Compatibilité : les appelants de cette méthode attendent un pysrt.SubRipFile
+            return filtered.to_subrip()
         except Exception as e:
             print(f"Erreur lors du filtrage des sous-titres: {str(e)}")
             if output_file and os.path.exists(input_file):
@@ -75,76 +118,14 @@ class SRTTranslator:
         """Fusionner les sous-titres dupliqués ou fragmentés"""
         print(f"Chargement du fichier {input_file}...")
         try:
-            subs = pysrt.open(input_file, encoding='utf-8')
-            
-            merged_subs = pysrt.SubRipFile()
-            
-            i = 0
-            while i < len(subs):
-                current_sub = subs[i]
-                current_text = current_sub.text.strip()
-                
-                if not current_text:
-                    i += 1
-                    continue
-                
-                # Recherche de fragments consécutifs à regrouper
-                j = i + 1
-                grouped_texts = [current_text]
-                max_chars = 80  # Nombre maximal de caractères par sous-titre pour la lisibilité
-                
-                # Tenter de fusionner avec les sous-titres suivants si approprié
-                while j < len(subs) and len('\n'.join(grouped_texts)) < max_chars:
-                    next_text = subs[j].text.strip()
-                    
-                    # Vérifier si ce sous-titre devrait être fusionné
-                    time_gap = (subs[j].start.ordinal - current_sub.end.ordinal) / 1000 < 1000  # écart < 1s
-                    
-                    # Vérifier si les sous-titres sont liés
-                    is_duplicate = next_text == current_text
-                    
-                    # Vérifier s'il s'agit d'un fragment de phrase
-                    ends_with_punct = current_text and current_text[-1] in '.!?'
-                    starts_with_lowercase = next_text and len(next_text) > 0 and next_text[0].islower()
-                    
-                    # Décider si on fusionne
-                    should_merge = (
-                        is_duplicate or 
-                        time_gap or 
-                        (not ends_with_punct and starts_with_lowercase)
-                    )
-                    
-                    if should_merge:
-                        # Étendre la durée du sous-titre actuel
-                        current_sub.end = subs[j].end
-                        
-                        # Ajouter aux fragments si pas dupliqué et pas vide
-                        if next_text and next_text not in grouped_texts:
-                            grouped_texts.append(next_text)
-                        
-                        j += 1
-                    else:
-                        break
-                
-                # Créer le texte joint
-                joined_text = self._join_subtitles(grouped_texts)
-                
-                # Ajouter le sous-titre fusionné
-                new_sub = pysrt.SubRipItem()
-                new_sub.index = len(merged_subs) + 1
-                new_sub.start = current_sub.start
-                new_sub.end = current_sub.end
-                new_sub.text = joined_text
-                merged_subs.append(new_sub)
-                
-                i = j
+            merged = subtitle_pipeline.merge_cues(subtitle_pipeline.parse_srt(input_file), self.merge_options)
             
             if output_file:
-                os.makedirs(os.path.dirname(output_file), exist_ok=True)
-                merged_subs.save(output_file, encoding='utf-8')
+                subtitle_pipeline.serialize_srt(merged, output_file)
                 print(f"Sous-titres fusionnés sauvegardés dans: {output_file}")
             
-            return merged_subs
+            # Compatibilité : les appelants de cette méthode attendent un pysrt.SubRipFile
+            return merged.to_subrip()
         except Exception as e:
             print(f"Erreur lors de la fusion des sous-titres: {str(e)}")
             if output_file and os.path.exists(input_file):
@@ -157,112 +138,95 @@ class SRTTranslator:
     
     def _join_subtitles(self, subtitle_texts):
         """Joindre les textes des sous-titres en préservant la structure"""
-        if not subtitle_texts:
-            return ""
-        
-        if len(subtitle_texts) == 1:
-            return subtitle_texts[0]
+        return subtitle_pipeline.join_subtitle_texts(subtitle_texts)
+    
+    def _prepare_subtitles(self, input_file, merge_duplicates=False, filter_noise=False):
+        """Charger un fichier SRT et appliquer le prétraitement demandé, entièrement en mémoire"""
+        print(f"Chargement du fichier {input_file}...")
+        with span("parse", file=os.path.basename(input_file)):
+            cues = subtitle_pipeline.parse_srt(input_file)
         
-        # Grouper par phrases ou unités logiques
-        result_lines = []
-        current_line = ""
+        prepared = cues
+        if filter_noise:
+            print("Filtrage des sous-titres de bruit...")
+            with span("filter_noise", cues=len(prepared)):
+                prepared = subtitle_pipeline.filter_noise(prepared)
+        if merge_duplicates:
+            print("Fusion des sous-titres dupliqués...")
+            with span("merge", cues=len(prepared)):
+                prepared = subtitle_pipeline.merge_cues(prepared, self.merge_options)
+            print(f"{len(cues)} sous-titres -> {len(prepared)} après prétraitement")
+        return prepared
+    
+    def _save_translation(self, subs, translated_texts, output_file):
+        """Créer et sauvegarder le fichier SRT traduit"""
+        with span("write", cues=len(subs)):
+            subtitle_pipeline.serialize_srt(subtitle_pipeline.with_texts(subs, translated_texts), output_file)
         
-        for text in subtitle_texts:
-            text = text.strip()
-            if not text:
-                continue
-                
-            # Si le texte se termine par une ponctuation, c'est probablement une pensée complète
-            if text[-1] in '.!?':
-                # Si nous avons une ligne en cours, ajouter ce texte et l'ajouter aux résultats
-                if current_line:
-                    if not current_line.endswith(" "):
-                        current_line += " "
-                    current_line += text
-                    result_lines.append(current_line)
-                    current_line = ""
-                else:
-                    # C'est une phrase autonome complète
-                    result_lines.append(text)
-            else:
-                # C'est un fragment, l'ajouter à la ligne en cours
-                if current_line:
-                    if not current_line.endswith(" "):
-                        current_line += " "
-                    current_line += text
-                else:
-                    current_line = text
+        # Vérifier que le fichier a été créé
+        if not os.path.exists(output_file):
+            print(f"Attention: Le fichier n'a peut-être pas été sauvegardé correctement à {output_file}")
+        else:
+            print(f"Vérifié: Fichier sauvegardé à {output_file} ({os.path.getsize(output_file)} octets)")
+    
+    def translate_srt_file(self, input_file, output_file, batch_size=10, merge_duplicates=False, filter_noise=False,
+                           resume=True, on_event=None):
+        """Traduire un fichier SRT de l'anglais vers le français
         
-        # Ajouter tout texte restant
-        if current_line:
-            result_lines.append(current_line)
-            
-        # Joindre avec des sauts de ligne pour maintenir la structure des sous-titres
-        return '\n'.join(result_lines)
+        Args:
+            resume (bool): Tenir un journal des sous-titres traduits à côté du fichier de sortie
+                et reprendre un travail interrompu là où il s'était arrêté
+            on_event (callable, optional): Reçoit les événements de progression (voir progress_events)
+        """
+        with span("translate_srt_file", file=os.path.basename(input_file)):
+            return self._translate_srt_file(input_file, output_file, batch_size, merge_duplicates, filter_noise,
+                                            resume, on_event)
     
-    def translate_srt_file(self, input_file, output_file, batch_size=10, merge_duplicates=False, filter_noise=False):
-        """Traduire un fichier SRT de l'anglais vers le français"""
+    def _translate_srt_file(self, input_file, output_file, batch_size, merge_duplicates, filter_noise,
+                            resume, on_event):
+        journal = None
         try:
-            # Prétraitement si nécessaire
-            source_file = input_file
-            temp_files = []
-            
-            # Créer le répertoire de sortie s'il n'existe pas
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            
-            # Filtrer les sous-titres de bruit si demandé
-            if filter_noise:
-                print("Filtrage des sous-titres de bruit...")
-                temp_file = os.path.join(os.path.dirname(output_file), "temp_filter_" + os.path.basename(input_file))
-                self.filter_noise_subtitles(input_file, temp_file)
-                source_file = temp_file
-                temp_files.append(temp_file)
-            
-            # Fusionner les sous-titres dupliqués si demandé
-            if merge_duplicates:
-                print("Fusion des sous-titres dupliqués...")
-                temp_file = os.path.join(os.path.dirname(output_file), "temp_merge_" + os.path.basename(input_file))
-                self.merge_duplicate_subtitles(source_file, temp_file)
-                source_file = temp_file
-                temp_files.append(temp_file)
-            
-            # Charger le fichier
-            print(f"Chargement du fichier {source_file}...")
-            subs = pysrt.open(source_file, encoding='utf-8')
+            # Charger et prétraiter en mémoire (aucun fichier intermédiaire)
+            subs = self._prepare_subtitles(input_file, merge_duplicates, filter_noise)
+            if on_event is not None:
+                on_event(FileStarted(input_file, len(subs)))
             
             # Extraire le texte de chaque sous-titre
-            texts = [sub.text for sub in subs]
-            
-            # Traduire tous les textes
-            translated_texts = self.translate_batch(texts, batch_size)
-            
-            # Créer un nouveau fichier SRT avec les traductions
-            translated_subs = pysrt.SubRipFile()
-            for i, (sub, translated_text) in enumerate(zip(subs, translated_texts)):
-                new_sub = pysrt.SubRipItem()
-                new_sub.index = sub.index
-                new_sub.start = sub.start
-                new_sub.end = sub.end
-                new_sub.text = translated_text
-                translated_subs.append(new_sub)
-            
-            # S'assurer que le répertoire existe et sauvegarder le fichier traduit
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            translated_subs.save(output_file, encoding='utf-8')
-            
-            # Vérifier que le fichier a été créé
-            if not os.path.exists(output_file):
-                print(f"Attention: Le fichier n'a peut-être pas été sauvegardé correctement à {output_file}")
-            else:
-                print(f"Vérifié: Fichier sauvegardé à {output_file} ({os.path.getsize(output_file)} octets)")
-            
-            # Nettoyer les fichiers temporaires
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    try:
-                        os.remove(temp_file)
-                    except:
-                        pass  # Ignorer les erreurs de suppression de fichiers temporaires
+            texts = subs.texts
+            translations = {}
+            
+            if resume:
+                with span("journal_load"):
+                    job_id = job_id_for(input_file, self.translator.model_name, self.translator.prompt_version,
+                                        merge_duplicates, filter_noise)
+                    journal = TranslationJournal.for_output(output_file, job_id)
+                    translations.update(journal.completed)
+            
+            # Traduire les textes qui ne figurent pas encore dans le journal
+            pending = [text for text in texts if text not in translations]
+            succeeded = set()
+            
+            def on_result(i, translation):
+                succeeded.add(i)
+                if journal:
+                    journal.record(pending[i], translation)
+            
+            with span("translate_batch", cues=len(pending)):
+                translations.update(zip(pending, self.translate_batch(pending, batch_size, on_result, on_event)))
+            translated_texts = [translations[text] for text in texts]
+            failed = sum(1 for i, text in enumerate(pending) if text.strip() and i not in succeeded)
+            
+            # Créer un nouveau fichier SRT avec les traductions (écriture atomique)
+            self._save_translation(subs, translated_texts, output_file)
+            if journal and failed:
+                # Le fichier garde le texte d'origine des échecs : à la reprise, seuls eux sont retraduits
+                print(f"{failed} sous-titres non traduits, journal conservé pour les retraduire à la reprise")
+            elif journal:
+                with span("journal_complete"):
+                    journal.complete()
+                journal = None
+            if on_event is not None:
+                on_event(FileSaved(output_file, len(subs)))
             
             print(f"Traduction terminée. Fichier sauvegardé: {output_file}")
             return True
@@ -272,6 +236,84 @@ class SRTTranslator:
             import traceback
             traceback.print_exc()
             return False
+        finally:
+            # En cas d'interruption, le journal est conservé pour la reprise
+            if journal:
+                journal.close()
+    
+    def translate_srt_files(self, file_pairs, batch_size=10, merge_duplicates=False, filter_noise=False, on_event=None):
+        """Traduire plusieurs fichiers SRT à travers une seule file de travail
+        
+        Les textes identiques de tous les fichiers ne sont envoyés qu'une fois au modèle,
+        puis les traductions sont redistribuées fichier par fichier.
+        
+        Args:
+            file_pairs (list): Liste de couples (fichier d'entrée, fichier de sortie)
+        
+        Returns:
+            dict: Statistiques agrégées (fichiers, sous-titres, débit en sous-titres/s et tokens/s)
+        """
+        start_time = time.time()
+        tokens_before = self.translator.stats["total_tokens"]
+        normalized_before = self.translator.stats["normalized_hits"]
+        coalesced_before = self.translator.stats["coalesced"]
+        
+        # Prétraiter tous les fichiers et collecter leurs sous-titres
+        jobs = []
+        failed = []
+        for input_file, output_file in file_pairs:
+            try:
+                subs = self._prepare_subtitles(input_file, merge_duplicates, filter_noise)
+                jobs.append((input_file, output_file, subs))
+                if on_event is not None:
+                    on_event(FileStarted(input_file, len(subs)))
+            except Exception as e:
+                print(f"Erreur lors de la préparation de {input_file}: {str(e)}")
+                failed.append(input_file)
+        
+        # Dédupliquer les textes de tous les fichiers (l'ordre d'apparition est conservé)
+        unique_texts = list(dict.fromkeys(text for _, _, subs in jobs for text in subs.texts))
+        total_cues = sum(len(subs) for _, _, subs in jobs)
+        print(f"{len(jobs)} fichiers, {total_cues} sous-titres dont {len(unique_texts)} textes uniques à traduire")
+        
+        with span("translate_batch", cues=len(unique_texts)):
+            translated_unique = self.translate_batch(unique_texts, batch_size, on_event=on_event)
+        translations = dict(zip(unique_texts, translated_unique))
+        
+        # Redistribuer les traductions par fichier
+        succeeded = 0
+        for input_file, output_file, subs in jobs:
+            try:
+                self._save_translation(subs, [translations[text] for text in subs.texts], output_file)
+                succeeded += 1
+                if on_event is not None:
+                    on_event(FileSaved(output_file, len(subs)))
+            except Exception as e:
+                print(f"Erreur lors de l'écriture de {output_file}: {str(e)}")
+                failed.append(input_file)
+        
+        elapsed = time.time() - start_time
+        tokens = self.translator.stats["total_tokens"] - tokens_before
+        saved_calls = self.translator.stats["normalized_hits"] - normalized_before
+        return {
+            "files": succeeded,
+            "failed_files": failed,
+            "cues": total_cues,
+            "unique_cues": len(unique_texts),
+            "seconds": round(elapsed, 2),
+            "cues_per_second": round(total_cues / elapsed, 2) if elapsed > 0 else 0.0,
+            "tokens": tokens,
+            "tokens_per_second": round(tokens / elapsed, 2) if elapsed > 0 else 0.0,
+            "normalized_hits": saved_calls,
+            # Sous-titres identiques regroupés entre fichiers, et requêtes déjà en cours partagées
+            "deduplicated": total_cues - len(unique_texts),
+            "coalesced": self.translator.stats["coalesced"] - coalesced_before,
+            "backends": self.translator.pool.report(),
+            # Requêtes de secours envoyées et gagnées (None si désactivées)
+            "hedging": self.translator.hedging.report() if self.translator.hedging is not None else None,
+            # Percentiles de latence, débit en tokens et taux de cache du processus (voir metrics)
+            "metrics": self.translator.metrics.to_dict()
+        }
     
     def summarize_srt_file(self, input_file, max_length=None):
         """Génère un résumé du contenu d'un fichier SRT
@@ -285,15 +327,15 @@ class SRTTranslator:
         """
         try:
             print(f"Chargement du fichier {input_file} pour résumé...")
-            subs = pysrt.open(input_file, encoding='utf-8')
+            subs = read_srt(input_file)
             
             # Extraction des informations de base
             total_subs = len(subs)
-            duration_ms = subs[-1].end.ordinal if total_subs > 0 else 0
+            duration_ms = subs.end_ms[-1] if total_subs > 0 else 0
             duration_minutes = duration_ms / 60000
             
             # Extraire tout le texte (ou limité si max_length spécifié)
-            all_text = " ".join([sub.text for sub in subs])
+            all_text = " ".join(subs.texts)
             if max_length and len(all_text) > max_length:
                 all_text = all_text[:max_length] + "..."
             
@@ -308,17 +350,24 @@ class SRTTranslator:
                 
                 for idx in indices:
                     sample_subs.append({
-                        "index": subs[idx].index,
-                        "start": str(subs[idx].start),
-                        "end": str(subs[idx].end),
-                        "text": subs[idx].text
+                        "index": idx + 1,
+                        "start": format_time(subs.start_ms[idx]),
+                        "end": format_time(subs.end_ms[idx]),
+                        "text": subs.texts[idx]
                     })
             
-            # Générer un résumé avec Ollama
+            # Générer un résumé avec Ollama à partir de toute la transcription (ou des max_length premiers caractères)
             summary = ""
+            summary_stats = {}
             if all_text:
                 print("Génération du résumé du fichier...")
-                summary = self._generate_summary_with_extended_timeout(all_text[:5000])
+                if max_length:
+                    count, length = 0, 0
+                    while count < total_subs and length + len(subs.texts[count]) <= max_length:
+                        length += len(subs.texts[count]) + 1
+                        count += 1
+                    subs = subs[:max(count, 1)]
+                summary = self._generate_summary(subs, summary_stats)
             
             # Préparer les résultats
             result = {
@@ -327,6 +376,7 @@ class SRTTranslator:
                 "duration_minutes": round(duration_minutes, 2),
                 "summary": summary,
                 "sample_subtitles": sample_subs,
+                "summary_stats": summary_stats,
                 "language_detected": self._detect_language(all_text[:500]) if all_text else "inconnu"
             }
             
@@ -343,77 +393,21 @@ class SRTTranslator:
                 "summary": "Impossible de générer un résumé"
             }
     
-    def _generate_summary_with_extended_timeout(self, text):
-        """Génère un résumé avec un timeout étendu et plusieurs tentatives
+    def _generate_summary(self, cues, stats=None):
+        """Génère un résumé de toute la transcription (map-reduce par tranches)
         
-        Cette méthode utilise un temps d'attente beaucoup plus long et une stratégie de repli
-        en cas d'échec pour garantir qu'un résumé sera généré même pour des textes longs.
+        Les tranches sont résumées en parallèle puis combinées (voir transcript_summarizer).
+        En cas d'échec, un résumé minimal est construit à partir du début du texte.
+        Les statistiques du résumé (tranches, cache, requêtes) sont écrites dans `stats`.
         """
+        text = " ".join(cues.texts).strip()
         if not text:
             return "Impossible de générer un résumé (texte vide)"
-            
-        # Limiter la longueur pour éviter les problèmes
-        if len(text) > 5000:
-            text = text[:5000] + "..."
-            
-        # Essayer avec un texte complet d'abord
-        long_prompt = f"""
-        Résume en français le contenu de cette vidéo en 3-5 phrases. Voici la transcription des sous-titres:
-        
-        {text}
-        
-        Résumé concis EN FRANÇAIS (maximum 3-5 phrases):
-        """
         
-        # Essayer avec un timeout très long (3 minutes)
         try:
-            print("Tentative de résumé avec le texte complet et un délai étendu...")
-            # Utiliser directement l'API Ollama avec un timeout personnalisé pour les résumés
-            import requests
-            import time
-            
-            timeout = 240  # 4 minutes de timeout pour les résumés
-            
-            start_time = time.time()
-            payload = {
-                "model": self.translator.model_name,
-                "prompt": long_prompt,
-                "stream": False,
-                "temperature": 0.1,
-                "num_predict": 300
-            }
-            
-            print(f"Envoi de la requête de résumé avec timeout={timeout}s")
-            response = requests.post(
-                self.translator.api_url, 
-                json=payload, 
-                timeout=timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                summary = result.get("response", "").strip()
-                return self._clean_summary(summary)
+            return self._clean_summary(self.summarizer.summarize(cues, stats))
         except Exception as e:
-            print(f"Erreur lors de la génération du résumé complet: {str(e)}")
-        
-        # En cas d'échec, essayer avec un extrait plus court
-        try:
-            print("Tentative de résumé avec un extrait plus court...")
-            shorter_text = text[:1500]  # Prendre seulement le début
-            shorter_prompt = f"""
-            Résume en français cette transcription de vidéo en 2-3 phrases. Voici l'extrait de la transcription:
-            
-            {shorter_text}
-            
-            Résumé très concis EN FRANÇAIS (2-3 phrases seulement):
-            """
-            
-            # Utiliser la méthode standard de traduction avec un timeout standard
-            summary = self.translator.translate(shorter_prompt)
-            return self._clean_summary(summary)
-        except Exception as e:
-            print(f"Erreur lors de la génération du résumé court: {str(e)}")
+            print(f"Erreur lors de la génération du résumé: {str(e)}")
         
         # Solution de dernier recours - traduire explicitement en français
         try:
@@ -510,11 +504,22 @@ class SRTTranslator:
                 return "anglais (probable)"
 
 def main():
+    # --trace [fichier.json] : tableau du temps passé par étape, et trace Chrome si un fichier est donné
+    trace_path = trace_path_from_env()
+    if "--trace" in sys.argv:
+        position = sys.argv.index("--trace")
+        value = sys.argv[position + 1] if position + 1 < len(sys.argv) and sys.argv[position + 1].endswith(".json") else ""
+        trace_path = value
+        del sys.argv[position:position + (2 if value else 1)]
+    
     if len(sys.argv) < 3:
-        print("Usage: python srt_translator.py <input_file.srt> <output_file.srt> [batch_size] [merge_duplicates] [filter_noise]")
+        print("Usage: python srt_translator.py <input_file.srt> <output_file.srt> [batch_size] [merge_duplicates] [filter_noise] [packed] [stream] [--trace [trace.json]]")
         print("  batch_size: nombre de sous-titres par lot (par défaut: 10)")
         print("  merge_duplicates: 1 pour fusionner les doublons, 0 sinon (par défaut: 0)")
         print("  filter_noise: 1 pour filtrer les sous-titres de bruit, 0 sinon (par défaut: 0)")
+        print("  packed: 1 pour envoyer batch_size sous-titres par requête, 0 sinon (par défaut: 0)")
+        print("  stream: 1 pour lire les réponses en streaming avec arrêt anticipé, 0 sinon (par défaut: 0)")
+        print("  --trace: affiche le temps passé dans chaque étape et écrit une trace Chrome si un fichier .json est donné")
         sys.exit(1)
     
     input_file = sys.argv[1]
@@ -522,9 +527,17 @@ def main():
     batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 10
     merge_duplicates = bool(int(sys.argv[4])) if len(sys.argv) > 4 else False
     filter_noise = bool(int(sys.argv[5])) if len(sys.argv) > 5 else False
+    packed = bool(int(sys.argv[6])) if len(sys.argv) > 6 else False
+    stream = bool(int(sys.argv[7])) if len(sys.argv) > 7 else False
     
-    translator = SRTTranslator()
+    # Plusieurs serveurs Ollama : OLLAMA_HOSTS="hote1:11434,hote2:11434"
+    translator = SRTTranslator(packed=packed, stream=stream, endpoints=endpoints_from_env(),
+                               daemon=daemon_address_from_env())
+    if trace_path is not None:
+        enable_tracing()
     success = translator.translate_srt_file(input_file, output_file, batch_size, merge_duplicates, filter_noise)
+    if trace_path is not None:
+        finish_tracing(trace_path or None)
     
     if not success:
         sys.exit(1)
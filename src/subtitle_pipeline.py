@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Pipeline de traitement des sous-titres en mémoire
+
+Chaque étape prend des sous-titres sous forme de CueTable (tableaux parallèles de temps
+en millisecondes et de textes, voir cue_table) et en retourne une nouvelle, sans
+modifier l'entrée : parse -> filter -> merge -> translate -> serialize. Seules la
+première et la dernière étape accèdent au disque. Les étapes acceptent aussi des
+pysrt.SubRipItem, convertis à l'entrée.
+"""
+
+import re
+from dataclasses import dataclass
+from cue_table import CueTable, read_srt, write_srt
+
+# Modèle pour détecter les sous-titres de bruit
+NOISE_PATTERN = re.compile(r'^\s*\[(music|applause|silence|sound|musique|bruit|applaudissements|silence)\]\s*$', re.IGNORECASE)
+# Indications entre crochets dans les sous-titres normaux
+BRACKETS_PATTERN = re.compile(r'\s*\[[^\]]+\]\s*')
+
+
+def parse_srt(input_file):
+    """Charger un fichier SRT (première étape, lecture disque)"""
+    return read_srt(input_file)
+
+
+def filter_noise(cues):
+    """Supprimer les sous-titres de bruit et nettoyer les indications entre crochets"""
+    cues = CueTable.from_subrip(cues)
+    start_ms, end_ms, texts = cues.start_ms, cues.end_ms, cues.texts
+    filtered = CueTable()
+    for i in range(len(texts)):
+        text = texts[i].strip()
+
+        # Ignorer les sous-titres de bruit
+        if NOISE_PATTERN.match(text) or not text:
+            continue
+
+        # Nettoyer les crochets dans les sous-titres normaux
+        cleaned_text = BRACKETS_PATTERN.sub(' ', text).strip()
+        if cleaned_text:
+            filtered.append(start_ms[i], end_ms[i], cleaned_text)
+    return filtered
+
+
+@dataclass(frozen=True)
+class MergeOptions:
+    """Seuils de fusion des sous-titres consécutifs
+
+    Des sous-titres moins nombreux et plus remplis donnent moins de requêtes au modèle
+    et un meilleur contexte de traduction ; les seuils gardent des sous-titres lisibles.
+    """
+    max_gap_ms: int = 1000         # Écart maximal entre la fin du groupe et le sous-titre suivant
+    max_chars: int = 80            # Longueur maximale du texte fusionné
+    max_duration_ms: int = 10000   # Durée maximale d'un sous-titre fusionné
+
+
+def merge_cues(cues, options: MergeOptions = None):
+    """Fusionner les sous-titres dupliqués ou fragmentés
+
+    Un seul passage sur les sous-titres : la longueur du texte fusionné est tenue à jour
+    au fil des ajouts et les doublons sont détectés avec un ensemble, sans reconstruire
+    le texte du groupe. Un sous-titre rejoint le groupe en cours s'il le suit de moins de
+    max_gap_ms (ou s'il répète un texte du groupe, ou continue une phrase inachevée) et
+    si le groupe reste sous max_chars et max_duration_ms.
+    """
+    options = options or MergeOptions()
+    cues = CueTable.from_subrip(cues)
+    start_ms, end_ms, texts = cues.start_ms, cues.end_ms, cues.texts
+    merged = CueTable()
+
+    group = []          # Textes du groupe en cours
+    seen = set()        # Les mêmes, pour détecter les doublons
+    length = 0          # Longueur du texte joint (un séparateur entre deux textes)
+    group_start = group_end = 0
+
+    for i in range(len(texts)):
+        text = texts[i].strip()
+
+        if group:
+            start = start_ms[i]
+            is_duplicate = text in seen
+            # Un sous-titre vide prolonge le groupe sans ajouter de texte
+            added = 0 if is_duplicate or not text else len(text) + 1
+            last = group[-1]
+            is_fragment = bool(text) and last[-1] not in '.!?' and text[0].islower()
+
+            if ((start - group_end <= options.max_gap_ms or is_duplicate or is_fragment)
+                    and length + added <= options.max_chars
+                    and end_ms[i] - group_start <= options.max_duration_ms):
+                group_end = max(group_end, end_ms[i])
+                if added:
+                    group.append(text)
+                    seen.add(text)
+                    length += added
+                continue
+
+            merged.append(group_start, group_end, join_subtitle_texts(group))
+            group = []
+
+        # Un sous-titre vide ne commence pas de groupe
+        if text:
+            group = [text]
+            seen = {text}
+            length = len(text)
+            group_start, group_end = start_ms[i], end_ms[i]
+
+    if group:
+        merged.append(group_start, group_end, join_subtitle_texts(group))
+
+    return merged
+
+
+def join_subtitle_texts(subtitle_texts):
+    """Joindre les textes des sous-titres en préservant la structure"""
+    if not subtitle_texts:
+        return ""
+
+    if len(subtitle_texts) == 1:
+        return subtitle_texts[0]
+
+    # Grouper par phrases ou unités logiques
+    result_lines = []
+    current_line = ""
+
+    for text in subtitle_texts:
+        text = text.strip()
+        if not text:
+            continue
+
+        # Si le texte se termine par une ponctuation, c'est probablement une pensée complète
+        if text[-1] in '.!?':
+            # Si nous avons une ligne en cours, ajouter ce texte et l'ajouter aux résultats
+            if current_line:
+                if not current_line.endswith(" "):
+                    current_line += " "
+                current_line += text
+                result_lines.append(current_line)
+                current_line = ""
+            else:
+                # C'est une phrase autonome complète
+                result_lines.append(text)
+        else:
+            # C'est un fragment, l'ajouter à la ligne en cours
+            if current_line:
+                if not current_line.endswith(" "):
+                    current_line += " "
+                current_line += text
+            else:
+                current_line = text
+
+    # Ajouter tout texte restant
+    if current_line:
+        result_lines.append(current_line)
+
+    # Joindre avec des sauts de ligne pour maintenir la structure des sous-titres
+    return '\n'.join(result_lines)
+
+
+def with_texts(cues, texts):
+    """Mêmes sous-titres avec de nouveaux textes (étape de traduction, horaires non copiés)"""
+    return CueTable.from_subrip(cues).with_texts(texts)
+
+
+def serialize_srt(cues, output_file):
+    """Écrire les sous-titres dans un fichier SRT (dernière étape, écriture disque)
+
+    L'écriture est atomique : le fichier est d'abord écrit à côté de la destination
+    puis renommé, un lecteur ne voit donc jamais de fichier partiel.
+    """
+    write_srt(CueTable.from_subrip(cues), output_file)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Profil de débit appris par modèle : délais et limites de génération de chaque requête
+
+Plutôt que des formules fixes (`30 + len(text) // 20` secondes, `len(text) * 2` tokens),
+le traducteur apprend pour chaque modèle, à partir des réponses d'Ollama :
+- le nombre de tokens générés par caractère de texte source (eval_count / caractères) ;
+- la vitesse de génération (eval_count / eval_duration) ;
+- le temps fixe d'une requête (évaluation du prompt, attente côté serveur, réseau).
+
+Chaque grandeur est suivie par une moyenne glissante et son écart moyen (comme le délai
+de retransmission de TCP). `num_predict` couvre le texte attendu avec une marge de
+quelques écarts, et le délai couvre la génération de `num_predict` tokens à la vitesse
+observée : un sous-titre court ne bloque plus 30 s sur un serveur figé, un long n'est
+plus coupé par une limite trop basse. Les profils sont enregistrés dans un fichier JSON
+et réutilisés d'une exécution à l'autre ; le fichier est partagé par tous les processus
+(CLI, démon, interface Streamlit) et verrouillé pendant chaque mise à jour.
+"""
+
+import contextlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Emplacement par défaut des profils (surchargeable par variable d'environnement)
+DEFAULT_PROFILE_PATH = os.environ.get(
+    "SRT_THROUGHPUT_PROFILE",
+    os.path.join(os.path.expanduser("~"), ".cache", "srt_translator", "throughput_profiles.json")
+)
+
+# Nombre de réponses observées avant de remplacer les formules fixes
+MIN_SAMPLES = 5
+# Poids d'une nouvelle observation dans les moyennes glissantes
+SMOOTHING = 0.125
+# Nombre d'écarts moyens ajoutés aux moyennes (marge contre les réponses atypiques)
+DEVIATIONS = 4
+# Bornes des limites calculées
+MIN_TIMEOUT, MAX_TIMEOUT = 10.0, 300.0
+MIN_PREDICT, MAX_PREDICT = 32, 4096
+# Tokens du numéro "[n]" de chaque ligne d'une requête groupée
+TOKENS_PER_PACKED_LINE = 8
+# Enregistrement sur disque toutes les N observations
+SAVE_EVERY = 25
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """Verrou exclusif inter-processus sur `path` (fichier `.lock` voisin)
+
+    Le fichier de profils est remplacé à chaque enregistrement : le verrou porte sur un
+    fichier à part, qui lui n'est jamais remplacé.
+    """
+    with open(path + ".lock", "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class _Estimate:
+    """Moyenne glissante et écart moyen d'une grandeur"""
+
+    def __init__(self, mean=None, deviation=0.0):
+        self.mean = mean
+        self.deviation = deviation
+
+    def update(self, value: float):
+        if self.mean is None:
+            self.mean, self.deviation = value, value / 2
+            return
+        self.deviation += SMOOTHING * (abs(value - self.mean) - self.deviation)
+        self.mean += SMOOTHING * (value - self.mean)
+
+    def upper(self) -> float:
+        """Valeur haute probable (moyenne + quelques écarts)"""
+        return self.mean + DEVIATIONS * self.deviation
+
+
+class ThroughputProfile:
+    """Profil de débit d'un modèle, enregistré entre les exécutions"""
+
+    def __init__(self, model_name: str, path: str = DEFAULT_PROFILE_PATH):
+        self.model_name = model_name
+        self.path = path
+        self.tokens_per_char = _Estimate()   # Tokens générés par caractère source
+        self.tokens_per_second = _Estimate()  # Vitesse de génération
+        self.overhead = _Estimate()           # Secondes hors génération (prompt, file, réseau)
+        self.samples = 0
+        self.truncated = 0                    # Réponses coupées par num_predict
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._load()
+
+    @property
+    def ready(self) -> bool:
+        return self.samples >= MIN_SAMPLES
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entry = json.load(f).get(self.model_name)
+        except (OSError, ValueError) as e:
+            print(f"Profil de débit illisible ({str(e)}), apprentissage depuis zéro")
+            return
+        if not entry:
+            return
+        self.tokens_per_char = _Estimate(*entry["tokens_per_char"])
+        self.tokens_per_second = _Estimate(*entry["tokens_per_second"])
+        self.overhead = _Estimate(*entry["overhead"])
+        self.samples = entry.get("samples", 0)
+        self.truncated = entry.get("truncated", 0)
+
+    def save(self):
+        """Enregistre le profil (les profils des autres modèles du fichier sont conservés)"""
+        if not self.path:
+            return
+        with self._lock:
+            if self.samples == 0:
+                return
+            entry = {
+                "tokens_per_char": [self.tokens_per_char.mean, self.tokens_per_char.deviation],
+                "tokens_per_second": [self.tokens_per_second.mean, self.tokens_per_second.deviation],
+                "overhead": [self.overhead.mean, self.overhead.deviation],
+                "samples": self.samples,
+                "truncated": self.truncated,
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%S")
+            }
+            self._unsaved = 0
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Lecture, fusion et écriture sous verrou : un autre processus qui enregistre
+            # le profil d'un autre modèle au même moment ne perd pas sa mise à jour
+            with _file_lock(self.path):
+                profiles = {}
+                if os.path.exists(self.path):
+                    try:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            profiles = json.load(f)
+                    except ValueError:
+                        profiles = {}
+                profiles[self.model_name] = entry
+                fd, temp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory or None)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(profiles, f, indent=2)
+                os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Enregistrement du profil de débit impossible: {str(e)}")
+
+    def observe(self, chars: int, latency: float, result: dict, num_predict: int):
+        """Apprend d'une réponse complète d'Ollama
+
+        Args:
+            chars (int): Caractères du texte source envoyé
+            latency (float): Durée de la requête vue par le client (secondes)
+            result (dict): Réponse finale d'Ollama (eval_count, eval_duration, prompt_eval_duration...)
+            num_predict (int): Limite de génération de la requête
+        """
+        eval_count = result.get("eval_count", 0)
+        eval_seconds = result.get("eval_duration", 0) / 1e9
+        if chars <= 0 or eval_count <= 0 or eval_seconds <= 0:
+            return  # Réponse interrompue (streaming) ou sans métadonnées : rien à apprendre
+        # Le chargement du modèle est exceptionnel (keep_alive) : il n'entre pas dans le temps fixe
+        load_seconds = result.get("load_duration", 0) / 1e9
+        truncated = result.get("done_reason") == "length" or eval_count >= num_predict
+        with self._lock:
+            self.samples += 1
+            self.tokens_per_second.update(eval_count / eval_seconds)
+            self.overhead.update(max(0.0, latency - eval_seconds - load_seconds))
+            if truncated:
+                # Texte attendu plus long que la limite : le rapport observé est sous-estimé
+                self.truncated += 1
+                ratio = self.tokens_per_char.mean or eval_count / chars
+                self.tokens_per_char.update(max(ratio * 1.5, eval_count / chars))
+            else:
+                self.tokens_per_char.update(eval_count / chars)
+            self._unsaved += 1
+            save = self._unsaved >= SAVE_EVERY
+        if save:
+            self.save()
+
+    def budget(self, chars: int, lines: int = 0):
+        """Délai (secondes) et limite de génération (tokens) d'une requête
+
+        Args:
+            chars (int): Caractères du texte source
+            lines (int): Nombre de sous-titres numérotés d'une requête groupée (0 sinon)
+
+        Returns:
+            tuple: (timeout, num_predict), ou (None, None) tant que le profil n'a pas assez
+            d'observations (les formules fixes s'appliquent alors)
+        """
+        with self._lock:
+            if not self.ready:
+                return None, None
+            ratio = self.tokens_per_char.upper()
+            # Vitesse basse probable : un serveur chargé génère plus lentement
+            speed = max(1.0, self.tokens_per_second.mean - DEVIATIONS * self.tokens_per_second.deviation,
+                        self.tokens_per_second.mean / 4)
+            overhead = self.overhead.upper()
+        num_predict = math.ceil(chars * ratio) + TOKENS_PER_PACKED_LINE * lines + 16
+        num_predict = max(MIN_PREDICT, min(MAX_PREDICT, num_predict))
+        timeout = overhead + num_predict / speed
+        return round(max(MIN_TIMEOUT, min(MAX_TIMEOUT, timeout)), 1), num_predict
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "samples": self.samples,
+                "tokens_per_char": round(self.tokens_per_char.mean or 0.0, 3),
+                "tokens_per_second": round(self.tokens_per_second.mean or 0.0, 1),
+                "overhead_seconds": round(self.overhead.mean or 0.0, 2),
+                "truncated": self.truncated
+            }
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Résumé map-reduce de la transcription complète d'un fichier SRT
+
+La transcription est découpée en tranches (par durée et par taille), chaque tranche est
+résumée séparément et en parallèle (réparties sur les serveurs du pool), puis les
+résumés partiels sont combinés en un résumé final. Le temps total dépend du nombre de
+requêtes simultanées plutôt que de la longueur de la transcription. Les requêtes passent
+par le moteur asyncio du traducteur : elles respectent sa limite de concurrence adaptative
+et partagent ses places avec les traductions en cours.
+
+Les résumés de tranches sont mis en cache par empreinte de leur contenu (dans la mémoire
+de traduction si elle est active) : résumer à nouveau le même fichier, ou un fichier qui
+en partage des passages, ne renvoie au modèle que les tranches nouvelles.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import List
+
+import requests
+
+from async_translator import OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_ERROR, outcome_for_status
+from cue_table import CueTable
+
+# Version des prompts de résumé (clé du cache : la changer invalide les résumés mémorisés)
+SUMMARY_PROMPT_VERSION = "summary-chunk-1"
+
+# Transcription courte (une seule tranche) : résumée directement
+WHOLE_PROMPT = """Résume en français le contenu de cette vidéo en 3-5 phrases. Voici la transcription des sous-titres:
+
+{text}
+
+Résumé concis EN FRANÇAIS (maximum 3-5 phrases):"""
+
+CHUNK_PROMPT = """Résume en français, en 2-3 phrases, ce passage d'une vidéo.
+Transcription des sous-titres:
+
+{text}
+
+Résumé du passage EN FRANÇAIS (2-3 phrases):"""
+
+REDUCE_PROMPT = """Voici les résumés successifs des passages d'une vidéo, dans l'ordre:
+
+{text}
+
+Résume en français le contenu de toute la vidéo en 3-5 phrases.
+Résumé concis EN FRANÇAIS (maximum 3-5 phrases):"""
+
+
+def chunk_transcript(cues, max_seconds: float = 300, max_chars: int = 4000) -> List[tuple]:
+    """Découpe les sous-titres en tranches d'au plus `max_seconds` et `max_chars`
+
+    Returns:
+        list: Tranches (début en ms, fin en ms, texte)
+    """
+    cues = CueTable.from_subrip(cues)
+    start_ms, end_ms, texts = cues.start_ms, cues.end_ms, cues.texts
+    chunks = []
+    parts = []
+    length = 0
+    chunk_start = 0
+    for i in range(len(texts)):
+        text = " ".join(texts[i].split())
+        if not text:
+            continue
+        if parts and (length + len(text) + 1 > max_chars or end_ms[i] - chunk_start > max_seconds * 1000):
+            chunks.append((chunk_start, end_ms[i - 1], " ".join(parts)))
+            parts = []
+            length = 0
+        if not parts:
+            chunk_start = start_ms[i]
+        parts.append(text)
+        length += len(text) + 1
+    if parts:
+        chunks.append((chunk_start, end_ms[len(texts) - 1], " ".join(parts)))
+    return chunks
+
+
+class TranscriptSummarizer:
+    """Résume une transcription par tranches résumées en parallèle puis combinées"""
+
+    def __init__(self, translator, max_concurrency: int = 4, chunk_seconds: float = 300,
+                 chunk_chars: int = 4000, timeout: float = 120):
+        """Prépare le résumeur
+
+        Args:
+            translator (OllamaTranslator): Fournit les serveurs, la session HTTP et la mémoire
+            max_concurrency (int): Nombre maximal de tranches résumées simultanément
+            chunk_seconds (float), chunk_chars (int): Taille maximale d'une tranche
+            timeout (float): Délai maximal d'une requête de résumé (une tranche, pas tout le fichier)
+        """
+        self.translator = translator
+        self.max_concurrency = max_concurrency
+        self.chunk_seconds = chunk_seconds
+        self.chunk_chars = chunk_chars
+        self.timeout = timeout
+        self.cache = {}  # Empreinte du contenu -> résumé (si la mémoire persistante est inactive)
+        self._lock = threading.Lock()
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats() -> dict:
+        return {
+            "chunks": 0,
+            "cached": 0,
+            "requests": 0,
+            "failed": 0,
+            "reduce_rounds": 0,
+            "seconds": 0.0
+        }
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Empreinte du contenu d'une tranche (clé du cache des résumés)"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _cached(self, prompt: str):
+        memory = self.translator.memory
+        if memory is not None:
+            return memory.get(self.translator.model_name, SUMMARY_PROMPT_VERSION, self.content_hash(prompt))
+        with self._lock:
+            return self.cache.get(self.content_hash(prompt))
+
+    def _store(self, prompt: str, summary: str):
+        memory = self.translator.memory
+        if memory is not None:
+            memory.put(self.translator.model_name, SUMMARY_PROMPT_VERSION, self.content_hash(prompt), summary)
+        else:
+            with self._lock:
+                self.cache[self.content_hash(prompt)] = summary
+
+    def _request(self, prompt: str, timeout: float):
+        """Requête de résumé bloquante (exécutée dans le pool de threads du moteur)
+
+        Returns:
+            tuple: (résumé ou None, outcome)
+        """
+        payload = {
+            "model": self.translator.model_name,
+            "prompt": prompt,
+            "stream": False,
+            # Paramètres de génération : Ollama ne les lit que dans "options"
+            "options": {"temperature": 0.1, "num_predict": 300}
+        }
+        try:
+            status_code, response_text, _ = self.translator._generate(payload, timeout)
+        except requests.exceptions.Timeout:
+            return None, OUTCOME_TIMEOUT
+        except Exception as e:
+            print(f"Erreur lors de la requête de résumé: {str(e)}")
+            return None, OUTCOME_ERROR
+        if status_code != 200:
+            return None, outcome_for_status(status_code)
+        summary = response_text.strip()
+        return (summary, OUTCOME_OK) if summary else (None, OUTCOME_ERROR)
+
+    async def _summarize_prompt(self, prompt: str, timeout: float, stats: dict, slots) -> str:
+        """Résume un prompt (tranche ou combinaison), en passant par le cache"""
+        summary = self._cached(prompt)
+        if summary:
+            stats["cached"] += 1
+            return summary
+
+        stats["requests"] += 1
+        async with slots:
+            summary, outcome = await self.translator.engine._call(len(prompt), self._request, prompt, timeout)
+        if summary is None:
+            raise RuntimeError(f"Résumé impossible ({outcome})")
+        self._store(prompt, summary)
+        return summary
+
+    async def _map(self, prompts: List[str], timeout: float, stats: dict, slots) -> List[str]:
+        """Résume les prompts en parallèle ; une tranche en échec est ignorée"""
+        async def run(prompt):
+            try:
+                return await self._summarize_prompt(prompt, timeout, stats, slots)
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"Erreur lors du résumé d'une tranche: {str(e)}")
+                return None
+
+        return [summary for summary in await asyncio.gather(*(run(prompt) for prompt in prompts)) if summary]
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        """Regroupe des résumés partiels en lots tenant dans une requête"""
+        groups = [[]]
+        length = 0
+        for summary in summaries:
+            if groups[-1] and length + len(summary) > self.chunk_chars:
+                groups.append([])
+                length = 0
+            groups[-1].append(summary)
+            length += len(summary) + 2
+        return groups
+
+    def summarize(self, cues, stats: dict = None) -> str:
+        """Résumé de toute la transcription
+
+        Args:
+            stats (dict, optional): Reçoit les statistiques de cet appel (tranches, cache,
+                requêtes...) ; `self.stats` garde celles du dernier résumé terminé
+
+        Raises:
+            RuntimeError: Si aucune tranche n'a pu être résumée
+        """
+        stats = self._new_stats() if stats is None else stats
+        stats.update(self._new_stats())
+        try:
+            return self.translator.engine.run(self._summarize(cues, stats))
+        finally:
+            self.stats = stats
+
+    async def _summarize(self, cues, stats: dict) -> str:
+        # Les statistiques de l'appel ne sont modifiées que dans la boucle du moteur
+        start_time = time.time()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        chunks = chunk_transcript(cues, self.chunk_seconds, self.chunk_chars)
+        stats["chunks"] = len(chunks)
+        if not chunks:
+            raise RuntimeError("Transcription vide")
+        print(f"Résumé de {len(chunks)} tranches ({self.max_concurrency} en parallèle)...")
+
+        if len(chunks) == 1:
+            summary = await self._summarize_prompt(WHOLE_PROMPT.format(text=chunks[0][2]), self.timeout * 2,
+                                                   stats, slots)
+            stats["seconds"] = time.time() - start_time
+            return summary
+
+        # Map : chaque tranche est résumée indépendamment
+        prompts = [CHUNK_PROMPT.format(text=text) for _, _, text in chunks]
+        summaries = await self._map(prompts, self.timeout, stats, slots)
+        if not summaries:
+            raise RuntimeError("Aucune tranche n'a pu être résumée")
+
+        # Reduce : les résumés partiels sont combinés par lots jusqu'à n'en rester qu'un
+        while True:
+            stats["reduce_rounds"] += 1
+            groups = self._group(summaries)
+            if len(groups) >= len(summaries):
+                groups = [summaries]  # Résumés trop longs pour être regroupés : une seule combinaison
+            prompts = [REDUCE_PROMPT.format(text="\n\n".join(group)) for group in groups]
+            if len(prompts) == 1:
+                summary = await self._summarize_prompt(prompts[0], self.timeout * 2, stats, slots)
+                break
+            summaries = await self._map(prompts, self.timeout, stats, slots)
+            if not summaries:
+                raise RuntimeError("Combinaison des résumés impossible")
+
+        stats["seconds"] = time.time() - start_time
+        print(f"Résumé généré en {stats['seconds']:.1f}s: {stats['chunks']} tranches, "
+              f"{stats['cached']} en cache, {stats['requests']} requêtes")
+        return summary
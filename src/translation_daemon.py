@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Service de traduction local partagé entre processus et sessions
+
+Le démon garde en vie un OllamaTranslator par modèle : connexions aux serveurs Ollama,
+cache, mémoire de traduction et limites de concurrence sont communs à tous les clients
+(SRTTranslator, main.py, sessions Streamlit). Les clients envoient leurs sous-titres
+sur un socket local ; un texte déjà en cours de traduction pour un autre client n'est
+pas renvoyé au modèle, le client attend le résultat de la requête en cours. Les lots de
+tous les clients passent par la boucle unique du moteur de chaque traducteur.
+
+Protocole : le client envoie une requête JSON sur une ligne, le démon répond par des
+lignes JSON (résultats et événements de progression au fil de l'eau, puis "done"). Seules
+les traductions réussies font l'objet d'un message "result" ; "done" liste les positions
+en échec ("failed"), dont la traduction est le texte de repli.
+
+Usage: python translation_daemon.py [--address /tmp/srt_translator.sock] [--packed] ...
+    Les clients utilisent le démon si SRT_TRANSLATOR_DAEMON contient son adresse.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from typing import List
+
+from backend_pool import endpoints_from_env
+from progress_events import to_dict, from_dict
+from single_flight import SingleFlight
+
+# Variable d'environnement contenant l'adresse du démon (chemin de socket ou "hôte:port")
+DAEMON_ENV = "SRT_TRANSLATOR_DAEMON"
+DEFAULT_ADDRESS = (os.path.join(tempfile.gettempdir(), "srt_translator.sock")
+                   if hasattr(socket, "AF_UNIX") else "127.0.0.1:11500")
+
+
+def daemon_address_from_env():
+    """Adresse du démon déclarée dans SRT_TRANSLATOR_DAEMON ("1" pour l'adresse par défaut)"""
+    address = os.environ.get(DAEMON_ENV, "").strip()
+    if address in ("", "0"):
+        return None
+    return DEFAULT_ADDRESS if address == "1" else address
+
+
+def _parse_address(address: str):
+    """Chemin de socket Unix ou "hôte:port" -> (famille, adresse)"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class TranslationDaemon:
+    """Service de traduction qui regroupe les requêtes identiques de tous ses clients"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, **translator_options):
+        """Prépare le démon
+
+        Args:
+            address (str): Chemin du socket Unix ou "hôte:port" (TCP local)
+            translator_options: Paramètres des OllamaTranslator créés (packed, max_concurrency,
+                endpoints, stream...)
+        """
+        self.address = address
+        self.translator_options = translator_options
+        self.translators = {}  # Modèle -> OllamaTranslator
+        self.flights = SingleFlight()  # (modèle, texte) -> traduction en cours pour un client
+        self._lock = threading.Lock()
+        self._server = None
+        self.stats = {
+            "clients": 0,
+            "requests": 0,
+            "cues": 0,
+            "translated": 0,
+            "coalesced": 0,
+            "failed": 0
+        }
+
+    def translator_for(self, model_name: str):
+        """OllamaTranslator du modèle, créé au premier usage puis partagé"""
+        with self._lock:
+            translator = self.translators.get(model_name)
+            if translator is None:
+                from ollama_translator import OllamaTranslator
+                translator = OllamaTranslator(model_name=model_name, **self.translator_options)
+                self.translators[model_name] = translator
+            return translator
+
+    def translate_batch(self, model_name: str, texts: List[str], batch_size: int = 10,
+                        on_result=None, on_event=None) -> List[str]:
+        """Traduit des textes pour un client, en partageant les traductions en cours
+
+        Les textes qu'aucun autre client n'est en train de traduire sont envoyés au modèle
+        (en un seul lot) ; pour les autres, le client attend la traduction en cours.
+        `on_result(indice, traduction)` est appelé pour chaque position de `texts` traduite
+        avec succès ; les textes en échec gardent leur texte de repli dans le résultat, comme
+        avec OllamaTranslator.translate_batch.
+        """
+        translator = self.translator_for(model_name)
+        positions = {}
+        for i, text in enumerate(texts):
+            if text and text.strip():
+                positions.setdefault(text, []).append(i)
+
+        owned, waiting = [], {}
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["cues"] += len(texts)
+        for text in positions:
+            future, owner = self.flights.begin((model_name, text))
+            if owner:
+                owned.append(text)
+            else:
+                waiting[text] = future
+        with self._lock:
+            self.stats["translated"] += len(owned)
+            self.stats["coalesced"] += len(waiting)
+        if waiting:
+            print(f"{len(waiting)} sous-titres déjà en cours de traduction pour un autre client")
+
+        results = {}
+
+        def publish(text, translation):
+            # Traduction réussie : transmise au client et aux clients en attente
+            if text in results:
+                return
+            results[text] = translation
+            self.flights.publish((model_name, text), (translation, True))
+            if on_result is not None:
+                for i in positions[text]:
+                    on_result(i, translation)
+
+        def fail(text, fallback):
+            # Échec (texte d'origine ou marqueur de timeout) : ni on_result, ni cache chez les clients
+            results[text] = fallback
+            self.flights.publish((model_name, text), (fallback, False))
+            with self._lock:
+                self.stats["failed"] += 1
+
+        def translate(pending):
+            # Le traducteur appelle on_result pour chaque traduction réussie, y compris celles déjà en cache
+            translations = translator.translate_batch(
+                pending, batch_size, lambda k, translation: publish(pending[k], translation), on_event)
+            for text, translation in zip(pending, translations):
+                if text not in results:
+                    fail(text, translation)
+
+        try:
+            if owned:
+                translate(owned)
+        finally:
+            for text in owned:
+                self.flights.finish((model_name, text), error=RuntimeError("Traduction interrompue"))
+
+        # Textes traduits pour un autre client (retraduits ici si sa requête a été interrompue)
+        orphans = []
+        for text, future in waiting.items():
+            try:
+                translation, success = future.result()
+            except Exception:
+                orphans.append(text)
+                continue
+            if success:
+                publish(text, translation)
+            else:
+                fail(text, translation)
+        if orphans:
+            translate(orphans)
+
+        return [results.get(text, "") for text in texts]
+
+    def _handle(self, request: dict, send):
+        op = request.get("op")
+        if op == "ping":
+            send({"type": "done", "pid": os.getpid(), "models": list(self.translators), "stats": self.stats})
+            return
+        if op != "translate":
+            raise ValueError(f"Opération inconnue: {op}")
+
+        start_time = time.time()
+        texts = request["texts"]
+        translated = set()
+
+        def on_result(i, translation):
+            translated.add(i)
+            send({"type": "result", "index": i, "translation": translation})
+
+        translations = self.translate_batch(
+            request["model"], texts, request.get("batch_size", 10), on_result=on_result,
+            on_event=lambda event: send({"type": "event", "data": to_dict(event)})
+        )
+        # Positions non traduites (échec) : le client ne doit ni les mettre en cache ni les journaliser
+        failed = [i for i, text in enumerate(texts) if text and text.strip() and i not in translated]
+        send({"type": "done", "translations": translations, "failed": failed, "seconds": time.time() - start_time})
+
+    def _make_handler(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                with daemon._lock:
+                    daemon.stats["clients"] += 1
+                line = self.rfile.readline()
+                if not line:
+                    return
+                # Les rappels arrivent depuis la boucle du moteur, commune à tous les clients :
+                # l'écriture sur le socket se fait dans un thread à part pour qu'un client lent
+                # ne ralentisse pas les autres
+                outbox = queue.Queue()
+                writer = threading.Thread(target=self._write, args=(outbox,), daemon=True)
+                writer.start()
+                try:
+                    daemon._handle(json.loads(line), outbox.put)
+                except Exception as e:
+                    outbox.put({"type": "error", "message": str(e)})
+                finally:
+                    outbox.put(None)
+                    writer.join()
+
+            def _write(self, outbox):
+                connected = True
+                while True:
+                    message = outbox.get()
+                    if message is None:
+                        return
+                    # Un client déconnecté n'interrompt pas la traduction (utile aux autres clients)
+                    if not connected:
+                        continue
+                    try:
+                        self.wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                    except OSError:
+                        connected = False
+
+        return Handler
+
+    def start(self):
+        """Ouvre le socket et sert les clients dans un thread (retourne le démon)"""
+        family, address = _parse_address(self.address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.remove(address)  # Socket laissé par un démon arrêté
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class.daemon_threads = True
+        self._server = server_class(address, self._make_handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"🛰️ Démon de traduction à l'écoute sur {self.address}")
+        return self
+
+    def stop(self):
+        """Ferme le socket"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            family, address = _parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(address):
+                os.remove(address)
+            self._server = None
+
+
+class DaemonClient:
+    """Client du démon de traduction"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = 600):
+        self.address = address
+        self.timeout = timeout
+
+    def _request(self, request: dict, timeout: float):
+        """Envoie une requête et retourne les lignes de réponse au fil de l'eau"""
+        family, address = _parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+            sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as reader:
+                for line in reader:
+                    message = json.loads(line)
+                    if message["type"] == "error":
+                        raise RuntimeError(f"Démon de traduction: {message['message']}")
+                    yield message
+        finally:
+            sock.close()
+
+    def ping(self):
+        """État du démon, ou None s'il ne répond pas"""
+        try:
+            for message in self._request({"op": "ping"}, timeout=2):
+                if message["type"] == "done":
+                    return message
+        except (OSError, ValueError, RuntimeError):
+            return None
+        return None
+
+    def translate_batch(self, model_name: str, texts: List[str], batch_size: int = 10,
+                        on_result=None, on_event=None) -> List[str]:
+        """Traduit des textes via le démon (mêmes rappels que OllamaTranslator.translate_batch)
+
+        Raises:
+            OSError: Si le démon est injoignable ou la connexion interrompue
+        """
+        request = {"op": "translate", "model": model_name, "texts": list(texts), "batch_size": batch_size}
+        for message in self._request(request, self.timeout):
+            if message["type"] == "result" and on_result is not None:
+                on_result(message["index"], message["translation"])
+            elif message["type"] == "event" and on_event is not None:
+                event = from_dict(message["data"])
+                if event is not None:
+                    on_event(event)
+            elif message["type"] == "done":
+                return message["translations"]
+        raise ConnectionError("Réponse du démon de traduction incomplète")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service de traduction local partagé")
+    parser.add_argument("--address", default=daemon_address_from_env() or DEFAULT_ADDRESS,
+                        help="Chemin du socket Unix ou \"hôte:port\"")
+    parser.add_argument("--model", nargs="*", default=[], help="Modèles à charger dès le démarrage")
+    parser.add_argument("--packed", action="store_true", help="Plusieurs sous-titres par requête")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--no-throttle", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="Double les requêtes plus lentes que ce percentile de la latence récente (ex. 0.95)")
+    args = parser.parse_args()
+
+    daemon = TranslationDaemon(args.address, packed=args.packed, max_concurrency=args.max_concurrency,
+                               throttle=not args.no_throttle, stream=args.stream,
+                               endpoints=endpoints_from_env(), hedge_percentile=args.hedge_percentile)
+    for model_name in args.model:
+        daemon.translator_for(model_name)
+    daemon.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Démon: {daemon.stats['requests']} requêtes, {daemon.stats['translated']} sous-titres traduits, "
+                  f"{daemon.stats['coalesced']} partagés entre clients")
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tâches de traduction et de résumé exécutées en arrière-plan
+
+L'interface Streamlit soumet une tâche et interroge son état à chaque réexécution du
+script au lieu de bloquer pendant toute la traduction. Les résultats sont mémorisés par
+empreinte du fichier téléchargé et des options : soumettre à nouveau le même fichier
+avec les mêmes options retourne immédiatement le résultat déjà calculé.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from progress_events import FileStarted, TranslationStarted, CuesCompleted, BatchCompleted, FileSaved
+
+# États d'une tâche
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_key(content: bytes, **options) -> str:
+    """Empreinte d'un fichier et des options de traitement (clé de mémorisation)"""
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Job:
+    """Une tâche en arrière-plan, son avancement et son résultat"""
+
+    def __init__(self, key: str, name: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.name = name
+        self.status = PENDING
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        # Avancement, alimenté par les événements du traducteur
+        self.progress = {
+            "total_subtitles": 0,   # Sous-titres du fichier après prétraitement
+            "already_done": 0,      # Sous-titres connus sans appel au modèle (cache, mémoire, journal)
+            "translated": 0,
+            "batch": 0,
+            "batches": 0
+        }
+
+    @property
+    def active(self) -> bool:
+        return self.status in (PENDING, RUNNING)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def fraction(self) -> float:
+        """Part des sous-titres traduits (0 à 1)"""
+        if self.status == DONE:
+            return 1.0
+        state = self.progress
+        if state["total_subtitles"] <= 0:
+            return 0.0
+        return min(1.0, (state["already_done"] + state["translated"]) / state["total_subtitles"])
+
+    def on_event(self, event):
+        """Consommateur des événements de progression (appelé depuis le thread de la tâche)"""
+        state = self.progress
+        if isinstance(event, FileStarted):
+            state["total_subtitles"] = event.cues
+        elif isinstance(event, TranslationStarted):
+            state["already_done"] = max(0, state["total_subtitles"] - event.total)
+            state["batches"] = event.batches
+        elif isinstance(event, CuesCompleted):
+            state["translated"] = event.done
+        elif isinstance(event, BatchCompleted):
+            state["batch"] = event.batch
+        elif isinstance(event, FileSaved):
+            state["batch"] = state["batches"]
+            state["translated"] = state["total_subtitles"] - state["already_done"]
+
+
+class JobManager:
+    """Exécute les tâches dans un pool de threads et mémorise leurs résultats"""
+
+    def __init__(self, max_workers: int = 2, max_results: int = 32):
+        """Prépare le gestionnaire
+
+        Args:
+            max_workers (int): Nombre de tâches exécutées simultanément
+            max_results (int): Nombre de résultats gardés en mémoire (les plus anciens sont oubliés)
+        """
+        self.max_results = max_results
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix="srt-job")
+        self._jobs = OrderedDict()  # Clé -> Job
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Tâche en cours ou terminée pour cette clé (None si aucune)"""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def submit(self, key: str, name: str, function, *args) -> Job:
+        """Soumet `function(job, *args)`, sauf si la même tâche est en cours ou déjà terminée
+
+        Une tâche en échec est relancée.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != FAILED:
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key, name)
+            self._jobs[key] = job
+            self._forget_old()
+        self._executor.submit(self._run, job, function, args)
+        return job
+
+    def _run(self, job: Job, function, args):
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            job.result = function(job, *args)
+            job.status = DONE
+        except Exception as e:
+            print(f"Échec de la tâche {job.name}: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _forget_old(self):
+        finished = [key for key, job in self._jobs.items() if not job.active]
+        for key in finished[:max(0, len(self._jobs) - self.max_results)]:
+            del self._jobs[key]
+
+
+def job_output_path(output_dir: str, key: str, file_name: str) -> str:
+    """Fichier de sortie propre à une tâche : `output_dir/<empreinte>/fr_<nom>`
+
+    Deux fichiers téléchargés sous le même nom (ou le même fichier avec d'autres options)
+    n'écrivent ni dans le même fichier ni dans le même journal de reprise ; la même tâche
+    relancée retrouve son journal.
+    """
+    return os.path.join(output_dir, key[:16], f"fr_{os.path.basename(file_name)}")
+
+
+def _temporary_copy(content: bytes) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".srt") as temp_file:
+        temp_file.write(content)
+        return temp_file.name
+
+
+def run_translation(job: Job, translator, content: bytes, output_path: str, batch_size: int,
+                    merge_duplicates: bool, filter_noise: bool) -> str:
+    """Tâche de traduction : retourne le contenu du fichier traduit"""
+    input_path = _temporary_copy(content)
+    try:
+        success = translator.translate_srt_file(input_path, output_path, batch_size=batch_size,
+                                                merge_duplicates=merge_duplicates, filter_noise=filter_noise,
+                                                on_event=job.on_event)
+        if not success or not os.path.exists(output_path):
+            raise RuntimeError("La traduction a échoué. Vérifiez les journaux.")
+        with open(output_path, "r", encoding="utf-8") as f:
+            return f.read()
+    finally:
+        os.unlink(input_path)
+
+
+def run_summary(job: Job, translator, content: bytes) -> dict:
+    """Tâche de résumé : retourne le résultat de SRTTranslator.summarize_srt_file"""
+    input_path = _temporary_copy(content)
+    try:
+        result = translator.summarize_srt_file(input_path)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+    finally:
+        os.unlink(input_path)
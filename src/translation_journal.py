@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import threading
+import time
+from typing import Dict
+
+# Fréquence maximale des fsync du journal (les lignes sont vidées vers l'OS à chaque écriture)
+FSYNC_INTERVAL = 2.0
+
+
+def job_id_for(input_file: str, *options) -> str:
+    """Identifiant d'un travail : contenu du fichier source et options de traduction"""
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    for option in options:
+        digest.update(b"\x00" + str(option).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranslationJournal:
+    """Journal d'un travail de traduction pour la reprise après interruption
+
+    Chaque sous-titre traduit est ajouté au journal (une ligne JSON) dès qu'il est terminé.
+    Au redémarrage du même travail (même fichier source, mêmes options), les sous-titres
+    déjà présents dans le journal ne sont pas renvoyés au modèle. Le journal est supprimé
+    une fois le fichier final écrit.
+    """
+
+    def __init__(self, path: str, job_id: str):
+        """Ouvre le journal et recharge les traductions d'un travail interrompu"""
+        self.path = path
+        self.job_id = job_id
+        self.completed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._last_sync = time.time()
+
+        resumed = self._load()
+        if resumed:
+            print(f"Reprise du travail interrompu: {len(self.completed)} sous-titres déjà traduits")
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+            self._write({"job": job_id})
+
+    @classmethod
+    def for_output(cls, output_file: str, job_id: str) -> "TranslationJournal":
+        """Journal associé à un fichier de sortie"""
+        directory = os.path.dirname(output_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return cls(output_file + ".journal", job_id)
+
+    def _load(self) -> bool:
+        """Recharge le journal existant s'il appartient au même travail
+
+        Une ligne tronquée par l'interruption (et tout ce qui la suit) est retirée du
+        fichier : les nouvelles lignes sont ajoutées après la dernière ligne valide.
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                header_line = f.readline()
+                if not header_line.endswith(b"\n"):
+                    raise ValueError("en-tête incomplet")
+                header = json.loads(header_line.decode("utf-8"))
+                if header.get("job") != self.job_id:
+                    print("Journal d'un autre travail trouvé, il est ignoré")
+                    return False
+                valid_end = len(header_line)
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("ligne incomplète")
+                        entry = json.loads(line.decode("utf-8"))
+                        source, translation = entry["src"], entry["tr"]
+                    except (ValueError, KeyError, TypeError):
+                        # Dernière ligne tronquée par l'interruption
+                        break
+                    self.completed[source] = translation
+                    valid_end += len(line)
+                size = f.seek(0, os.SEEK_END)
+            if size > valid_end:
+                print(f"Journal tronqué après la dernière ligne valide ({size - valid_end} octets retirés)")
+                os.truncate(self.path, valid_end)
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Journal illisible ({str(e)}), le travail repart de zéro")
+            self.completed = {}
+            return False
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        now = time.time()
+        if now - self._last_sync >= FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def record(self, source: str, translation: str):
+        """Enregistre un sous-titre traduit"""
+        with self._lock:
+            if source in self.completed:
+                return
+            self.completed[source] = translation
+            self._write({"src": source, "tr": translation})
+
+    def complete(self):
+        """Ferme et supprime le journal (le fichier final a été écrit)"""
+        with self._lock:
+            self._file.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def close(self):
+        """Ferme le journal en le conservant pour une reprise ultérieure"""
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Emplacement par défaut de la mémoire de traduction (surchargeable par variable d'environnement)
+DEFAULT_MEMORY_PATH = os.environ.get(
+    "SRT_TRANSLATION_MEMORY",
+    os.path.join(os.path.expanduser("~"), ".cache", "srt_translator", "translation_memory.db")
+)
+
+# Nombre maximal de variables par requête SQL (limite historique de SQLite)
+_SQL_CHUNK = 500
+
+
+class TranslationMemory:
+    """Mémoire de traduction persistante sur disque (SQLite) partagée entre exécutions et processus
+
+    Chaque entrée est indexée par le nom du modèle, la version du prompt et le texte source.
+    La taille est bornée : au-delà de `max_entries`, les entrées les moins récemment
+    utilisées sont supprimées. Le mode WAL de SQLite et un délai d'attente sur les verrous
+    permettent à plusieurs processus (CLI, sessions Streamlit) d'utiliser le même fichier.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_MEMORY_PATH, max_entries: int = 200000, timeout: float = 30.0):
+        """Ouvre (ou crée) la base de la mémoire de traduction"""
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0
+        }
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS memory (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS memory_last_used ON memory (last_used)")
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, source: str) -> str:
+        """Calcule la clé d'une entrée à partir du modèle, de la version du prompt et du texte"""
+        raw = f"{model}\x00{prompt_version}\x00{source}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, model: str, prompt_version: str, source: str, count: bool = True) -> Optional[str]:
+        """Retourne la traduction mémorisée ou None"""
+        return self.get_many(model, prompt_version, [source], count=count).get(source)
+
+    def get_many(self, model: str, prompt_version: str, sources: List[str], count: bool = True) -> Dict[str, str]:
+        """Recherche plusieurs textes
+
+        Les lectures se font hors transaction ; la mise à jour de l'usage des entrées
+        trouvées a sa propre transaction d'écriture (BEGIN IMMEDIATE), qui attend le
+        verrou au lieu d'échouer sur SQLITE_BUSY en tentant de promouvoir une lecture.
+
+        Args:
+            count (bool): Compter la recherche dans les statistiques hits/misses (False pour
+                les recherches annexes, comme les modèles de phrases normalisées)
+
+        Returns:
+            dict: Association texte source -> traduction pour les textes trouvés
+        """
+        keys = {}
+        for source in sources:
+            keys.setdefault(self.make_key(model, prompt_version, source), source)
+        if not keys:
+            return {}
+
+        found = {}
+        used = []
+        now = time.time()
+        key_list = list(keys)
+        with self._lock:
+            try:
+                for start in range(0, len(key_list), _SQL_CHUNK):
+                    chunk = key_list[start:start + _SQL_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT key, translation FROM memory WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, translation in rows:
+                        found[keys[key]] = translation
+                        used.append((now, key))
+            except sqlite3.Error as e:
+                print(f"Erreur de lecture de la mémoire de traduction: {str(e)}")
+
+            if used:
+                try:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    self._conn.executemany("UPDATE memory SET last_used = ?, hits = hits + 1 WHERE key = ?", used)
+                    self._conn.execute("COMMIT")
+                except sqlite3.Error as e:
+                    self._rollback()
+                    print(f"Erreur de mise à jour de la mémoire de traduction: {str(e)}")
+
+            if count:
+                self.stats["hits"] += len(found)
+                self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put(self, model: str, prompt_version: str, source: str, translation: str):
+        """Enregistre une traduction"""
+        self.put_many(model, prompt_version, {source: translation})
+
+    def put_many(self, model: str, prompt_version: str, translations: Dict[str, str]):
+        """Enregistre plusieurs traductions en une seule transaction"""
+        if not translations:
+            return
+        now = time.time()
+        rows = [
+            (self.make_key(model, prompt_version, source), model, prompt_version, source, translation, now, now)
+            for source, translation in translations.items()
+        ]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    """INSERT INTO memory (key, model, prompt_version, source, translation, created, last_used)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(key) DO UPDATE SET translation = excluded.translation,
+                                                      last_used = excluded.last_used""",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._rollback()
+                print(f"Erreur d'écriture dans la mémoire de traduction: {str(e)}")
+                return
+
+            self.stats["writes"] += len(rows)
+            self._writes_since_eviction += len(rows)
+            # Vérifier la taille seulement de temps en temps pour limiter le coût
+            if self._writes_since_eviction >= max(1, self.max_entries // 100):
+                self._writes_since_eviction = 0
+                self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_entries"""
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            count = self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM memory WHERE key IN (SELECT key FROM memory ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+                self.stats["evictions"] += excess
+            self._conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._rollback()
+            print(f"Erreur lors du nettoyage de la mémoire de traduction: {str(e)}")
+
+    def _rollback(self):
+        """Annule la transaction en cours si elle existe"""
+        try:
+            self._conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def hit_ratio(self) -> float:
+        """Proportion de recherches trouvées dans la mémoire"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups > 0 else 0.0
+
+    def close(self):
+        """Ferme la connexion à la base"""
+        with self._lock:
+            self._conn.close()
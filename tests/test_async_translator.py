@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from mock_ollama_server import MockOllamaServer, MockConfig
+from ollama_translator import OllamaTranslator
+
+
+@pytest.fixture
+def server():
+    server = MockOllamaServer(config=MockConfig("uniform:0.01,0.05", 2000, 4, seed=1)).start()
+    yield server
+    server.stop()
+
+
+def make_translator(server, **options):
+    return OllamaTranslator("llama3.2", port=server.port, use_memory=False, normalize=False, profile_path=None,
+                            warm_up=False, **options)
+
+
+def test_concurrent_batches_share_one_translator(server):
+    """Plusieurs lots lancés en même temps depuis des threads différents se terminent tous"""
+    translator = make_translator(server, max_concurrency=4)
+    results = {}
+
+    def worker(n):
+        texts = [f"Line {i} of batch {n}, with a few words." for i in range(30)]
+        results[n] = (texts, translator.translate_batch(texts, 10, on_event=lambda event: None))
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads), "lot bloqué"
+    for texts, translations in results.values():
+        assert len(translations) == len(texts)
+        assert all(translation != text for text, translation in zip(texts, translations))
+    # Toutes les places du limiteur ont été rendues
+    assert translator.engine.limiter.in_flight == 0
+    assert not translator.engine.limiter._waiters
+
+
+def test_packed_concurrent_batches(server):
+    translator = make_translator(server, packed=True, max_concurrency=4)
+    threads, results = [], []
+    for n in range(3):
+        texts = [f"Packed line {i} from client {n}." for i in range(25)]
+        thread = threading.Thread(target=lambda t=texts: results.append(
+            translator.translate_batch(t, 5, on_event=lambda event: None)), daemon=True)
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads), "lot bloqué"
+    assert len(results) == 3
+    assert translator.engine.limiter.in_flight == 0
+
+
+def test_failed_cues_keep_source_and_are_not_reported():
+    """Un texte en échec garde son texte d'origine, sans passer par on_result ni par le cache"""
+    server = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 4, error_rate=1.0)).start()
+    try:
+        translator = make_translator(server, throttle=False)
+        translator.cache["Already known."] = "Déjà connu."
+        texts = ["Already known.", "This one fails.", "", "This one fails too."]
+        received = {}
+        translations = translator.translate_batch(texts, on_result=received.__setitem__,
+                                                  on_event=lambda event: None)
+        assert translations == ["Déjà connu.", "This one fails.", "", "This one fails too."]
+        assert received == {0: "Déjà connu."}
+        assert "This one fails." not in translator.cache
+    finally:
+        server.stop()
+
+
+def test_overloaded_server_lowers_concurrency():
+    """Des refus 503 font baisser la limite adaptative, et tous les textes finissent traduits"""
+    server = MockOllamaServer(config=MockConfig("fixed:0.05", 2000, 1, max_queue=1)).start()
+    try:
+        translator = make_translator(server, max_concurrency=8)
+        texts = [f"Overloaded line {i}, still translated in the end." for i in range(12)]
+        translations = translator.translate_batch(texts, on_event=lambda event: None)
+        assert all(translation != text for text, translation in zip(texts, translations))
+        assert server.stats["rejected"] > 0
+        assert translator.engine.limiter.current_limit < 8
+    finally:
+        server.stop()
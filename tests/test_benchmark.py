@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import pysrt
+
+from benchmark import make_synthetic_srt, word_tag, STOCK_PHRASES
+from cue_normalizer import normalize
+
+
+def test_word_tags_are_unique():
+    tags = [word_tag(i) for i in range(2000)]
+    assert len(set(tags)) == len(tags)
+    assert not any(c.isdigit() for tag in tags for c in tag)
+
+
+def test_synthetic_cues_survive_normalization(tmp_path):
+    """Les sous-titres synthétiques ne sont pas fusionnés par la normalisation"""
+    path = str(tmp_path / "synthetic.srt")
+    make_synthetic_srt(path, ["Where are you going?", "I don't know."], 200)
+    texts = [sub.text for sub in pysrt.open(path, encoding="utf-8")]
+    unique = [text for text in texts if text not in STOCK_PHRASES]
+    assert len({normalize(text)[0] for text in unique}) == len(unique) == 180
+
+
+def test_srt_file_bench_counts_translated_cues(tmp_path):
+    """Le débit des fichiers compte les sous-titres traduits (après fusion et filtrage)"""
+    from benchmark import bench_translate_srt_files, CONFIGURATIONS
+    from mock_ollama_server import MockOllamaServer, MockConfig
+
+    path = str(tmp_path / "noisy.srt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("1\n00:00:00,000 --> 00:00:01,000\n[music]\n\n"
+                "2\n00:00:01,000 --> 00:00:02,000\nHello there.\n\n"
+                "3\n00:00:02,100 --> 00:00:03,000\nHello there.\n\n"
+                "4\n00:00:05,000 --> 00:00:06,000\nSee you soon.\n")
+    server = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 2)).start()
+    try:
+        work_dir = str(tmp_path / "out")
+        record = bench_translate_srt_files([("127.0.0.1", server.port)], CONFIGURATIONS["adaptatif"], [path],
+                                           work_dir)
+    finally:
+        server.stop()
+    assert record["raw_cues"] == 4
+    assert record["cues"] == 2
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+
+from cue_table import CueTable, read_srt, write_srt
+
+
+def make_table():
+    table = CueTable()
+    table.append(0, 900, "Hello")
+    table.append(1000, 1900, "World")
+    return table
+
+
+def test_write_srt_round_trip(tmp_path):
+    path = str(tmp_path / "out.srt")
+    write_srt(make_table(), path)
+    assert [cue.text for cue in read_srt(path)] == ["Hello", "World"]
+
+
+def test_write_srt_new_file_follows_umask(tmp_path):
+    path = str(tmp_path / "new.srt")
+    umask = os.umask(0o022)
+    try:
+        write_srt(make_table(), path)
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_write_srt_keeps_existing_mode(tmp_path):
+    path = str(tmp_path / "existing.srt")
+    write_srt(make_table(), path)
+    os.chmod(path, 0o640)
+    write_srt(make_table(), path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+def test_slice_is_an_independent_table():
+    table = make_table()
+    part = table[:1]
+    # Ni la table d'origine ni la tranche ne sont bloquées par l'autre
+    table.append(2000, 2900, "Again")
+    part.append(3000, 3900, "More")
+    assert [cue.text for cue in table] == ["Hello", "World", "Again"]
+    assert [(cue.start_ms, cue.text) for cue in part] == [(0, "Hello"), (3000, "More")]
+    assert part.start_ms.typecode == "q"
+
+
+def test_write_srt_leaves_process_umask_alone(tmp_path, monkeypatch):
+    """L'umask est partagé par tous les threads : write_srt ne doit pas le modifier"""
+    def forbidden(mask):
+        raise AssertionError("os.umask appelé")
+
+    umask = os.umask(0o022)
+    os.umask(umask)
+    monkeypatch.setattr(os, "umask", forbidden)
+    path = str(tmp_path / "new.srt")
+    write_srt(make_table(), path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+    assert os.listdir(str(tmp_path)) == ["new.srt"]
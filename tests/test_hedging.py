@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from hedging import MIN_SAMPLES
+from mock_ollama_server import MockOllamaServer, MockConfig
+from ollama_translator import OllamaTranslator
+
+
+def wait_for(condition, seconds=3.0):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_stalled_primary_is_closed_by_winner():
+    """La copie gagnante ferme la connexion d'une requête d'origine bloquée"""
+    stalled = MockOllamaServer(config=MockConfig("fixed:0.01", 500, 2, timeout_rate=1.0, stall_seconds=30)).start()
+    healthy = MockOllamaServer(config=MockConfig("fixed:0.01", 500, 2)).start()
+    try:
+        translator = OllamaTranslator("llama3.2", endpoints=[("127.0.0.1", stalled.port), ("127.0.0.1", healthy.port)],
+                                      use_memory=False, profile_path=None, warm_up=False, hedge_percentile=0.5,
+                                      hedge_budget=1.0, health_interval=0)
+        text = "This sentence is long enough to be streamed in several pieces."
+        for _ in range(MIN_SAMPLES):
+            translator.hedging.observe(0.2, len(text))
+
+        start = time.time()
+        translation = translator.translate(text)
+        assert translation and translation != text
+        assert time.time() - start < 5
+        assert translator.hedging.stats["hedge_wins"] == 1
+
+        # La requête d'origine est interrompue sans attendre la fin du blocage (30 s)
+        primary = translator.pool.backends[0]
+        assert wait_for(lambda: stalled.stats["cancelled"] == 1 and stalled.stats["active"] == 0)
+        assert wait_for(lambda: primary.outstanding == 0)
+        assert primary.stats["cancelled"] == 1
+    finally:
+        stalled.stop()
+        healthy.stop()
+
+
+def test_hedging_without_stream_keeps_overall_timeout(capsys):
+    """stream=False : avertissement, et pas de délai de premier token pour les requêtes de secours"""
+    server = MockOllamaServer(config=MockConfig("fixed:0.6", 500, 2)).start()
+    try:
+        translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, profile_path=None,
+                                      warm_up=False, hedge_percentile=0.95, first_token_timeout=0.2)
+        assert "streaming" in capsys.readouterr().out
+        text = "Slow first token, but well within the overall timeout."
+        for _ in range(MIN_SAMPLES):
+            translator.hedging.observe(5.0, len(text))
+        translation = translator.translate(text)
+        assert translation != text
+        assert translator.stats["stalls"] == 0
+    finally:
+        server.stop()
+
+
+def test_hedges_stay_within_budget():
+    """Un serveur uniformément lent ne déclenche pas plus de copies que le budget"""
+    server = MockOllamaServer(config=MockConfig("fixed:0.3", 2000, 8)).start()
+    try:
+        translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, normalize=False,
+                                      profile_path=None, warm_up=False, stream=True, hedge_percentile=0.5,
+                                      hedge_budget=0.1, max_concurrency=4, throttle=False)
+        texts = [f"Line number {i} of a uniformly slow batch." for i in range(20)]
+        for _ in range(MIN_SAMPLES):
+            translator.hedging.observe(0.01, len(texts[0]))
+        translations = translator.translate_batch(texts, on_event=lambda event: None)
+        assert all(translation != text for text, translation in zip(texts, translations))
+        stats = translator.hedging.stats
+        assert stats["hedges"] <= 0.1 * stats["requests"] + 1
+        assert stats["over_budget"] > 0
+        assert server.stats["requests"] == len(texts) + stats["hedges"]
+    finally:
+        server.stop()
+
+
+def test_fast_requests_are_not_hedged():
+    """Aucune copie tant que les requêtes restent sous le percentile observé"""
+    server = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 4)).start()
+    try:
+        translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, normalize=False,
+                                      profile_path=None, warm_up=False, stream=True, hedge_percentile=0.95,
+                                      hedge_budget=1.0)
+        texts = [f"Quick line {i}." for i in range(10)]
+        for _ in range(MIN_SAMPLES):
+            translator.hedging.observe(2.0, len(texts[0]))
+        translator.translate_batch(texts, on_event=lambda event: None)
+        assert translator.hedging.stats["hedges"] == 0
+        assert server.stats["requests"] == len(texts)
+    finally:
+        server.stop()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from metrics import get_registry
+from mock_ollama_server import MockOllamaServer, MockConfig
+from ollama_translator import OllamaTranslator
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 4)).start()
+    yield server
+    server.stop()
+
+
+def hits_delta(before):
+    after = get_registry().to_dict()["cache"]["hits"]
+    return {source: count - before.get(source, 0) for source, count in after.items()
+            if count != before.get(source, 0)}
+
+
+def test_translate_records_actual_source(server):
+    translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, profile_path=None, warm_up=False)
+    translator.translate("Where are you going?")
+
+    before = get_registry().to_dict()["cache"]["hits"]
+    translator.translate("Where are you going?")
+    assert hits_delta(before) == {"cache": 1}
+
+    before = get_registry().to_dict()["cache"]["hits"]
+    translator.translate("WHERE ARE YOU GOING?")
+    assert hits_delta(before) == {"normalized": 1}
+
+
+def test_batch_followers_are_recorded(server):
+    translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, profile_path=None, warm_up=False)
+    before = get_registry().to_dict()["cache"]["hits"]
+    # Même clé normalisée : un seul envoi, le second texte réutilise la traduction du premier
+    translator.translate_batch(["Come here now!", "come here now", "Come here now!"], on_event=lambda event: None)
+    assert hits_delta(before) == {"duplicate": 1, "normalized": 1}
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from ollama_translator import OllamaTranslator
+
+
+@pytest.fixture(scope="module")
+def translator():
+    return OllamaTranslator("llama3.2", port=9, use_memory=False, profile_path=None, warm_up=False, packed=True)
+
+
+def test_continuation_line_is_joined(translator):
+    response = "[1] Bonjour\ntout le monde\n[2] Merci"
+    assert translator._parse_packed_response(response, 2) == ["Bonjour tout le monde", "Merci"]
+
+
+def test_trailing_commentary_is_dropped(translator):
+    response = "[1] Bonjour\n[2] Merci\nNote : traduction fidèle au texte original."
+    assert translator._parse_packed_response(response, 2) == ["Bonjour", "Merci"]
+
+
+def test_commentary_after_blank_line_is_dropped(translator):
+    response = "[1] Bonjour\n\nJ'ai conservé le ton familier.\n[2] Merci\n\nNote : rien à signaler."
+    assert translator._parse_packed_response(response, 2) == ["Bonjour", "Merci"]
+
+
+def test_missing_number_is_misaligned(translator):
+    assert translator._parse_packed_response("[1] Bonjour\n[3] Merci", 3) is None
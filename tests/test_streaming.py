@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+from mock_ollama_server import MockOllamaServer, MockConfig
+from ollama_translator import OllamaTranslator
+
+
+def test_early_stop_counts_streamed_tokens():
+    """Une réponse coupée après la traduction compte les tokens reçus, pas un seul"""
+    server = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 2, chatter_rate=1.0)).start()
+    try:
+        translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, profile_path=None,
+                                      warm_up=False, stream=True)
+        text = "This sentence is long enough to be streamed in several pieces."
+        payload = {"model": "llama3.2", "prompt": translator.PROMPT_TEMPLATE.format(text=text)}
+        status, translation, result = translator._generate_stream(
+            translator.pool.primary.api_url, payload, 10, complete=lambda partial: True)
+        assert status == 200
+        assert "Note" not in translation
+        assert translator.stats["early_stops"] == 1
+        # Morceaux d'environ 4 caractères : au moins la traduction entière a été reçue
+        assert result["eval_count"] >= len(translation) // 4 > 1
+    finally:
+        server.stop()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+
+from throughput_profile import ThroughputProfile
+
+
+def test_concurrent_saves_keep_every_model(tmp_path):
+    """Des enregistrements simultanés de modèles différents ne s'écrasent pas"""
+    path = str(tmp_path / "profiles.json")
+    result = {"eval_count": 40, "eval_duration": 1e9}
+
+    def writer(n):
+        profile = ThroughputProfile(f"model-{n}", path)
+        for _ in range(20):
+            profile.observe(100, 1.5, result, 200)
+            profile.save()
+
+    threads = [threading.Thread(target=writer, args=(n,), daemon=True) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    with open(path, encoding="utf-8") as f:
+        profiles = json.load(f)
+    assert sorted(profiles) == sorted(f"model-{n}" for n in range(8))
+    assert all(entry["samples"] == 20 for entry in profiles.values())
+    assert ThroughputProfile("model-3", path).ready
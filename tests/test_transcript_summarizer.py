@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from cue_table import CueTable
+from mock_ollama_server import MockOllamaServer, MockConfig
+from ollama_translator import OllamaTranslator
+from transcript_summarizer import TranscriptSummarizer
+
+
+@pytest.fixture
+def server():
+    server = MockOllamaServer(config=MockConfig("fixed:0.05", 2000, 8, seed=3)).start()
+    yield server
+    server.stop()
+
+
+def make_cues(name, count=40):
+    """Une réplique toutes les 30 s : une tranche de 300 s regroupe 10 répliques"""
+    return CueTable([i * 30000 for i in range(count)], [i * 30000 + 2000 for i in range(count)],
+                    [f"{name} line {i}, with a few words to summarize." for i in range(count)])
+
+
+def test_chunk_requests_respect_engine_limit(server):
+    """Les requêtes de tranches passent par le limiteur du moteur, pas par un pool à part"""
+    translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, normalize=False,
+                                  profile_path=None, warm_up=False, max_concurrency=2, throttle=False)
+    summarizer = TranscriptSummarizer(translator, max_concurrency=8)
+    stats = {}
+    assert summarizer.summarize(make_cues("Solo"), stats)
+    assert server.stats["max_active"] <= 2
+    assert stats["chunks"] == 4
+    assert stats["requests"] == 5  # 4 tranches + 1 combinaison
+    assert stats["failed"] == 0
+
+
+def test_concurrent_summaries_keep_their_own_stats(server):
+    """Deux résumés simultanés ne mélangent pas leurs compteurs"""
+    translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, normalize=False,
+                                  profile_path=None, warm_up=False, max_concurrency=4)
+    summarizer = TranscriptSummarizer(translator, max_concurrency=4)
+    results = {}
+
+    def worker(name, count):
+        stats = {}
+        summarizer.summarize(make_cues(name, count), stats)
+        results[name] = stats
+
+    threads = [threading.Thread(target=worker, args=args, daemon=True) for args in (("Long", 60), ("Short", 20))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads), "résumé bloqué"
+    assert (results["Long"]["chunks"], results["Long"]["requests"]) == (6, 7)
+    assert (results["Short"]["chunks"], results["Short"]["requests"]) == (2, 3)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+
+from mock_ollama_server import MockOllamaServer, MockConfig
+from srt_translator import SRTTranslator
+from translation_daemon import TranslationDaemon, DaemonClient
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    server = MockOllamaServer(config=MockConfig("uniform:0.01,0.05", 2000, 4, seed=2)).start()
+    daemon = TranslationDaemon("127.0.0.1:0", port=server.port, use_memory=False, profile_path=None,
+                               warm_up=False, max_concurrency=4).start()
+    daemon.address = "127.0.0.1:%d" % daemon._server.server_address[1]
+    yield daemon
+    daemon.stop()
+    server.stop()
+
+
+def test_concurrent_clients(daemon):
+    """Des clients simultanés avec des textes différents obtiennent tous leur traduction"""
+    results = {}
+
+    def client(n):
+        texts = [f"Client {n} says line {i} out loud." for i in range(20)] + ["Shared line for everyone."]
+        received = []
+        translations = DaemonClient(daemon.address, timeout=60).translate_batch(
+            "llama3.2", texts, 5, on_result=lambda i, translation: received.append(i))
+        results[n] = (texts, translations, received)
+
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads), "client bloqué"
+    assert len(results) == 3
+    for texts, translations, received in results.values():
+        assert len(translations) == len(texts)
+        assert all(translation and translation != text for text, translation in zip(texts, translations))
+        assert sorted(set(received)) == list(range(len(texts)))
+    assert daemon.stats["requests"] == 3
+
+
+def test_cached_translations_are_reported_as_results(daemon):
+    """Une traduction déjà en cache côté démon est un succès, pas un échec"""
+    texts = ["Already translated once.", "Another cached line."]
+    DaemonClient(daemon.address, timeout=60).translate_batch("llama3.2", texts)
+    received = []
+    translations = DaemonClient(daemon.address, timeout=60).translate_batch(
+        "llama3.2", texts, on_result=lambda i, translation: received.append(i))
+    assert sorted(received) == [0, 1]
+    assert all(translation != text for text, translation in zip(texts, translations))
+    assert daemon.stats["failed"] == 0
+
+
+@pytest.fixture
+def failing_daemon():
+    server = MockOllamaServer(config=MockConfig("fixed:0.2", 2000, 4, error_rate=1.0)).start()
+    daemon = TranslationDaemon("127.0.0.1:0", port=server.port, use_memory=False, profile_path=None,
+                               warm_up=False, throttle=False).start()
+    daemon.address = "127.0.0.1:%d" % daemon._server.server_address[1]
+    yield daemon
+    daemon.stop()
+    server.stop()
+
+
+def test_failures_are_not_reported_as_results(failing_daemon):
+    """Un échec n'est ni transmis à on_result, ni partagé comme traduction avec les clients en attente"""
+    texts = ["Hello there.", "Bye now."]
+    outcomes = {}
+
+    def client(n):
+        received = []
+        translations = DaemonClient(failing_daemon.address, timeout=60).translate_batch(
+            "llama3.2", texts, on_result=lambda i, translation: received.append((i, translation)))
+        outcomes[n] = (translations, received)
+
+    # Le second client arrive pendant la requête du premier et attend son résultat
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(2)]
+    threads[0].start()
+    time.sleep(0.1)
+    threads[1].start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert len(outcomes) == 2
+    for translations, received in outcomes.values():
+        assert received == []
+        assert translations == texts  # Texte de repli, comme en traduction locale
+    assert failing_daemon.stats["coalesced"] == 2
+    assert failing_daemon.stats["failed"] == 4
+
+
+def test_srt_translator_does_not_cache_daemon_failures(failing_daemon):
+    translator = SRTTranslator("llama3.2", port=9, use_memory=False, daemon=failing_daemon.address)
+    assert translator.daemon is not None
+    results = []
+    translations = translator.translate_batch(["Hello there."], on_result=lambda i, t: results.append(i))
+    assert translations == ["Hello there."]
+    assert results == []
+    assert "Hello there." not in translator.translator.cache
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from mock_ollama_server import MockOllamaServer, MockConfig
+from srt_translator import SRTTranslator
+from translation_jobs import JobManager, job_key, job_output_path, run_translation, DONE
+
+
+def make_srt(lines) -> bytes:
+    blocks = [f"{i}\n00:00:{i:02d},000 --> 00:00:{i:02d},900\n{line}\n" for i, line in enumerate(lines, 1)]
+    return "\n".join(blocks).encode("utf-8")
+
+
+def test_job_output_paths_are_distinct():
+    first = job_output_path("out", job_key(b"a"), "episode.srt")
+    second = job_output_path("out", job_key(b"b"), "episode.srt")
+    assert first != second
+    assert os.path.basename(first) == "fr_episode.srt"
+
+
+def test_same_named_uploads_run_concurrently(tmp_path):
+    """Deux fichiers du même nom traduits en même temps par un traducteur partagé"""
+    server = MockOllamaServer(config=MockConfig("uniform:0.01,0.05", 2000, 4, seed=3)).start()
+    try:
+        translator = SRTTranslator("llama3.2", port=server.port, use_memory=False, max_concurrency=4)
+        translator.translator.profile.path = None
+        jobs = JobManager(max_workers=2)
+        contents = [make_srt([f"Episode {name} line {i} is here." for i in range(15)]) for name in ("one", "two")]
+        submitted = []
+        for content in contents:
+            key = job_key(content, task="translation")
+            output_path = job_output_path(str(tmp_path), key, "episode.srt")
+            submitted.append(jobs.submit(key, "episode.srt", run_translation, translator, content, output_path,
+                                         5, False, False))
+        deadline = time.time() + 60
+        while any(job.active for job in submitted) and time.time() < deadline:
+            time.sleep(0.05)
+        assert [job.status for job in submitted] == [DONE, DONE]
+        first, second = (job.result for job in submitted)
+        assert "one" in first and "two" not in first
+        assert "two" in second and "one" not in second
+    finally:
+        server.stop()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from mock_ollama_server import MockOllamaServer, MockConfig
+from ollama_translator import OllamaTranslator
+from srt_translator import SRTTranslator
+from translation_journal import TranslationJournal, job_id_for
+
+LINES = ["Good morning everyone.", "Where is the station?", "I forgot my keys.",
+         "The weather is nice today.", "Let's meet at noon.", "See you tomorrow."]
+
+
+def write_source(path):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, line in enumerate(LINES):
+            f.write(f"{i + 1}\n00:00:{i * 5:02d},000 --> 00:00:{i * 5 + 2:02d},000\n{line}\n\n")
+
+
+def make_srt_translator(server):
+    translator = OllamaTranslator("llama3.2", port=server.port, use_memory=False, normalize=False,
+                                  profile_path=None, warm_up=False, throttle=False)
+    return SRTTranslator("llama3.2", translator=translator)
+
+
+@pytest.fixture
+def servers():
+    failing = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 4, error_rate=1.0)).start()
+    healthy = MockOllamaServer(config=MockConfig("fixed:0.01", 2000, 4)).start()
+    yield failing, healthy
+    failing.stop()
+    healthy.stop()
+
+
+def test_resume_after_torn_line(tmp_path):
+    path = str(tmp_path / "fr_episode.srt.journal")
+    journal = TranslationJournal(path, "job")
+    journal.record("Hello", "Bonjour")
+    journal.record("Goodbye", "Au revoir")
+    journal.close()
+    # Interruption au milieu de l'écriture d'une ligne
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"src": "Thanks", "tr": "Mer')
+
+    resumed = TranslationJournal(path, "job")
+    assert resumed.completed == {"Hello": "Bonjour", "Goodbye": "Au revoir"}
+    resumed.record("Thanks", "Merci")
+    resumed.close()
+
+    # Les entrées ajoutées après la reprise survivent à une seconde reprise
+    again = TranslationJournal(path, "job")
+    assert again.completed == {"Hello": "Bonjour", "Goodbye": "Au revoir", "Thanks": "Merci"}
+    again.complete()
+
+
+def test_other_job_starts_over(tmp_path):
+    path = str(tmp_path / "journal")
+    journal = TranslationJournal(path, "first")
+    journal.record("Hello", "Bonjour")
+    journal.close()
+    assert TranslationJournal(path, "second").completed == {}
+
+
+def test_failed_cues_are_retried_on_resume(tmp_path, servers):
+    """Les sous-titres en échec ne sont pas journalisés et le journal est conservé pour eux seuls"""
+    failing, healthy = servers
+    source, output = str(tmp_path / "episode.srt"), str(tmp_path / "fr_episode.srt")
+    write_source(source)
+
+    first = make_srt_translator(failing)
+    first.translator.cache.update({LINES[0]: "Bonjour à tous.", LINES[1]: "Où est la gare ?"})
+    assert first.translate_srt_file(source, output)
+    with open(output, encoding="utf-8") as f:
+        assert LINES[2] in f.read()  # Échec : texte d'origine dans le fichier
+    assert os.path.exists(output + ".journal")
+
+    assert make_srt_translator(healthy).translate_srt_file(source, output)
+    assert healthy.stats["requests"] == len(LINES) - 2
+    assert not os.path.exists(output + ".journal")
+    with open(output, encoding="utf-8") as f:
+        content = f.read()
+    assert "Bonjour à tous." in content
+    assert all(f"[FR] {line}" in content for line in LINES[2:])
+
+
+def test_interrupted_run_resumes_from_journal(tmp_path, servers):
+    """Les sous-titres du journal d'un travail interrompu ne sont pas renvoyés au modèle"""
+    _, healthy = servers
+    source, output = str(tmp_path / "episode.srt"), str(tmp_path / "fr_episode.srt")
+    write_source(source)
+    srt = make_srt_translator(healthy)
+    job_id = job_id_for(source, "llama3.2", srt.translator.prompt_version, False, False)
+    journal = TranslationJournal.for_output(output, job_id)
+    for line in LINES[:4]:
+        journal.record(line, f"[journal] {line}")
+    journal.close()
+
+    assert srt.translate_srt_file(source, output)
+    assert healthy.stats["requests"] == 2
+    assert not os.path.exists(output + ".journal")
+    with open(output, encoding="utf-8") as f:
+        content = f.read()
+    assert all(f"[journal] {line}" in content for line in LINES[:4])
+    assert all(f"[FR] {line}" in content for line in LINES[4:])
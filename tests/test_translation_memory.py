@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from translation_memory import TranslationMemory
+
+
+def test_concurrent_readers_and_writers(tmp_path, capsys):
+    """Plusieurs connexions qui lisent et écrivent la même base ne perdent aucune recherche"""
+    path = str(tmp_path / "memory.db")
+    TranslationMemory(path).put_many("m", "v1", {f"shared {i}": f"partagé {i}" for i in range(50)})
+    memories = [TranslationMemory(path) for _ in range(4)]
+    results = []
+
+    def worker(n):
+        memory = memories[n]
+        for round in range(30):
+            memory.put_many("m", "v1", {f"text {n} {round} {i}": f"texte {i}" for i in range(5)})
+            results.append(len(memory.get_many("m", "v1", [f"shared {i}" for i in range(50)])))
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert "Erreur" not in capsys.readouterr().out
+    assert results == [50] * 120
+    assert all(memory.stats["hits"] == 30 * 50 for memory in memories)
+
+
+def test_uncounted_lookups_leave_hit_ratio_alone(tmp_path):
+    """Les recherches annexes (modèles normalisés) ne comptent ni comme trouvées ni comme absentes"""
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    memory.put("m", "v1", "Hello", "Bonjour")
+    assert memory.get("m", "v1", "Hello") == "Bonjour"
+    assert memory.get_many("m", "v1-templates", ["a", "b"], count=False) == {}
+    assert memory.get("m", "v1", "Hello", count=False) == "Bonjour"
+    assert (memory.stats["hits"], memory.stats["misses"]) == (1, 0)
+    assert memory.hit_ratio() == 1.0